@@ -4,12 +4,23 @@ import {
 } from '@jupyterlab/application';
 import { ILauncher } from '@jupyterlab/launcher';
 import { IDefaultFileBrowser } from '@jupyterlab/filebrowser';
-import { INotebookTracker, NotebookPanel } from '@jupyterlab/notebook';
-import { Cell } from '@jupyterlab/cells';
+import {
+  INotebookTracker,
+  NotebookActions,
+  NotebookPanel,
+} from '@jupyterlab/notebook';
+import { Cell, ICellModel } from '@jupyterlab/cells';
+import { IObservableList } from '@jupyterlab/observables';
 import { LabIcon } from '@jupyterlab/ui-components';
 
 const COMMAND_NEW = 'nobook:create-new';
 const COMMAND_OPEN = 'nobook:open-as-notebook';
+const COMMAND_RUN_STALE = 'nobook:run-stale';
+
+interface NobookCellMeta {
+  block?: string;
+  stale?: boolean;
+}
 
 const nobookIcon = new LabIcon({
   name: 'nobook:icon',
@@ -19,7 +30,10 @@ const nobookIcon = new LabIcon({
   </svg>`,
 });
 
-function uniqueName(base: string, used: Set<string>): string {
+/** Delay before label updates are applied, so bursts of edits coalesce */
+const LABEL_UPDATE_DELAY_MS = 50;
+
+function uniqueName(base: string, used: { has(name: string): boolean }): string {
   if (!used.has(base)) {
     return base;
   }
@@ -36,95 +50,244 @@ function uniqueName(base: string, used: Set<string>): string {
   return `${copyName}-${i}`;
 }
 
-function ensureUniqueBlockNames(notebook: { widgets: readonly Cell[] }): void {
-  const used = new Set<string>();
+function getMeta(model: ICellModel): NobookCellMeta | undefined {
+  return model.getMetadata('nobook') as NobookCellMeta | undefined;
+}
+
+function renderLabel(cell: Cell): void {
+  const blockName = getMeta(cell.model)?.block ?? '';
 
-  notebook.widgets.forEach((cell: Cell, index: number) => {
-    if (cell.model.type !== 'code') {
+  let label = cell.node.querySelector('.nobook-block-label') as HTMLElement | null;
+  cell.toggleClass('nobook-stale', isStale(cell));
+
+  if (blockName) {
+    if (!label) {
+      label = document.createElement('div');
+      label.className = 'nobook-block-label';
+
+      const input = document.createElement('input');
+      input.className = 'nobook-block-input';
+      input.type = 'text';
+      input.spellcheck = false;
+      label.appendChild(input);
+
+      const commitForCell = cell;
+      const commit = (): void => {
+        const curMeta = getMeta(commitForCell.model);
+        const newName = input.value.trim();
+        if (newName && newName !== curMeta?.block) {
+          commitForCell.model.setMetadata('nobook', { ...curMeta, block: newName });
+        }
+      };
+      input.addEventListener('blur', commit);
+      input.addEventListener('keydown', (e: KeyboardEvent) => {
+        if (e.key === 'Enter') {
+          e.preventDefault();
+          input.blur();
+        }
+        e.stopPropagation();
+      });
+
+      cell.node.insertBefore(label, cell.node.firstChild);
+    }
+    const input = label.querySelector('input') as HTMLInputElement;
+    if (input && document.activeElement !== input) {
+      input.value = blockName;
+    }
+  } else if (label) {
+    label.remove();
+  }
+}
+
+/**
+ * Keeps block names unique and cell labels up to date for one notebook.
+ *
+ * Names are tracked in a name -> cell index that is updated from model
+ * change signals, so an edit only touches the cells it affects. Label DOM
+ * updates are debounced and applied only to cells currently in view; cells
+ * scrolled into view later are rendered then.
+ */
+class CellLabelManager {
+  private readonly byName = new Map<string, ICellModel>();
+  private readonly nameOf = new Map<ICellModel, string>();
+  private readonly widgetOf = new Map<ICellModel, Cell>();
+  private readonly cellOf = new WeakMap<Element, Cell>();
+  private readonly visible = new Set<ICellModel>();
+  private readonly dirty = new Set<ICellModel>();
+  private readonly observer: IntersectionObserver;
+  private timer: number | null = null;
+
+  constructor(private readonly panel: NotebookPanel) {
+    this.observer = new IntersectionObserver((entries) => this.onIntersect(entries));
+
+    const model = panel.content.model;
+    if (!model) {
       return;
     }
-    let meta = cell.model.getMetadata('nobook') as
-      | { block?: string }
-      | undefined;
-    let name = meta?.block;
+    for (let i = 0; i < model.cells.length; i++) {
+      this.track(model.cells.get(i), i);
+    }
+    model.cells.changed.connect(this.onCellsChanged, this);
+    this.observeWidgets();
+    panel.disposed.connect(() => this.dispose());
+  }
 
-    if (!name) {
-      name = uniqueName(`cell-${index}`, used);
-      cell.model.setMetadata('nobook', { ...meta, block: name });
-    } else if (used.has(name)) {
-      const newName = uniqueName(name, used);
-      cell.model.setMetadata('nobook', { ...meta, block: newName });
-      name = newName;
+  dispose(): void {
+    this.observer.disconnect();
+    if (this.timer !== null) {
+      window.clearTimeout(this.timer);
     }
-    used.add(name);
-  });
-}
+    this.panel.content.model?.cells.changed.disconnect(this.onCellsChanged, this);
+    for (const model of this.nameOf.keys()) {
+      model.metadataChanged.disconnect(this.onMetadataChanged, this);
+    }
+  }
 
-function updateCellLabels(panel: NotebookPanel): void {
-  const notebook = panel.content;
-  ensureUniqueBlockNames(notebook);
-  notebook.widgets.forEach((cell: Cell) => {
-    const meta = cell.model.getMetadata('nobook') as
-      | { block?: string }
-      | undefined;
-    const blockName = meta?.block ?? '';
-
-    let label = cell.node.querySelector('.nobook-block-label') as HTMLElement | null;
-
-    if (blockName) {
-      if (!label) {
-        label = document.createElement('div');
-        label.className = 'nobook-block-label';
-
-        const input = document.createElement('input');
-        input.className = 'nobook-block-input';
-        input.type = 'text';
-        input.spellcheck = false;
-        label.appendChild(input);
-
-        const commitForCell = cell;
-        const commit = (): void => {
-          const curMeta = commitForCell.model.getMetadata('nobook') as
-            | { block?: string }
-            | undefined;
-          const newName = input.value.trim();
-          if (newName && newName !== curMeta?.block) {
-            commitForCell.model.setMetadata('nobook', { ...curMeta, block: newName });
-          }
-        };
-        input.addEventListener('blur', commit);
-        input.addEventListener('keydown', (e: KeyboardEvent) => {
-          if (e.key === 'Enter') {
-            e.preventDefault();
-            input.blur();
-          }
-          e.stopPropagation();
-        });
+  private onCellsChanged(
+    _sender: unknown,
+    args: IObservableList.IChangedArgs<ICellModel>,
+  ): void {
+    if (args.type === 'remove' || args.type === 'set') {
+      args.oldValues.forEach((model) => this.untrack(model));
+    }
+    if (args.type === 'add' || args.type === 'set') {
+      args.newValues.forEach((model, k) => this.track(model, args.newIndex + k));
+    }
+    // Widgets for new cells are created after the model changes
+    requestAnimationFrame(() => this.observeWidgets());
+  }
+
+  /** Give a cell a unique name in the index and watch it for renames. */
+  private track(model: ICellModel, index: number): void {
+    if (model.type !== 'code' || this.nameOf.has(model)) {
+      return;
+    }
+    model.metadataChanged.connect(this.onMetadataChanged, this);
+    this.claimName(model, getMeta(model)?.block ?? uniqueName(`cell-${index}`, this.byName));
+  }
+
+  private untrack(model: ICellModel): void {
+    const name = this.nameOf.get(model);
+    if (name !== undefined && this.byName.get(name) === model) {
+      this.byName.delete(name);
+    }
+    const cell = this.widgetOf.get(model);
+    if (cell) {
+      this.observer.unobserve(cell.node);
+    }
+    this.nameOf.delete(model);
+    this.widgetOf.delete(model);
+    this.visible.delete(model);
+    this.dirty.delete(model);
+    model.metadataChanged.disconnect(this.onMetadataChanged, this);
+  }
 
-        cell.node.insertBefore(label, cell.node.firstChild);
+  private claimName(model: ICellModel, wanted: string): void {
+    const owner = this.byName.get(wanted);
+    const name = owner === undefined || owner === model ? wanted : uniqueName(wanted, this.byName);
+    this.byName.set(name, model);
+    this.nameOf.set(model, name);
+    const meta = getMeta(model);
+    if (meta?.block !== name) {
+      model.setMetadata('nobook', { ...meta, block: name });
+    }
+    this.markDirty(model);
+  }
+
+  private onMetadataChanged(model: ICellModel): void {
+    const tracked = this.nameOf.get(model);
+    const current = getMeta(model)?.block;
+    if (current !== undefined && current !== tracked) {
+      if (tracked !== undefined && this.byName.get(tracked) === model) {
+        this.byName.delete(tracked);
       }
-      const input = label.querySelector('input') as HTMLInputElement;
-      if (input && document.activeElement !== input) {
-        input.value = blockName;
+      this.claimName(model, current);
+    } else {
+      this.markDirty(model);
+    }
+  }
+
+  private markDirty(model: ICellModel): void {
+    this.dirty.add(model);
+    if (this.timer === null) {
+      this.timer = window.setTimeout(() => this.flush(), LABEL_UPDATE_DELAY_MS);
+    }
+  }
+
+  private flush(): void {
+    this.timer = null;
+    for (const model of this.dirty) {
+      const cell = this.widgetOf.get(model);
+      if (cell && this.visible.has(model)) {
+        renderLabel(cell);
+        this.dirty.delete(model);
       }
-    } else if (label) {
-      label.remove();
     }
-  });
+  }
+
+  private observeWidgets(): void {
+    for (const cell of this.panel.content.widgets) {
+      if (this.nameOf.has(cell.model) && this.widgetOf.get(cell.model) !== cell) {
+        this.widgetOf.set(cell.model, cell);
+        this.cellOf.set(cell.node, cell);
+        this.observer.observe(cell.node);
+      }
+    }
+  }
+
+  private onIntersect(entries: IntersectionObserverEntry[]): void {
+    for (const entry of entries) {
+      const cell = this.cellOf.get(entry.target);
+      if (!cell || cell.isDisposed) {
+        continue;
+      }
+      if (entry.isIntersecting) {
+        this.visible.add(cell.model);
+        if (this.dirty.delete(cell.model) || !cell.node.querySelector('.nobook-block-label')) {
+          renderLabel(cell);
+        }
+      } else {
+        this.visible.delete(cell.model);
+      }
+    }
+  }
 }
 
-function attachCellLabels(panel: NotebookPanel): void {
-  const notebook = panel.content;
+function isStale(cell: Cell): boolean {
+  const meta = cell.model.getMetadata('nobook') as NobookCellMeta | undefined;
+  return cell.model.type === 'code' && meta?.stale === true;
+}
 
-  // Update when cells change
-  if (notebook.model) {
-    notebook.model.cells.changed.connect(() => {
-      requestAnimationFrame(() => updateCellLabels(panel));
-    });
+function clearStale(cell: Cell): void {
+  const meta = cell.model.getMetadata('nobook') as NobookCellMeta | undefined;
+  if (meta?.stale) {
+    // eslint-disable-next-line @typescript-eslint/no-unused-vars
+    const { stale, ...rest } = meta;
+    cell.model.setMetadata('nobook', rest);
+    cell.toggleClass('nobook-stale', false);
   }
+}
 
-  // Also update on active cell change (catches metadata edits)
-  notebook.activeCellChanged.connect(() => updateCellLabels(panel));
+/**
+ * Re-run only the cells whose outputs were produced from an older version
+ * of their source (flagged `nobook.stale` by the server when loading).
+ */
+async function runStaleCells(panel: NotebookPanel): Promise<void> {
+  const notebook = panel.content;
+  const indices: number[] = [];
+  notebook.widgets.forEach((cell: Cell, index: number) => {
+    if (isStale(cell)) {
+      indices.push(index);
+    }
+  });
+  for (const index of indices) {
+    notebook.deselectAll();
+    notebook.activeCellIndex = index;
+    const ok = await NotebookActions.run(notebook, panel.sessionContext);
+    if (!ok) {
+      break;
+    }
+  }
 }
 
 const launcherPlugin: JupyterFrontEndPlugin<void> = {
@@ -202,10 +365,29 @@ const cellLabelPlugin: JupyterFrontEndPlugin<void> = {
   autoStart: true,
   requires: [INotebookTracker],
   activate: (app: JupyterFrontEnd, tracker: INotebookTracker) => {
+    app.commands.addCommand(COMMAND_RUN_STALE, {
+      label: 'Run Stale Nobook Cells',
+      caption: 'Re-run cells edited since their saved outputs were produced',
+      isEnabled: () => tracker.currentWidget !== null,
+      execute: async () => {
+        const panel = tracker.currentWidget;
+        if (panel) {
+          await runStaleCells(panel);
+        }
+      },
+    });
+    app.contextMenu.addItem({
+      command: COMMAND_RUN_STALE,
+      selector: '.jp-Notebook',
+      rank: 20,
+    });
+
+    // Fresh outputs are no longer stale
+    NotebookActions.executed.connect((_sender, { cell }) => clearStale(cell));
+
     tracker.widgetAdded.connect((_sender: INotebookTracker, panel: NotebookPanel) => {
       panel.context.ready.then(() => {
-        attachCellLabels(panel);
-        updateCellLabels(panel);
+        new CellLabelManager(panel);
       });
     });
 
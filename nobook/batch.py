@@ -0,0 +1,272 @@
+"""Bulk conversion between .ipynb notebooks and nobook .py files.
+
+    nobook convert archive/ --out converted/ --jobs 8
+
+Notebooks are found recursively and converted in a process pool. Every
+finished file is appended to a JSON Lines manifest right away, so an
+interrupted run picks up where it stopped: sources whose size and mtime
+match a successful manifest entry are skipped.
+
+nobook has no markdown or raw cells, so converting to .py keeps them as
+comment lines at the top of the next code cell. Converting a directory back
+to .ipynb skips the .py files that have no `# @block=` markers.
+
+A worker that dies (a crash or an out-of-memory kill) takes the pool down
+with it. The files that were in flight are then converted again one at a
+time, each in its own process, so only the file that kills its worker is
+recorded as failed.
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import os
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from pathlib import Path
+
+import nbformat
+
+from .convert import has_block_markers, out_py_path, read_notebook, write_notebook
+from .lines import read_source
+
+DEFAULT_MANIFEST = "nobook-convert.jsonl"
+PROGRESS_INTERVAL = 5.0  # seconds between progress lines
+CHUNK_SIZE = 32  # notebooks per worker task
+
+Log = Callable[[str], None]
+
+
+class NotANotebook(ValueError):
+    """Raised for a .py source without `# @block=` markers."""
+
+
+@dataclass
+class ConvertStats:
+    converted: int = 0
+    skipped: int = 0
+    failed: int = 0
+    bytes_read: int = 0
+    seconds: float = 0.0
+
+    def summary(self) -> str:
+        rate = self.converted / self.seconds if self.seconds else 0.0
+        mb_rate = self.bytes_read / self.seconds / 1e6 if self.seconds else 0.0
+        return (
+            f"Converted {self.converted} notebooks ({self.skipped} skipped, "
+            f"{self.failed} failed) in {self.seconds:.1f}s: "
+            f"{rate:.1f} notebooks/s, {mb_rate:.1f} MB/s"
+        )
+
+
+def find_sources(paths: list[Path], to: str) -> Iterator[tuple[Path, Path]]:
+    """Yield (source file, root it was found under) for each notebook to convert."""
+    suffix = ".ipynb" if to == "py" else ".py"
+    for path in paths:
+        if path.is_file():
+            yield path, path.parent
+            continue
+        for source in sorted(path.rglob(f"*{suffix}")):
+            if ".ipynb_checkpoints" in source.parts or source.name.endswith(".out.py"):
+                continue
+            yield source, path
+
+
+def target_path(source: Path, root: Path, out_dir: Path | None, to: str) -> Path:
+    """Where `source` is written: next to it, or at the same relative path in `out_dir`."""
+    base = out_dir / source.relative_to(root) if out_dir is not None else source
+    suffix = ".py" if to == "py" else ".ipynb"
+    return base.with_name(base.name.removesuffix(base.suffix) + suffix)
+
+
+def _markdown_as_comments(nb: nbformat.NotebookNode) -> None:
+    pending: list[str] = []
+    cells = []
+    for cell in nb.cells:
+        if cell.cell_type in ("markdown", "raw"):
+            pending.extend(f"# {line}".rstrip() for line in cell.source.splitlines())
+        elif cell.cell_type == "code":
+            if pending:
+                cell.source = "\n".join([*pending, cell.source])
+                pending = []
+            cells.append(cell)
+    if pending:
+        cells.append(nbformat.v4.new_code_cell("\n".join(pending)))
+    nb.cells = cells
+
+
+def _clean_metadata(nb: nbformat.NotebookNode) -> None:
+    # Drop the per-session bookkeeping the contents manager adds on load
+    for cell in nb.cells:
+        meta = cell.metadata.get("nobook")
+        if isinstance(meta, dict):
+            meta.pop("outputs", None)
+            meta.pop("stale", None)
+
+
+def convert_file(source: Path, target: Path, to: str) -> None:
+    """Convert one notebook; `to` is "py" (from .ipynb) or "ipynb" (from .py)."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    if to == "py":
+        nb = nbformat.read(source, as_version=4)
+        _markdown_as_comments(nb)
+        write_notebook(nb, target)
+    else:
+        text, _ = read_source(source)
+        if not has_block_markers(text):
+            raise NotANotebook("no # @block= markers")
+        nb = read_notebook(source)
+        _clean_metadata(nb)
+        nbformat.write(nb, target)
+
+
+def _convert_task(task: tuple[str, str, str]) -> dict:
+    source, target, to = task
+    record = {"source": source, "target": target}
+    try:
+        convert_file(Path(source), Path(target), to)
+    except NotANotebook:
+        record["status"] = "skipped"
+    except Exception as e:
+        record.update(status="failed", error=f"{type(e).__name__}: {e}")
+    else:
+        record["status"] = "ok"
+    return record
+
+
+def _source_key(source: Path) -> dict:
+    st = source.stat()
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def load_manifest(path: Path) -> dict[str, dict]:
+    """Latest manifest record per source path."""
+    records: dict[str, dict] = {}
+    if path.exists():
+        for line in path.read_text(encoding="utf-8").splitlines():
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Torn last line from an interrupted run
+            records[record["source"]] = record
+    return records
+
+
+def convert_tree(
+    paths: list[Path],
+    to: str = "py",
+    out_dir: Path | None = None,
+    jobs: int | None = None,
+    manifest: Path = Path(DEFAULT_MANIFEST),
+    force: bool = False,
+    log: Log = print,
+) -> ConvertStats:
+    """Convert every notebook under `paths`, resuming from `manifest`."""
+    started = time.perf_counter()
+    stats = ConvertStats()
+    done = load_manifest(manifest)
+
+    tasks: list[tuple[str, str, str]] = []
+    keys: dict[str, dict] = {}
+    for source, root in find_sources(paths, to):
+        key = _source_key(source)
+        previous = done.get(str(source))
+        if previous and previous.get("status") in ("ok", "skipped") and all(
+            previous.get(k) == v for k, v in key.items()
+        ):
+            stats.skipped += 1
+            continue
+        target = target_path(source, root, out_dir, to)
+        ours = previous is not None and previous.get("target") == str(target)
+        exists = target.exists() or (to == "py" and out_py_path(target).exists())
+        if exists and not (force or ours):
+            log(f"Skipping {source}: {target} already exists (use --force to overwrite)")
+            stats.skipped += 1
+            continue
+        tasks.append((str(source), str(target), to))
+        keys[str(source)] = key
+
+    manifest.parent.mkdir(parents=True, exist_ok=True)
+    last_progress = time.perf_counter()
+    with open(manifest, "a", encoding="utf-8") as f:
+        for record in _run_tasks(tasks, jobs):
+            source = record["source"]
+            record.update(keys[source])
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            if record["status"] == "ok":
+                stats.converted += 1
+                stats.bytes_read += record["size"]
+            elif record["status"] == "skipped":
+                stats.skipped += 1
+            else:
+                stats.failed += 1
+                log(f"Failed {source}: {record['error']}")
+            if time.perf_counter() - last_progress > PROGRESS_INTERVAL:
+                last_progress = time.perf_counter()
+                stats.seconds = last_progress - started
+                log(f"{stats.converted + stats.failed}/{len(tasks)} done, {stats.summary()}")
+
+    stats.seconds = time.perf_counter() - started
+    return stats
+
+
+def _convert_chunk(tasks: list[tuple[str, str, str]]) -> list[dict]:
+    return [_convert_task(task) for task in tasks]
+
+
+def _run_tasks(tasks: list[tuple[str, str, str]], jobs: int | None) -> Iterator[dict]:
+    """Yield task records as they finish, keeping a bounded number in flight.
+
+    Tasks go to the workers in chunks, since most notebooks convert faster
+    than a round trip to a worker process.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(tasks) <= CHUNK_SIZE:
+        for task in tasks:
+            yield _convert_task(task)
+        return
+    chunks = (tasks[i:i + CHUNK_SIZE] for i in range(0, len(tasks), CHUNK_SIZE))
+    suspects: list[tuple[str, str, str]] = []
+    broken = True
+    while broken:
+        broken = False
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            pending = {
+                pool.submit(_convert_chunk, c): c for c in itertools.islice(chunks, jobs * 2)
+            }
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    chunk = pending.pop(future)
+                    try:
+                        records = future.result()
+                    except BrokenProcessPool:
+                        suspects.extend(chunk)
+                        broken = True
+                        continue
+                    yield from records
+                    chunk = None if broken else next(chunks, None)
+                    if chunk is not None:
+                        pending[pool.submit(_convert_chunk, chunk)] = chunk
+    for task in suspects:
+        yield _convert_alone(task)
+
+
+def _convert_alone(task: tuple[str, str, str]) -> dict:
+    """Convert one file in a fresh worker, recording its death as a failure."""
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        try:
+            return pool.submit(_convert_task, task).result()
+        except BrokenProcessPool:
+            source, target, _ = task
+            return {
+                "source": source,
+                "target": target,
+                "status": "failed",
+                "error": "BrokenProcessPool: the worker process died converting this file",
+            }
@@ -1,51 +1,287 @@
-"""CLI entry point for nobook."""
+"""CLI entry point for nobook.
+
+Subcommands import their dependencies lazily so that light commands such as
+`nobook list` stay fast: they never pull in the executor, Jupyter or nbformat.
+"""
 
 from __future__ import annotations
 
-import argparse
-import subprocess
 import sys
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-from .executor import execute_all, execute_up_to
-from .parser import parse_file
-from .writer import write_output
+if TYPE_CHECKING:
+    import argparse
 
 
-def cmd_run(args: argparse.Namespace) -> None:
-    path = Path(args.file)
+def _require_file(path: Path) -> None:
     if not path.exists():
         print(f"Error: file not found: {path}", file=sys.stderr)
         sys.exit(1)
 
+
+def cmd_run(args: argparse.Namespace) -> None:
+    if not args.metrics_file:
+        _run(args)
+        return
+
+    from .metrics import write_metrics_file
+
+    try:
+        _run(args)
+    finally:
+        write_metrics_file(args.metrics_file)
+
+
+def _run(args: argparse.Namespace) -> None:
+    from .executor import execute_all, execute_up_to
+    from .parser import parse_file
+    from .writer import write_output
+
+    path = Path(args.file)
+    _require_file(path)
+    out_path = path.with_suffix(".out.py")
+
+    isolated = args.isolated or args.memory_limit or args.cpu_limit
+    if isolated and (args.watch or args.param or args.sweep):
+        print("Error: --isolated can't be combined with --watch, --param or --sweep",
+              file=sys.stderr)
+        sys.exit(1)
+
+    if args.use_async and (isolated or args.watch or args.param or args.sweep):
+        print("Error: --async can't be combined with --isolated, --watch, --param or --sweep",
+              file=sys.stderr)
+        sys.exit(1)
+
+    if args.normalize and (args.param or args.sweep):
+        print("Error: --normalize can't be combined with --param or --sweep", file=sys.stderr)
+        sys.exit(1)
+
+    if args.block and (args.param or args.sweep):
+        print("Error: --block can't be combined with --param or --sweep", file=sys.stderr)
+        sys.exit(1)
+
+    if args.watch and (args.param or args.sweep):
+        print("Error: --watch can't be combined with --param or --sweep", file=sys.stderr)
+        sys.exit(1)
+
+    if args.watch:
+        _watch(path, out_path, args)
+        return
+
+    if args.param or args.sweep:
+        _run_params(path, args)
+        return
+
     parsed = parse_file(path)
 
-    if args.block:
+    if isolated:
+        results = _run_isolated(parsed, args)
+    elif args.use_async:
+        results = _run_async(parsed, args)
+    elif args.block:
         results = execute_up_to(parsed, args.block)
     else:
         results = execute_all(parsed)
 
-    out_path = path.with_suffix(".out.py")
+    results = _normalize(path, results, args)
     write_output(parsed, results, out_path)
     print(f"Output written to {out_path}")
+    _write_sidecar(path, parsed, results, force=args.sidecar)
+    _write_digests(path, out_path, force=args.digests)
 
     # Exit with error if any block failed
     if any(r.error for r in results):
         sys.exit(1)
 
 
-def cmd_list(args: argparse.Namespace) -> None:
-    path = Path(args.file)
-    if not path.exists():
-        print(f"Error: file not found: {path}", file=sys.stderr)
+def _run_async(parsed, args: argparse.Namespace) -> list:
+    import asyncio
+
+    from .executor import execute_blocks_async, names_up_to
+
+    names = names_up_to(parsed, args.block) if args.block else None
+    return asyncio.run(execute_blocks_async(parsed, names))
+
+
+def _run_isolated(parsed, args: argparse.Namespace) -> list:
+    from .executor import names_up_to
+    from .isolated import execute_blocks_isolated, parse_size
+
+    try:
+        memory_limit = parse_size(args.memory_limit) if args.memory_limit else None
+        names = names_up_to(parsed, args.block) if args.block else None
+        return execute_blocks_isolated(
+            parsed, names, memory_limit=memory_limit, cpu_limit=args.cpu_limit,
+        )
+    except (ValueError, KeyError, OSError) as e:
+        message = e.args[0] if isinstance(e, KeyError) else e
+        print(f"Error: {message}", file=sys.stderr)
+        sys.exit(1)
+
+
+def _run_params(path: Path, args: argparse.Namespace) -> None:
+    from .params import load_sweep, parse_param, run_sweep
+    from .parser import parse_file
+
+    try:
+        overrides = dict(parse_param(p) for p in args.param or [])
+        param_sets = load_sweep(args.sweep) if args.sweep else [{}]
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    param_sets = [{**overrides, **params} for params in param_sets]
+
+    parsed = parse_file(path)
+    try:
+        outcomes = run_sweep(path, parsed, param_sets, jobs=args.jobs)
+    except KeyError as e:
+        print(f"Error: {e.args[0]}", file=sys.stderr)
+        sys.exit(1)
+
+    for out_path, ok in outcomes:
+        print(f"Output written to {out_path}" + ("" if ok else " (failed)"))
+    if not all(ok for _, ok in outcomes):
+        sys.exit(1)
+
+
+def _watch(path: Path, out_path: Path, args: argparse.Namespace) -> None:
+    from .watch import watch
+    from .writer import write_output
+
+    def write(parsed, results):
+        results = _normalize(path, results, args)
+        # Each call carries one block; after a failure, the blocks below it
+        # won't run until the next save, so their old outputs are cleared
+        blocks = [r.name for r in results]
+        if results[-1].error is not None:
+            names = [block.name for block in parsed.blocks]
+            blocks = names[names.index(results[0].name):]
+        write_output(parsed, results, out_path, blocks=blocks)
+        _write_sidecar(path, parsed, results, force=args.sidecar)
+        _write_digests(path, out_path, force=args.digests)
+
+    _normalize(path, [], args)  # reject unknown scrubbers before watching
+    print(f"Watching {path}, writing {out_path} (Ctrl+C to stop)")
+    try:
+        watch(path, write, log=lambda msg: print(msg, flush=True))
+    except KeyboardInterrupt:
+        pass
+
+
+def _normalize(path: Path, results: list, args: argparse.Namespace) -> list:
+    """Scrub run-to-run noise from results if --normalize was given."""
+    if not args.normalize:
+        return results
+
+    from .normalize import normalize_results
+
+    names = [n.strip() for n in args.normalize.split(",") if n.strip()]
+    try:
+        return normalize_results(results, names, root=path.parent)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+def _write_digests(path: Path, out_path: Path, force: bool) -> None:
+    """Update .out.digests.json if requested or already present."""
+    from .normalize import digests_path, write_digests
+
+    if force or digests_path(path).exists():
+        write_digests(path, out_path)
+
+
+def _write_sidecar(path: Path, parsed, results: list, force: bool) -> None:
+    """Append results to the .out.jsonl sidecar if requested or already present."""
+    from .sidecar import append_results, sidecar_path
+
+    if force or sidecar_path(path).exists():
+        append_results(path, parsed, results)
+
+
+def cmd_convert(args: argparse.Namespace) -> None:
+    from .batch import convert_tree
+
+    paths = [Path(p) for p in args.paths]
+    for path in paths:
+        _require_file(path)
+    stats = convert_tree(
+        paths,
+        to=args.to,
+        out_dir=Path(args.out) if args.out else None,
+        jobs=args.jobs,
+        manifest=Path(args.manifest),
+        force=args.force,
+        log=lambda msg: print(msg, flush=True),
+    )
+    print(stats.summary())
+    if stats.failed:
         sys.exit(1)
 
+
+def cmd_pipeline(args: argparse.Namespace) -> None:
+    from .pipeline import run_pipeline
+
+    path = Path(args.manifest)
+    _require_file(path)
+    try:
+        outcomes = run_pipeline(
+            path, jobs=args.jobs, force=args.force, log=lambda msg: print(msg, flush=True),
+        )
+    except (ValueError, TypeError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    ran = sum(o.status == "ran" for o in outcomes)
+    cached = sum(o.status == "cached" for o in outcomes)
+    failed = len(outcomes) - ran - cached
+    print(f"{ran} ran, {cached} up to date, {failed} failed or blocked")
+    if failed:
+        sys.exit(1)
+
+
+def cmd_graph(args: argparse.Namespace) -> None:
+    from .graph import build_graph, to_dot, to_json, to_text
+    from .parser import parse_file
+
+    path = Path(args.file)
+    _require_file(path)
+    parsed = parse_file(path)
+
+    if args.run:
+        from .executor import execute_all
+
+        durations = {r.name: r.duration for r in execute_all(parsed)}
+    else:
+        from .sidecar import read_sidecar, sidecar_path
+
+        records = read_sidecar(sidecar_path(path))
+        durations = {name: r["duration"] for name, r in records.items() if "duration" in r}
+        if not durations and args.format == "text":
+            print(f"No timings in {sidecar_path(path)}; run `nobook run --sidecar` "
+                  "first or pass --run.", file=sys.stderr)
+
+    graph = build_graph(parsed, durations)
+    print({"json": to_json, "dot": to_dot, "text": to_text}[args.format](graph))
+
+
+def cmd_list(args: argparse.Namespace) -> None:
+    _list_blocks(Path(args.file))
+
+
+def _list_blocks(path: Path) -> None:
+    from .parser import parse_file
+
+    _require_file(path)
+
     parsed = parse_file(path)
     for block in parsed.blocks:
         print(block.name)
 
 
 def _launch_jupyter(module: str, extra_args: list[str]) -> None:
+    import subprocess
+
     jupyter_args = [
         sys.executable, "-m", module,
         "--ServerApp.contents_manager_class=nobook.jupyter.contentsmanager.NobookContentsManager",
@@ -69,15 +305,123 @@ def cmd_jupyter(args: argparse.Namespace) -> None:
     _launch_jupyter("notebook", args.jupyter_args)
 
 
-def main(argv: list[str] | None = None) -> None:
-    parser = argparse.ArgumentParser(prog="nobook", description="Plain .py files as notebooks")
-    parser.add_argument("jupyter_args", nargs="*", help="Extra args for notebook")
+def build_parser() -> argparse.ArgumentParser:
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="nobook",
+        description="Plain .py files as notebooks",
+        epilog="Without a command, launches Jupyter Notebook and passes any arguments to it.",
+    )
     sub = parser.add_subparsers(dest="command")
 
     # run
     run_parser = sub.add_parser("run", help="Execute blocks and write .out.py")
     run_parser.add_argument("file", help="Path to .py file")
     run_parser.add_argument("--block", help="Run up to and including this block")
+    run_parser.add_argument(
+        "--sidecar", action="store_true",
+        help="Also write structured outputs to .out.jsonl (kept updated once it exists)",
+    )
+    run_parser.add_argument(
+        "--normalize", nargs="?", const="addresses,paths,timestamps",
+        metavar="SCRUBBERS",
+        help="Replace memory addresses, absolute paths and timestamps in outputs with "
+             "placeholders; optionally a comma-separated list of scrubbers, which "
+             "may include dates and durations",
+    )
+    run_parser.add_argument(
+        "--digests", action="store_true",
+        help="Also write per-block output digests to .out.digests.json "
+             "(kept updated once it exists)",
+    )
+    run_parser.add_argument(
+        "--param", action="append", metavar="KEY=VALUE",
+        help="Override a value from the 'parameters' block (repeatable)",
+    )
+    run_parser.add_argument(
+        "--sweep", metavar="FILE",
+        help="Run once per parameter set in a JSON Lines file",
+    )
+    run_parser.add_argument(
+        "--jobs", type=int, default=1,
+        help="Parameter sets to run in parallel with --sweep",
+    )
+    run_parser.add_argument(
+        "--watch", action="store_true",
+        help="Keep running, re-executing changed blocks (and those after them) on save",
+    )
+    run_parser.add_argument(
+        "--async", dest="use_async", action="store_true",
+        help="Allow top-level await in blocks; all blocks share one event loop",
+    )
+    run_parser.add_argument(
+        "--isolated", action="store_true",
+        help="Run blocks in a separate process, so a crashing or runaway block can't take nobook down",
+    )
+    run_parser.add_argument(
+        "--memory-limit", metavar="SIZE",
+        help="Cap the isolated process's address space, e.g. 4G (implies --isolated)",
+    )
+    run_parser.add_argument(
+        "--cpu-limit", type=int, metavar="SECONDS",
+        help="CPU time allowed per block (implies --isolated)",
+    )
+    run_parser.add_argument(
+        "--metrics-file", metavar="FILE",
+        help="Write timing and error metrics in Prometheus text format when done",
+    )
+
+    # convert
+    convert_parser = sub.add_parser(
+        "convert", help="Convert .ipynb notebooks to nobook .py files, or back",
+    )
+    convert_parser.add_argument("paths", nargs="+", help="Notebook files or directories")
+    convert_parser.add_argument(
+        "--to", choices=["py", "ipynb"], default="py",
+        help="Target format (default: py, converting .ipynb files)",
+    )
+    convert_parser.add_argument(
+        "--out", metavar="DIR",
+        help="Write converted files here, mirroring the source layout (default: next to sources)",
+    )
+    convert_parser.add_argument(
+        "--jobs", type=int, default=None,
+        help="Worker processes (default: one per CPU)",
+    )
+    convert_parser.add_argument(
+        "--manifest", default="nobook-convert.jsonl", metavar="FILE",
+        help="Record of converted files, used to resume an interrupted run",
+    )
+    convert_parser.add_argument(
+        "--force", action="store_true", help="Overwrite existing target files",
+    )
+
+    # pipeline
+    pipeline_parser = sub.add_parser(
+        "pipeline", help="Run notebooks in dependency order, skipping unchanged steps",
+    )
+    pipeline_parser.add_argument("manifest", help="Path to the pipeline's JSON manifest")
+    pipeline_parser.add_argument(
+        "--jobs", type=int, default=None,
+        help="Notebooks to run in parallel (default: one per CPU)",
+    )
+    pipeline_parser.add_argument(
+        "--force", action="store_true", help="Run every step, even if its inputs are unchanged",
+    )
+
+    # graph
+    graph_parser = sub.add_parser(
+        "graph", help="Show block dependencies and the critical path of the last run",
+    )
+    graph_parser.add_argument("file", help="Path to .py file")
+    graph_parser.add_argument(
+        "--format", choices=["text", "json", "dot"], default="text", help="Output format",
+    )
+    graph_parser.add_argument(
+        "--run", action="store_true",
+        help="Execute the notebook now for timings instead of reading them from .out.jsonl",
+    )
 
     # list
     list_parser = sub.add_parser("list", help="List block names")
@@ -91,9 +435,50 @@ def main(argv: list[str] | None = None) -> None:
     jupyter_parser = sub.add_parser("jupyter", help="Launch Jupyter Notebook with nobook")
     jupyter_parser.add_argument("jupyter_args", nargs="*", help="Extra args for notebook")
 
-    args = parser.parse_args(argv)
-    if args.command is None:
-        cmd_default(args)
+    return parser
+
+
+COMMANDS = {
+    "run": cmd_run,
+    "convert": cmd_convert,
+    "pipeline": cmd_pipeline,
+    "graph": cmd_graph,
+    "list": cmd_list,
+    "lab": cmd_lab,
+    "jupyter": cmd_jupyter,
+}
+
+# Commands that forward their remaining arguments to Jupyter untouched
+LAUNCH_COMMANDS = {"lab", "jupyter"}
+
+
+def main(argv: list[str] | None = None) -> None:
+    if argv is None:
+        argv = sys.argv[1:]
+
+    command = argv[0] if argv else None
+
+    # Fast path: `nobook list FILE` is called from editor hooks, skip argparse.
+    if command == "list" and len(argv) == 2 and not argv[1].startswith("-"):
+        _list_blocks(Path(argv[1]))
         return
 
-    {"run": cmd_run, "list": cmd_list, "lab": cmd_lab, "jupyter": cmd_jupyter}[args.command](args)
+    if command in LAUNCH_COMMANDS and not {"-h", "--help"} & set(argv[1:]):
+        COMMANDS[command](_launch_args(argv[1:]))
+        return
+
+    if command not in COMMANDS:
+        if {"-h", "--help"} & set(argv):
+            build_parser().print_help()
+            return
+        cmd_default(_launch_args(argv))
+        return
+
+    args = build_parser().parse_args(argv)
+    COMMANDS[args.command](args)
+
+
+def _launch_args(jupyter_args: list[str]) -> argparse.Namespace:
+    import argparse
+
+    return argparse.Namespace(jupyter_args=list(jupyter_args))
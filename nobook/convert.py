@@ -0,0 +1,368 @@
+"""Convert between nobook .py text, notebooks and .out.py outputs.
+
+    nb = py_to_notebook(text)               # .py text -> notebook node
+    text = notebook_to_py(nb)               # and back
+    out_text = notebook_to_out_py(nb)       # cell outputs -> .out.py text
+    attach_outputs(nb, parse_out_py(out_text))
+
+`read_notebook` and `write_notebook` do the same for a .py file and the
+.out.py next to it.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+from pathlib import Path
+
+import nbformat
+
+from .formats import BLOCK_START_RE, ERROR_PREFIX, OUTPUT_PREFIX
+from .lines import read_source, split_lines
+from .metrics import inc, timed
+from .parser import block_hash
+from .summary import BlobStore, preview
+
+# nbformat 4.5 cell ids
+_CELL_ID_RE = re.compile(r"^[a-zA-Z0-9_-]{1,64}$")
+_CELL_ID_INVALID_RE = re.compile(r"[^a-zA-Z0-9_-]")
+_ANSI_RE = re.compile(r"\x1b\[[0-9;]*m")
+
+
+def has_block_markers(text: str) -> bool:
+    """Check if text contains at least one @block marker."""
+    if "@block=" not in text:
+        return False
+    for line in split_lines(text):
+        if BLOCK_START_RE.match(line):
+            return True
+    return False
+
+
+@timed("nobook_convert_seconds", op="py_to_notebook")
+def py_to_notebook(text: str) -> nbformat.NotebookNode:
+    """Convert nobook-formatted .py text to a notebook node.
+
+    Handles duplicate block names gracefully by appending suffixes.
+    """
+    nb = nbformat.v4.new_notebook()
+    nb.metadata["nobook"] = True
+
+    names = _BlockNames()
+    cell_ids: set[str] = set()
+    preamble_lines: list[str] = []
+    current_block: str | None = None
+    current_lines: list[str] = []
+
+    def flush_block() -> None:
+        nonlocal current_block, current_lines
+        if current_block is not None:
+            name = names.add(current_block)
+            cell = nbformat.v4.new_code_cell(source="\n".join(current_lines))
+            cell.id = _cell_id(name, cell_ids)
+            cell.metadata["nobook"] = {"block": name}
+            nb.cells.append(cell)
+            current_block = None
+            current_lines = []
+
+    for line in split_lines(text):
+        m = BLOCK_START_RE.match(line)
+        if m:
+            flush_block()
+            current_block = m.group(1)
+        elif current_block is not None:
+            current_lines.append(line)
+        else:
+            preamble_lines.append(line)
+
+    flush_block()
+
+    # Insert preamble as a raw cell at the start
+    preamble_text = "\n".join(preamble_lines)
+    if preamble_text.strip():
+        cell = nbformat.v4.new_raw_cell(source=preamble_text)
+        cell.id = _cell_id("preamble", cell_ids)
+        cell.metadata["nobook"] = {"preamble": True}
+        nb.cells.insert(0, cell)
+
+    return nb
+
+
+def _unique_block_name(
+    base: str, used: set[str], next_suffix: dict[str, int] | None = None,
+) -> str:
+    """Return a block name based on `base` that isn't in `used`.
+
+    `next_suffix` remembers where the `-i` probe for each base stopped, so
+    callers that only ever add names make each lookup amortized O(1).
+    """
+    if base not in used:
+        return base
+    i = next_suffix.get(base, 1) if next_suffix is not None else 1
+    while f"{base}-{i}" in used:
+        i += 1
+    if next_suffix is not None:
+        next_suffix[base] = i + 1
+    return f"{base}-{i}"
+
+
+class _BlockNames:
+    """Resolve duplicate block names to `name`, `name-1`, `name-2`, ..."""
+
+    def __init__(self) -> None:
+        self.used: set[str] = set()
+        self._next_suffix: dict[str, int] = {}
+
+    def add(self, base: str) -> str:
+        name = _unique_block_name(base, self.used, self._next_suffix)
+        self.used.add(name)
+        return name
+
+
+def _cell_id(name: str, used: set[str]) -> str:
+    """Return a stable nbformat cell id for the block `name`, adding it to `used`.
+
+    Names are already unique per notebook (duplicates carry their occurrence
+    index, see `_BlockNames`), so the id is the name itself when it's a valid
+    id. Other names are sanitized and suffixed with a hash of the name.
+    """
+    cell_id = name
+    if not _CELL_ID_RE.match(name):
+        digest = hashlib.sha1(name.encode("utf-8")).hexdigest()[:16]
+        cell_id = f"{_CELL_ID_INVALID_RE.sub('_', name)[:40]}-{digest}"
+    if cell_id in used:
+        digest = hashlib.sha1(f"{name}#{len(used)}".encode("utf-8")).hexdigest()[:16]
+        cell_id = f"{cell_id[:40]}-{digest}"
+    used.add(cell_id)
+    return cell_id
+
+
+@timed("nobook_convert_seconds", op="notebook_to_py")
+def notebook_to_py(nb: nbformat.NotebookNode) -> str:
+    """Convert a notebook node back to nobook-formatted .py text."""
+    chunks: list[str] = []
+    names = _BlockNames()
+    cell_counter = 0
+
+    for cell in nb.cells:
+        nobook_meta = cell.metadata.get("nobook", {})
+
+        if cell.cell_type == "raw" and nobook_meta.get("preamble"):
+            preamble_lines = split_lines(cell.source)
+            if preamble_lines:
+                chunks.append("\n".join(preamble_lines))
+        elif cell.cell_type == "code":
+            base = nobook_meta.get("block", f"cell-{cell_counter}")
+            block_name = names.add(base)
+            chunks.append("\n".join([f"# @block={block_name}", *split_lines(cell.source)]))
+        cell_counter += 1
+
+    return "\n".join(chunks) + "\n"
+
+
+def cell_outputs_to_lines(outputs: list, blobs: BlobStore | None = None) -> list[str]:
+    """Extract stdout and error lines from notebook cell outputs.
+
+    Large stream and result text is cut down to a preview; with `blobs`, the
+    full text is saved there and the preview points to it.
+    """
+    summarize = blobs.summarize if blobs is not None else preview
+    lines: list[str] = []
+    for output in outputs:
+        output_type = output.get("output_type", "")
+        if output_type == "stream":
+            prefix = ERROR_PREFIX if output.get("name") == "stderr" else OUTPUT_PREFIX
+            text = summarize(output.get("text", ""))
+            for line in text.rstrip("\n").splitlines():
+                lines.append(f"{prefix}{line}")
+        elif output_type == "execute_result":
+            data = output.get("data", {})
+            text = summarize(data.get("text/plain", ""))
+            if text:
+                for line in text.rstrip("\n").splitlines():
+                    lines.append(f"{OUTPUT_PREFIX}{line}")
+        elif output_type == "error":
+            tb = output.get("traceback", [])
+            # Traceback entries may contain ANSI escape codes; strip them
+            for entry in tb:
+                clean = _ANSI_RE.sub("", entry)
+                for line in clean.splitlines():
+                    lines.append(f"{ERROR_PREFIX}{line}")
+    return lines
+
+
+@timed("nobook_convert_seconds", op="notebook_to_out_py")
+def notebook_to_out_py(nb: nbformat.NotebookNode, blobs: BlobStore | None = None) -> str:
+    """Convert a notebook with outputs to .out.py format."""
+    lines: list[str] = []
+    names = _BlockNames()
+    cell_counter = 0
+    has_any_output = False
+
+    for cell in nb.cells:
+        nobook_meta = cell.metadata.get("nobook", {})
+
+        if cell.cell_type == "raw" and nobook_meta.get("preamble"):
+            lines.extend(split_lines(cell.source))
+        elif cell.cell_type == "code":
+            base = nobook_meta.get("block", f"cell-{cell_counter}")
+            block_name = names.add(base)
+            lines.append(f"# @block={block_name}")
+            lines.extend(split_lines(cell.source))
+
+            # Append cell outputs
+            cell_outputs = getattr(cell, "outputs", []) or []
+            output_lines = cell_outputs_to_lines(cell_outputs, blobs)
+            if output_lines:
+                has_any_output = True
+                lines.extend(output_lines)
+            elif cell_outputs == [] or cell_outputs is None:
+                # Cell has been executed with no output — add empty marker
+                pass
+        cell_counter += 1
+
+    if not has_any_output:
+        return ""
+
+    return "\n".join(lines) + "\n"
+
+
+def parse_out_py(text: str) -> dict[str, list[dict]]:
+    """Parse .out.py text and return a map of block name -> notebook outputs.
+
+    Each block's output lines (# >>> ... and # !!! ...) are converted to
+    notebook-format output objects (stream/error).
+    """
+    return scan_out_py(text)[0]
+
+
+@timed("nobook_convert_seconds", op="parse_out_py")
+def scan_out_py(text: str) -> tuple[dict[str, list[dict]], dict[str, str]]:
+    """Parse .out.py text into block outputs and the source hash of each block.
+
+    The hash covers the source lines the outputs were produced from, so
+    outputs can be flagged as stale when the block has been edited since.
+    """
+    block_outputs: dict[str, list[dict]] = {}
+    source_hashes: dict[str, str] = {}
+    current_block: str | None = None
+    source_lines: list[str] = []
+    stdout_lines: list[str] = []
+    error_lines: list[str] = []
+
+    def flush_outputs() -> None:
+        nonlocal current_block, source_lines, stdout_lines, error_lines
+        if current_block is None:
+            return
+        source_hashes[current_block] = block_hash(source_lines)
+        outputs: list[dict] = []
+        if stdout_lines:
+            outputs.append({
+                "output_type": "stream",
+                "name": "stdout",
+                "text": "\n".join(stdout_lines) + "\n",
+            })
+        if error_lines:
+            outputs.append({
+                "output_type": "stream",
+                "name": "stderr",
+                "text": "\n".join(error_lines) + "\n",
+            })
+        if outputs:
+            block_outputs[current_block] = outputs
+        current_block = None
+        source_lines = []
+        stdout_lines = []
+        error_lines = []
+
+    for line in split_lines(text):
+        m = BLOCK_START_RE.match(line)
+        if m:
+            flush_outputs()
+            current_block = m.group(1)
+        elif line.startswith(OUTPUT_PREFIX):
+            stdout_lines.append(line[len(OUTPUT_PREFIX):])
+        elif line.startswith(ERROR_PREFIX):
+            error_lines.append(line[len(ERROR_PREFIX):])
+        elif line == OUTPUT_PREFIX.rstrip():
+            pass  # empty-output marker written by `nobook run`
+        else:
+            source_lines.append(line)
+
+    flush_outputs()
+    return block_outputs, source_hashes
+
+
+def _outputs_digest(outputs: list) -> str:
+    """Short digest of a cell's outputs as they would appear in .out.py."""
+    text = "\n".join(cell_outputs_to_lines(outputs))
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def attach_outputs(
+    nb: nbformat.NotebookNode,
+    block_outputs: dict[str, list[dict]],
+    source_hashes: dict[str, str] | None = None,
+) -> None:
+    """Attach parsed outputs to matching notebook cells.
+
+    Each code cell also records a digest of the outputs it was loaded with, so
+    a later save can tell which outputs this client actually produced. When
+    `source_hashes` is given, cells whose source no longer matches the source
+    their outputs came from are marked with `nobook.stale`.
+    """
+    source_hashes = source_hashes or {}
+    for cell in nb.cells:
+        if cell.cell_type != "code":
+            continue
+        nobook_meta = cell.metadata.get("nobook", {})
+        block_name = nobook_meta.get("block")
+        if block_name and block_name in block_outputs:
+            cell.outputs = block_outputs[block_name]
+        if block_name:
+            nobook_meta["outputs"] = _outputs_digest(cell.outputs)
+            recorded = source_hashes.get(block_name)
+            if recorded is not None and recorded != block_hash(split_lines(cell.source)):
+                nobook_meta["stale"] = True
+            else:
+                nobook_meta.pop("stale", None)
+            if block_name in block_outputs:
+                state = "stale" if nobook_meta.get("stale") else "fresh"
+                inc("nobook_outputs_loaded_total", state=state)
+
+
+def _block_cells(nb: nbformat.NotebookNode):
+    """Yield (block name, cell) for code cells, named as in `notebook_to_out_py`."""
+    names = _BlockNames()
+    cell_counter = 0
+    for cell in nb.cells:
+        if cell.cell_type == "code":
+            base = cell.metadata.get("nobook", {}).get("block", f"cell-{cell_counter}")
+            block_name = names.add(base)
+            yield block_name, cell
+        cell_counter += 1
+
+
+def out_py_path(path: str | Path) -> Path:
+    """Return the .out.py path for a notebook .py path."""
+    path = Path(path)
+    return path.with_name(path.name.removesuffix(".py") + ".out.py")
+
+
+def read_notebook(path: str | Path) -> nbformat.NotebookNode:
+    """Read a nobook .py file as a notebook, with outputs from its .out.py."""
+    path = Path(path)
+    nb = py_to_notebook(read_source(path)[0])
+    out_path = out_py_path(path)
+    if out_path.exists():
+        attach_outputs(nb, *scan_out_py(out_path.read_text(encoding="utf-8")))
+    return nbformat.from_dict(nb)
+
+
+def write_notebook(nb: nbformat.NotebookNode, path: str | Path) -> None:
+    """Write a notebook as a nobook .py file, plus .out.py if any cell has output."""
+    path = Path(path)
+    path.write_text(notebook_to_py(nb), encoding="utf-8")
+    out_text = notebook_to_out_py(nb)
+    if out_text:
+        out_py_path(path).write_text(out_text, encoding="utf-8")
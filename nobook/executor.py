@@ -2,12 +2,16 @@
 
 from __future__ import annotations
 
+import ast
 import contextlib
+import inspect
 import io
+import time
 import traceback
 from dataclasses import dataclass
 
-from .parser import ParsedFile
+from .metrics import inc, observe
+from .parser import Block, ParsedFile
 
 
 @dataclass
@@ -15,53 +19,133 @@ class BlockResult:
     name: str
     stdout: str
     error: str | None
+    peak_memory: int | None = None  # bytes, reported by the isolated executor
+    duration: float | None = None  # seconds
+    stderr: str = ""  # kept apart from stdout only by kernel-backed runs
+
+
+def new_namespace() -> dict:
+    """Return a fresh globals dict for executing blocks."""
+    return {"__name__": "__pybooks__"}
 
 
 def execute_blocks(
     parsed: ParsedFile,
     block_names: list[str] | None = None,
+    namespace: dict | None = None,
 ) -> list[BlockResult]:
     """Execute blocks, sharing a single globals dict.
 
     If block_names is None, executes all blocks in order.
     If block_names is provided, executes only those blocks (in file order).
+    If namespace is provided, blocks run in it (and keep their state there)
+    instead of a fresh globals dict.
+    """
+    started = time.perf_counter()
+    shared_globals = namespace if namespace is not None else new_namespace()
+    results: list[BlockResult] = []
+
+    for block in select_blocks(parsed, block_names):
+        block_started = time.perf_counter()
+        result = run_block(block, shared_globals)
+        record_block_duration(result, time.perf_counter() - block_started)
+        results.append(result)
+
+        # Stop on error
+        if result.error is not None:
+            break
+
+    observe("nobook_execute_seconds", time.perf_counter() - started)
+    return results
+
+
+async def execute_blocks_async(
+    parsed: ParsedFile,
+    block_names: list[str] | None = None,
+    namespace: dict | None = None,
+) -> list[BlockResult]:
+    """Execute blocks like `execute_blocks`, allowing top-level `await`.
+
+    All blocks run on the calling event loop, so tasks a block starts (and
+    doesn't await) keep running while later blocks execute.
     """
-    shared_globals: dict = {"__name__": "__pybooks__"}
+    started = time.perf_counter()
+    shared_globals = namespace if namespace is not None else new_namespace()
     results: list[BlockResult] = []
 
-    if block_names is not None:
-        # Validate all names exist
-        for name in block_names:
-            if name not in parsed.block_map:
-                raise KeyError(f"Block '{name}' not found")
-        targets = [b for b in parsed.blocks if b.name in block_names]
-    else:
-        targets = parsed.blocks
-
-    for block in targets:
-        code = "\n".join(block.lines)
-        stdout_buf = io.StringIO()
-        error = None
-
-        try:
-            with contextlib.redirect_stdout(stdout_buf):
-                exec(compile(code, f"<block:{block.name}>", "exec"), shared_globals)
-        except Exception:
-            error = traceback.format_exc()
-
-        results.append(BlockResult(
-            name=block.name,
-            stdout=stdout_buf.getvalue(),
-            error=error,
-        ))
+    for block in select_blocks(parsed, block_names):
+        block_started = time.perf_counter()
+        result = await run_block_async(block, shared_globals)
+        record_block_duration(result, time.perf_counter() - block_started)
+        results.append(result)
 
         # Stop on error
-        if error is not None:
+        if result.error is not None:
             break
 
+    observe("nobook_execute_seconds", time.perf_counter() - started)
     return results
 
 
+def select_blocks(parsed: ParsedFile, block_names: list[str] | None = None) -> list[Block]:
+    """Return the blocks to run in file order; all of them if block_names is None."""
+    if block_names is None:
+        return list(parsed.blocks)
+    # Validate all names exist
+    for name in block_names:
+        if name not in parsed.block_map:
+            raise KeyError(f"Block '{name}' not found")
+    return [b for b in parsed.blocks if b.name in block_names]
+
+
+def run_block(block: Block, namespace: dict) -> BlockResult:
+    """Execute one block in `namespace`, capturing stdout and any traceback."""
+    code = "\n".join(block.lines)
+    stdout_buf = io.StringIO()
+    error = None
+
+    try:
+        with contextlib.redirect_stdout(stdout_buf):
+            exec(compile(code, f"<block:{block.name}>", "exec"), namespace)
+    except Exception:
+        error = traceback.format_exc()
+
+    return BlockResult(name=block.name, stdout=stdout_buf.getvalue(), error=error)
+
+
+async def run_block_async(block: Block, namespace: dict) -> BlockResult:
+    """Execute one block that may use top-level `await`.
+
+    Output printed by other tasks while the block is awaiting is captured
+    with the block's own output.
+    """
+    code = "\n".join(block.lines)
+    stdout_buf = io.StringIO()
+    error = None
+
+    try:
+        with contextlib.redirect_stdout(stdout_buf):
+            compiled = compile(
+                code, f"<block:{block.name}>", "exec", flags=ast.PyCF_ALLOW_TOP_LEVEL_AWAIT,
+            )
+            # Code containing top-level await evaluates to a coroutine
+            result = eval(compiled, namespace)
+            if inspect.iscoroutine(result):
+                await result
+    except Exception:
+        error = traceback.format_exc()
+
+    return BlockResult(name=block.name, stdout=stdout_buf.getvalue(), error=error)
+
+
+def record_block_duration(result: BlockResult, seconds: float) -> None:
+    """Set the result's duration and record it, and any error, in the metrics."""
+    result.duration = seconds
+    observe("nobook_block_seconds", seconds)
+    if result.error is not None:
+        inc("nobook_block_errors_total")
+
+
 def execute_all(parsed: ParsedFile) -> list[BlockResult]:
     """Execute all blocks in order."""
     return execute_blocks(parsed)
@@ -69,6 +153,11 @@ def execute_all(parsed: ParsedFile) -> list[BlockResult]:
 
 def execute_up_to(parsed: ParsedFile, name: str) -> list[BlockResult]:
     """Execute all blocks up to and including the named block."""
+    return execute_blocks(parsed, block_names=names_up_to(parsed, name))
+
+
+def names_up_to(parsed: ParsedFile, name: str) -> list[str]:
+    """Names of all blocks up to and including the named block."""
     if name not in parsed.block_map:
         raise KeyError(f"Block '{name}' not found")
     names = []
@@ -76,4 +165,4 @@ def execute_up_to(parsed: ParsedFile, name: str) -> list[BlockResult]:
         names.append(block.name)
         if block.name == name:
             break
-    return execute_blocks(parsed, block_names=names)
+    return names
@@ -0,0 +1,305 @@
+"""Block dependency graph and critical-path timing report.
+
+Each block's top-level reads and writes are found with `ast`. A block
+depends on the most recent earlier block that wrote a name it reads. Setting
+an attribute or item (`df["x"] = ...`) counts as writing `df`. Names bound
+inside functions, classes, lambdas and comprehensions are local and don't
+count. Calls that mutate an object in place (`items.append(...)`) can't be
+seen, so they are only reads.
+
+A block that writes a name must also stay after the earlier blocks that
+read it since it was last written (write-after-read) and after the block
+that last wrote it (write-after-write), or those would see the new value.
+These ordering edges are kept apart from the data edges in `after`.
+
+With per-block durations from the last run, the critical path is the
+longest chain of blocks linked by either kind of edge. As far as the
+analysis can see, no reordering or parallelism can make the notebook
+faster than that chain.
+"""
+
+from __future__ import annotations
+
+import ast
+import json
+from dataclasses import dataclass, field
+
+from .parser import Block, ParsedFile
+
+
+@dataclass
+class BlockNode:
+    name: str
+    reads: set[str] = field(default_factory=set)
+    writes: set[str] = field(default_factory=set)
+    duration: float | None = None
+    # Upstream block name -> names read from it
+    depends_on: dict[str, set[str]] = field(default_factory=dict)
+    # Earlier block name -> names this block overwrites that it read or wrote
+    after: dict[str, set[str]] = field(default_factory=dict)
+
+    @property
+    def upstream(self) -> set[str]:
+        return self.depends_on.keys() | self.after.keys()
+
+
+@dataclass
+class BlockGraph:
+    nodes: list[BlockNode]
+    critical_path: list[str]
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(n.duration or 0.0 for n in self.nodes)
+
+    @property
+    def critical_path_seconds(self) -> float:
+        durations = {n.name: n.duration or 0.0 for n in self.nodes}
+        return sum(durations[name] for name in self.critical_path)
+
+
+class _SymbolVisitor(ast.NodeVisitor):
+    """Collect module-level names a statement reads and writes."""
+
+    def __init__(self) -> None:
+        self.reads: set[str] = set()
+        self.writes: set[str] = set()
+        self._scopes: list[set[str]] = []
+
+    def _bind(self, name: str) -> None:
+        if self._scopes:
+            self._scopes[-1].add(name)
+        else:
+            self.writes.add(name)
+
+    def _load(self, name: str) -> None:
+        if not any(name in scope for scope in self._scopes):
+            self.reads.add(name)
+
+    def _in_scope(self, local_names: set[str], nodes: list[ast.AST]) -> None:
+        self._scopes.append(local_names)
+        for node in nodes:
+            self.visit(node)
+        self._scopes.pop()
+
+    def visit_Name(self, node: ast.Name) -> None:
+        if isinstance(node.ctx, ast.Load):
+            self._load(node.id)
+        else:
+            self._bind(node.id)
+
+    def _visit_mutation(self, node: ast.Attribute | ast.Subscript) -> None:
+        self.generic_visit(node)
+        if isinstance(node.ctx, ast.Store) and not self._scopes:
+            base = node.value
+            while isinstance(base, (ast.Attribute, ast.Subscript)):
+                base = base.value
+            if isinstance(base, ast.Name):
+                self.writes.add(base.id)
+
+    visit_Attribute = _visit_mutation
+    visit_Subscript = _visit_mutation
+
+    def visit_AugAssign(self, node: ast.AugAssign) -> None:
+        if isinstance(node.target, ast.Name):
+            self._load(node.target.id)
+        self.generic_visit(node)
+
+    def visit_Import(self, node: ast.Import) -> None:
+        for alias in node.names:
+            self._bind(alias.asname or alias.name.split(".")[0])
+
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
+        for alias in node.names:
+            if alias.name != "*":
+                self._bind(alias.asname or alias.name)
+
+    def _visit_function(self, node: ast.FunctionDef | ast.AsyncFunctionDef | ast.Lambda) -> None:
+        args = node.args
+        for default in [*args.defaults, *args.kw_defaults]:
+            if default is not None:
+                self.visit(default)
+        local_names = {a.arg for a in [*args.posonlyargs, *args.args, *args.kwonlyargs]}
+        for a in (args.vararg, args.kwarg):
+            if a is not None:
+                local_names.add(a.arg)
+        if isinstance(node, ast.Lambda):
+            self._in_scope(local_names, [node.body])
+            return
+        for decorator in node.decorator_list:
+            self.visit(decorator)
+        self._bind(node.name)
+        declared_global: set[str] = set()
+        for child in ast.walk(node):
+            if isinstance(child, ast.Global):
+                declared_global.update(child.names)
+            elif isinstance(child, ast.Name) and not isinstance(child.ctx, ast.Load):
+                local_names.add(child.id)
+        for name in declared_global:
+            local_names.discard(name)
+            if not self._scopes:
+                self.writes.add(name)
+        self._in_scope(local_names, node.body)
+
+    visit_FunctionDef = _visit_function
+    visit_AsyncFunctionDef = _visit_function
+    visit_Lambda = _visit_function
+
+    def visit_ClassDef(self, node: ast.ClassDef) -> None:
+        for child in [*node.decorator_list, *node.bases, *node.keywords]:
+            self.visit(child)
+        self._bind(node.name)
+        self._in_scope(set(), node.body)
+
+    def _visit_comprehension(self, node) -> None:
+        local_names = {
+            n.id
+            for gen in node.generators
+            for n in ast.walk(gen.target)
+            if isinstance(n, ast.Name)
+        }
+        # The first iterable is evaluated in the enclosing scope
+        self.visit(node.generators[0].iter)
+        rest = [node.elt] if hasattr(node, "elt") else [node.key, node.value]
+        for i, gen in enumerate(node.generators):
+            if i:
+                rest.append(gen.iter)
+            rest.extend(gen.ifs)
+        self._in_scope(local_names, rest)
+
+    visit_ListComp = _visit_comprehension
+    visit_SetComp = _visit_comprehension
+    visit_DictComp = _visit_comprehension
+    visit_GeneratorExp = _visit_comprehension
+
+
+def block_symbols(block: Block) -> tuple[set[str], set[str]]:
+    """Return (reads, writes) for a block's module-level names.
+
+    Reads only include names not already written by an earlier statement in
+    the same block. Blocks that don't parse have no reads or writes.
+    """
+    try:
+        tree = ast.parse("\n".join(block.lines))
+    except SyntaxError:
+        return set(), set()
+    reads: set[str] = set()
+    writes: set[str] = set()
+    for stmt in tree.body:
+        visitor = _SymbolVisitor()
+        visitor.visit(stmt)
+        reads |= visitor.reads - writes
+        writes |= visitor.writes
+    return reads, writes
+
+
+def build_graph(parsed: ParsedFile, durations: dict[str, float] | None = None) -> BlockGraph:
+    """Build the dependency graph, with the critical path over `durations`."""
+    durations = durations or {}
+    nodes: list[BlockNode] = []
+    last_writer: dict[str, str] = {}
+    # Name -> blocks that read it since it was last written
+    readers: dict[str, set[str]] = {}
+    for block in parsed.blocks:
+        reads, writes = block_symbols(block)
+        node = BlockNode(block.name, reads, writes, durations.get(block.name))
+        for name in sorted(reads):
+            if name in last_writer:
+                node.depends_on.setdefault(last_writer[name], set()).add(name)
+        for name in sorted(writes):
+            earlier = readers.pop(name, set())
+            if name in last_writer:
+                earlier.add(last_writer[name])
+            for upstream in earlier - {block.name} - node.depends_on.keys():
+                node.after.setdefault(upstream, set()).add(name)
+            last_writer[name] = block.name
+        for name in reads - writes:
+            readers.setdefault(name, set()).add(block.name)
+        nodes.append(node)
+    return BlockGraph(nodes, _critical_path(nodes))
+
+
+def _critical_path(nodes: list[BlockNode]) -> list[str]:
+    # Blocks are in file order, which is a topological order of the graph
+    finish: dict[str, float] = {}
+    previous: dict[str, str | None] = {}
+    for node in nodes:
+        upstream = max(node.upstream, key=lambda name: finish[name], default=None)
+        finish[node.name] = (node.duration or 0.0) + (finish[upstream] if upstream else 0.0)
+        previous[node.name] = upstream
+    if all(node.duration is None for node in nodes):
+        return []
+    end: str | None = max(finish, key=finish.get)
+    path = []
+    while end is not None:
+        path.append(end)
+        end = previous[end]
+    return path[::-1]
+
+
+def to_json(graph: BlockGraph) -> str:
+    return json.dumps({
+        "blocks": [
+            {
+                "name": n.name,
+                "duration": n.duration,
+                "reads": sorted(n.reads),
+                "writes": sorted(n.writes),
+                "depends_on": {k: sorted(v) for k, v in n.depends_on.items()},
+                "after": {k: sorted(v) for k, v in n.after.items()},
+            }
+            for n in graph.nodes
+        ],
+        "critical_path": graph.critical_path,
+        "critical_path_seconds": graph.critical_path_seconds,
+        "total_seconds": graph.total_seconds,
+    }, indent=2)
+
+
+def to_dot(graph: BlockGraph) -> str:
+    on_path = set(graph.critical_path)
+    path_edges = set(zip(graph.critical_path, graph.critical_path[1:]))
+    lines = ["digraph nobook {", "  rankdir=TB;", "  node [shape=box];"]
+    for n in graph.nodes:
+        label = n.name if n.duration is None else f"{n.name}\n{n.duration:.3f}s"
+        style = ", color=red, penwidth=2" if n.name in on_path else ""
+        lines.append(f"  {_quote(n.name)} [label={_quote(label)}{style}];")
+    for n in graph.nodes:
+        for upstream, names in n.depends_on.items():
+            style = ", color=red, penwidth=2" if (upstream, n.name) in path_edges else ""
+            label = _quote(", ".join(sorted(names)))
+            lines.append(f"  {_quote(upstream)} -> {_quote(n.name)} [label={label}{style}];")
+        for upstream, names in n.after.items():
+            style = ", color=red, penwidth=2" if (upstream, n.name) in path_edges else ""
+            label = _quote(", ".join(sorted(names)))
+            lines.append(
+                f"  {_quote(upstream)} -> {_quote(n.name)} [label={label}, style=dashed{style}];"
+            )
+    lines.append("}")
+    return "\n".join(lines)
+
+
+def _quote(text: str) -> str:
+    escaped = text.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return f'"{escaped}"'
+
+
+def to_text(graph: BlockGraph) -> str:
+    lines = []
+    for n in graph.nodes:
+        duration = "     -   " if n.duration is None else f"{n.duration:8.3f}s"
+        deps = ", ".join(
+            f"{upstream} ({', '.join(sorted(names))})" for upstream, names in n.depends_on.items()
+        )
+        after = ", ".join(
+            f"{upstream} ({', '.join(sorted(names))})" for upstream, names in n.after.items()
+        )
+        line = f"{duration}  {n.name}" + (f"  <- {deps}" if deps else "")
+        lines.append(line + (f"  after {after}" if after else ""))
+    if any(n.duration is not None for n in graph.nodes):
+        lines.append("")
+        lines.append(
+            f"Critical path: {' -> '.join(graph.critical_path)} "
+            f"({graph.critical_path_seconds:.3f}s of {graph.total_seconds:.3f}s total)"
+        )
+    return "\n".join(lines)
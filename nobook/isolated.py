@@ -0,0 +1,213 @@
+"""Run blocks in a child process with memory and CPU-time limits.
+
+The child keeps one namespace across blocks, like a kernel, so blocks run
+exactly as they would in-process. Limits are applied with `resource` in the
+child only:
+
+- RLIMIT_AS caps the child's address space. An oversized allocation fails
+  with MemoryError inside the block, which is reported as that block's error.
+- RLIMIT_CPU's soft limit is moved before each block, so every block gets its
+  own CPU-time budget; overrunning it raises CpuTimeExceeded in the block.
+
+Each result carries the child's peak resident memory while the block ran. If
+the child dies anyway (killed by a signal, or the OS OOM killer), the block
+fails with an error instead of taking the caller down, and the next block
+starts a fresh child.
+"""
+
+from __future__ import annotations
+
+import math
+import multiprocessing
+import re
+import signal
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from .executor import (
+    BlockResult,
+    new_namespace,
+    record_block_duration,
+    run_block,
+    select_blocks,
+)
+from .parser import Block, ParsedFile
+
+_SIZE_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([kmgt]?)i?b?\s*$", re.IGNORECASE)
+_SIZE_UNITS = {"": 1, "k": 1 << 10, "m": 1 << 20, "g": 1 << 30, "t": 1 << 40}
+
+
+class CpuTimeExceeded(Exception):
+    """Raised inside a block that used up its CPU-time budget."""
+
+
+def parse_size(text: str) -> int:
+    """Parse a byte size such as `512M`, `4G` or `1073741824`."""
+    m = _SIZE_RE.match(text)
+    if not m:
+        raise ValueError(f"Invalid size '{text}', expected e.g. 512M or 4G")
+    return int(float(m.group(1)) * _SIZE_UNITS[m.group(2).lower()])
+
+
+def _reset_peak_memory() -> None:
+    # Linux resets VmHWM when "5" is written to clear_refs; elsewhere the
+    # peak is the child's lifetime peak.
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _peak_memory() -> int | None:
+    """Peak resident memory of this process in bytes."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _child_main(conn, memory_limit: int | None, cpu_limit: int | None) -> None:
+    in_block = False
+
+    def on_xcpu(signum, frame):
+        if in_block:
+            raise CpuTimeExceeded(f"Block exceeded its CPU time limit of {cpu_limit}s")
+
+    if memory_limit is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    if cpu_limit is not None:
+        signal.signal(signal.SIGXCPU, on_xcpu)
+        cpu_hard = resource.getrlimit(resource.RLIMIT_CPU)[1]
+
+    namespace = new_namespace()
+    while True:
+        try:
+            block = conn.recv()
+        except EOFError:
+            return
+        if block is None:
+            return
+
+        if cpu_limit is not None:
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            soft = math.ceil(usage.ru_utime + usage.ru_stime) + cpu_limit
+            if cpu_hard != resource.RLIM_INFINITY:
+                soft = min(soft, cpu_hard)
+            resource.setrlimit(resource.RLIMIT_CPU, (soft, cpu_hard))
+        _reset_peak_memory()
+
+        in_block = True
+        try:
+            result = run_block(block, namespace)
+        finally:
+            in_block = False
+            if cpu_limit is not None:
+                resource.setrlimit(resource.RLIMIT_CPU, (cpu_hard, cpu_hard))
+
+        result.peak_memory = _peak_memory()
+        conn.send(result)
+
+
+class IsolatedExecutor:
+    """Execute blocks in a long-lived child process with resource limits.
+
+    Use as a context manager, or call `close()` when done.
+    """
+
+    def __init__(self, memory_limit: int | None = None, cpu_limit: int | None = None) -> None:
+        if resource is None and (memory_limit is not None or cpu_limit is not None):
+            raise OSError("Memory and CPU limits are not supported on this platform")
+        self.memory_limit = memory_limit
+        self.cpu_limit = cpu_limit
+        self._process = None
+        self._conn = None
+
+    def _start(self) -> None:
+        ctx = multiprocessing.get_context()
+        self._conn, child_conn = ctx.Pipe()
+        self._process = ctx.Process(
+            target=_child_main,
+            args=(child_conn, self.memory_limit, self.cpu_limit),
+            daemon=True,
+        )
+        self._process.start()
+        child_conn.close()
+
+    def run(self, block: Block) -> BlockResult:
+        """Run one block in the child's namespace."""
+        if self._process is None:
+            self._start()
+        try:
+            self._conn.send(block)
+            return self._conn.recv()
+        except (EOFError, OSError):
+            self._process.join()
+            code = self._process.exitcode
+            self._process = self._conn = None
+            if code is not None and code < 0:
+                reason = f"killed by {signal.Signals(-code).name}"
+            else:
+                reason = f"exit code {code}"
+            return BlockResult(
+                name=block.name,
+                stdout="",
+                error=f"Block process died ({reason}); its namespace was lost\n",
+            )
+
+    def execute_blocks(
+        self, parsed: ParsedFile, block_names: list[str] | None = None,
+    ) -> list[BlockResult]:
+        """Execute blocks like `executor.execute_blocks`, stopping at the first error."""
+        results: list[BlockResult] = []
+        for block in select_blocks(parsed, block_names):
+            started = time.perf_counter()
+            result = self.run(block)
+            record_block_duration(result, time.perf_counter() - started)
+            results.append(result)
+            if result.error is not None:
+                break
+        return results
+
+    def close(self) -> None:
+        if self._process is None:
+            return
+        try:
+            self._conn.send(None)
+        except OSError:
+            pass
+        self._process.join(timeout=5)
+        if self._process.is_alive():
+            self._process.kill()
+            self._process.join()
+        self._conn.close()
+        self._process = self._conn = None
+
+    def __enter__(self) -> IsolatedExecutor:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def execute_blocks_isolated(
+    parsed: ParsedFile,
+    block_names: list[str] | None = None,
+    memory_limit: int | None = None,
+    cpu_limit: int | None = None,
+) -> list[BlockResult]:
+    """Execute blocks in a fresh child process; see `IsolatedExecutor`."""
+    with IsolatedExecutor(memory_limit=memory_limit, cpu_limit=cpu_limit) as executor:
+        return executor.execute_blocks(parsed, block_names)
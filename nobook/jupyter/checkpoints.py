@@ -0,0 +1,238 @@
+"""Checkpoints that save a nobook notebook's .py together with its outputs.
+
+Jupyter's FileCheckpoints copies only the .py, so restoring a checkpoint
+brings back the code with whatever outputs are on disk now. A nobook
+checkpoint snapshots the .py, .out.py and .out.jsonl (when present) and
+restores all three together, under the same lock `nobook run` and the
+contents manager take for .out.py.
+
+Each file is cut into chunks: .py and .out.py at `# @block=` lines, so each
+chunk is one block's source or one block's outputs, and the append-only
+sidecar into runs of about CHUNK_BYTES. Chunks are stored zlib-compressed
+under `.ipynb_checkpoints/.nobook-chunks`, named by content hash. A new
+checkpoint only writes the chunks that changed since the last one, so
+checkpointing a notebook with large outputs after editing one block costs
+one small write plus the manifest. Chunks no manifest refers to any more
+are deleted.
+
+Files without `# @block=` markers get ordinary file checkpoints.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import glob
+import hashlib
+import json
+import os
+import re
+import zlib
+
+from jupyter_server.services.contents.filecheckpoints import FileCheckpoints
+
+from ..writer import locked
+
+CHUNK_DIR = ".nobook-chunks"
+CHUNK_BYTES = 256 * 1024
+MANIFEST_SUFFIX = ".nobook.json"
+
+# The files saved together, by suffix
+MEMBERS = (".py", ".out.py", ".out.jsonl")
+
+_MARKER_RE = re.compile(rb"^#[ \t]*@block=", re.MULTILINE)
+
+
+def split_chunks(data: bytes, member: str) -> list[bytes]:
+    """Cut file contents into chunks that stay the same when other parts change."""
+    if member == ".out.jsonl":
+        chunks, start = [], 0
+        while start < len(data):
+            end = data.find(b"\n", start + CHUNK_BYTES)
+            end = len(data) if end == -1 else end + 1
+            chunks.append(data[start:end])
+            start = end
+        return chunks
+    starts = [m.start() for m in _MARKER_RE.finditer(data)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    return [data[a:b] for a, b in zip(starts, [*starts[1:], len(data)]) if b > a]
+
+
+def _chunk_hash(chunk: bytes) -> str:
+    return hashlib.sha256(chunk).hexdigest()[:32]
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class NobookCheckpoints(FileCheckpoints):
+    """FileCheckpoints that keep a nobook notebook's outputs with its code."""
+
+    # ContentsManager-dependent checkpoint API
+    def create_checkpoint(self, contents_mgr, path):
+        """Create a checkpoint."""
+        checkpoint_id = "checkpoint"
+        manifest_path = self._manifest_path(checkpoint_id, path)
+        os_path = contents_mgr._get_os_path(path)
+        contents = None
+        if path.endswith(".py"):
+            with locked(self._member_path(os_path, ".out.py")):
+                contents = {member: self._read_member(os_path, member) for member in MEMBERS}
+        if contents is None or not _MARKER_RE.search(contents[".py"] or b""):
+            if os.path.isfile(manifest_path):  # The markers were removed since
+                self.delete_checkpoint(checkpoint_id, path)
+            return super().create_checkpoint(contents_mgr, path)
+
+        chunk_dir = os.path.join(os.path.dirname(manifest_path), CHUNK_DIR)
+        with locked(chunk_dir):
+            files = {
+                member: None if data is None else [
+                    self._put_chunk(chunk_dir, chunk) for chunk in split_chunks(data, member)
+                ]
+                for member, data in contents.items()
+            }
+            previous = self._read_manifest(manifest_path)
+            with self.perm_to_403():
+                _write_atomic(manifest_path, json.dumps({"files": files}).encode("utf-8"))
+            if previous is not None:
+                self._collect_garbage(chunk_dir, _chunk_refs(previous) - _chunk_refs(files))
+        # A plain copy from before the file had markers would otherwise be
+        # restored if the markers are removed again
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.checkpoint_path(checkpoint_id, path))
+        return self.checkpoint_model(checkpoint_id, manifest_path)
+
+    def restore_checkpoint(self, contents_mgr, checkpoint_id, path):
+        """Restore a checkpoint."""
+        manifest_path = self._manifest_path(checkpoint_id, path)
+        manifest = self._read_manifest(manifest_path)
+        if manifest is None:
+            return super().restore_checkpoint(contents_mgr, checkpoint_id, path)
+
+        chunk_dir = os.path.join(os.path.dirname(manifest_path), CHUNK_DIR)
+        os_path = contents_mgr._get_os_path(path)
+        # Read every chunk first, so a missing one can't leave a half-restored pair
+        contents = {
+            member: None if hashes is None else b"".join(
+                self._get_chunk(chunk_dir, h) for h in hashes
+            )
+            for member, hashes in manifest.items()
+        }
+        with locked(self._member_path(os_path, ".out.py")), self.perm_to_403():
+            for member, data in contents.items():
+                target = self._member_path(os_path, member)
+                if data is None:
+                    with contextlib.suppress(FileNotFoundError):
+                        os.unlink(target)
+                else:
+                    _write_atomic(target, data)
+
+    # ContentsManager-independent checkpoint API
+    def rename_checkpoint(self, checkpoint_id, old_path, new_path):
+        """Rename a checkpoint from old_path to new_path."""
+        old_manifest = self._manifest_path(checkpoint_id, old_path)
+        manifest = self._read_manifest(old_manifest)
+        if manifest is None:
+            return super().rename_checkpoint(checkpoint_id, old_path, new_path)
+
+        new_manifest = self._manifest_path(checkpoint_id, new_path)
+        old_chunks = os.path.join(os.path.dirname(old_manifest), CHUNK_DIR)
+        new_chunks = os.path.join(os.path.dirname(new_manifest), CHUNK_DIR)
+        if old_chunks == new_chunks:
+            with self.perm_to_403():
+                os.replace(old_manifest, new_manifest)
+            return
+        # Moved to another directory: its chunks go to that directory's store
+        with locked(new_chunks):
+            for h in _chunk_refs(manifest):
+                self._put_chunk(new_chunks, self._get_chunk(old_chunks, h), h)
+            with self.perm_to_403():
+                os.replace(old_manifest, new_manifest)
+        with locked(old_chunks):
+            self._collect_garbage(old_chunks, _chunk_refs(manifest))
+
+    def delete_checkpoint(self, checkpoint_id, path):
+        """delete a file's checkpoint"""
+        path = path.strip("/")
+        manifest_path = self._manifest_path(checkpoint_id, path)
+        manifest = self._read_manifest(manifest_path)
+        if manifest is None:
+            return super().delete_checkpoint(checkpoint_id, path)
+        chunk_dir = os.path.join(os.path.dirname(manifest_path), CHUNK_DIR)
+        with locked(chunk_dir):
+            with self.perm_to_403():
+                os.unlink(manifest_path)
+            self._collect_garbage(chunk_dir, _chunk_refs(manifest))
+
+    def list_checkpoints(self, path):
+        """list the checkpoints for a given file
+
+        This contents manager currently only supports one checkpoint per file.
+        """
+        path = path.strip("/")
+        checkpoint_id = "checkpoint"
+        manifest_path = self._manifest_path(checkpoint_id, path)
+        if os.path.isfile(manifest_path):
+            return [self.checkpoint_model(checkpoint_id, manifest_path)]
+        return super().list_checkpoints(path)
+
+    # Checkpoint-related utilities
+    def _manifest_path(self, checkpoint_id, path):
+        return os.path.splitext(self.checkpoint_path(checkpoint_id, path))[0] + MANIFEST_SUFFIX
+
+    @staticmethod
+    def _member_path(os_path, member):
+        return os_path.removesuffix(".py") + member
+
+    def _read_member(self, os_path, member):
+        try:
+            with open(self._member_path(os_path, member), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _read_manifest(manifest_path):
+        try:
+            with open(manifest_path, "rb") as f:
+                return json.loads(f.read())["files"]
+        except FileNotFoundError:
+            return None
+
+    def _put_chunk(self, chunk_dir, chunk, chunk_hash=None):
+        chunk_hash = chunk_hash or _chunk_hash(chunk)
+        chunk_path = os.path.join(chunk_dir, chunk_hash)
+        if not os.path.exists(chunk_path):
+            with self.perm_to_403():
+                os.makedirs(chunk_dir, exist_ok=True)
+                _write_atomic(chunk_path, zlib.compress(chunk))
+        return chunk_hash
+
+    def _get_chunk(self, chunk_dir, chunk_hash):
+        try:
+            with open(os.path.join(chunk_dir, chunk_hash), "rb") as f:
+                return zlib.decompress(f.read())
+        except (OSError, zlib.error) as e:
+            self.log.error("Checkpoint chunk %s is missing or corrupt: %s", chunk_hash, e)
+            raise
+
+    def _collect_garbage(self, chunk_dir, candidates):
+        """Delete chunks in `candidates` that no manifest next to `chunk_dir` uses."""
+        if not candidates:
+            return
+        cp_dir = os.path.dirname(chunk_dir)
+        for manifest_path in glob.glob(os.path.join(glob.escape(cp_dir), "*" + MANIFEST_SUFFIX)):
+            manifest = self._read_manifest(manifest_path)
+            if manifest is not None:
+                candidates = candidates - _chunk_refs(manifest)
+        for chunk_hash in candidates:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(os.path.join(chunk_dir, chunk_hash))
+
+
+def _chunk_refs(files: dict[str, list[str] | None]) -> set[str]:
+    return {h for hashes in files.values() if hashes for h in hashes}
@@ -2,225 +2,115 @@
 
 from __future__ import annotations
 
+import base64
+import os
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
 import nbformat
 from jupyter_server.services.contents.largefilemanager import LargeFileManager
+from tornado.web import HTTPError
+from traitlets import Bool, default
+
+# The conversion helpers moved to nobook.convert; the old private names stay
+# importable from here.
+from ..convert import (  # noqa: F401
+    _CELL_ID_RE,
+    _BlockNames,
+    _block_cells,
+    _outputs_digest,
+    _unique_block_name,
+)
+from ..convert import attach_outputs as _attach_outputs
+from ..convert import cell_outputs_to_lines as _cell_outputs_to_lines  # noqa: F401
+from ..convert import has_block_markers as _has_block_markers
+from ..convert import notebook_to_out_py as _notebook_to_out_py
+from ..convert import notebook_to_py as _notebook_to_py
+from ..convert import parse_out_py as _parse_out_py  # noqa: F401
+from ..convert import py_to_notebook as _py_to_notebook
+from ..convert import scan_out_py as _scan_out_py
+from ..lines import DEFAULT_STYLE, TextStyle, decode_source, encode_source, split_lines
+from ..metrics import inc, observe, timed
+from ..parser import block_hash
+from ..sidecar import append_records, make_record, read_sidecar
+from ..summary import BlobStore
+from ..writer import locked, merge_output
+from .checkpoints import NobookCheckpoints
+
+
+def _apply_cell_ids(nb: nbformat.NotebookNode, recorded: dict[str, str]) -> None:
+    """Give code cells the ids they had when last saved, keyed by block name.
+
+    Ids created by the frontend (new cells, or cells whose block was renamed)
+    then survive a reload, so clients diffing the model by cell id only see
+    the cells that actually changed.
+    """
+    if not recorded:
+        return
+    taken = {cell.get("id") for cell in nb.cells}
+    for block_name, cell in _block_cells(nb):
+        cell_id = recorded.get(block_name)
+        if cell_id is None or cell_id == cell.get("id") or cell_id in taken:
+            continue
+        if _CELL_ID_RE.match(cell_id):
+            taken.discard(cell.get("id"))
+            taken.add(cell_id)
+            cell.id = cell_id
 
-from ..formats import BLOCK_START_RE, OUTPUT_PREFIX, ERROR_PREFIX
 
+def _changed_output_blocks(nb: nbformat.NotebookNode) -> set[str]:
+    """Block names whose outputs differ from what was loaded from .out.py."""
+    changed: set[str] = set()
+    for block_name, cell in _block_cells(nb):
+        outputs = getattr(cell, "outputs", []) or []
+        if cell.metadata.get("nobook", {}).get("outputs") != _outputs_digest(outputs):
+            changed.add(block_name)
+    return changed
 
-def _has_block_markers(text: str) -> bool:
-    """Check if text contains at least one @block marker."""
-    for line in text.splitlines():
-        if BLOCK_START_RE.match(line):
-            return True
-    return False
 
+@dataclass
+class _Document:
+    """Server-side state of one .py notebook, shared by every client saving it."""
 
-def _py_to_notebook(text: str) -> nbformat.NotebookNode:
-    """Convert nobook-formatted .py text to a notebook node.
+    # .py text last read or written (with \n line endings), the (mtime_ns,
+    # size) it had on disk, and its encoding, BOM and line ending
+    text: str | None = None
+    stat: tuple[int, int] | None = None
+    style: TextStyle = DEFAULT_STYLE
+    # block name -> cell id as of the last save
+    cell_ids: dict[str, str] = field(default_factory=dict)
 
-    Handles duplicate block names gracefully by appending suffixes.
-    """
-    nb = nbformat.v4.new_notebook()
-    nb.metadata["nobook"] = True
-
-    used_names: set[str] = set()
-    preamble_lines: list[str] = []
-    current_block: str | None = None
-    current_lines: list[str] = []
-
-    def flush_block() -> None:
-        nonlocal current_block, current_lines
-        if current_block is not None:
-            name = _unique_block_name(current_block, used_names)
-            used_names.add(name)
-            cell = nbformat.v4.new_code_cell(source="\n".join(current_lines))
-            cell.id = name
-            cell.metadata["nobook"] = {"block": name}
-            nb.cells.append(cell)
-            current_block = None
-            current_lines = []
-
-    for line in text.splitlines():
-        m = BLOCK_START_RE.match(line)
-        if m:
-            flush_block()
-            current_block = m.group(1)
-        elif current_block is not None:
-            current_lines.append(line)
-        else:
-            preamble_lines.append(line)
-
-    flush_block()
-
-    # Insert preamble as a raw cell at the start
-    preamble_text = "\n".join(preamble_lines)
-    if preamble_text.strip():
-        cell = nbformat.v4.new_raw_cell(source=preamble_text)
-        cell.metadata["nobook"] = {"preamble": True}
-        nb.cells.insert(0, cell)
-
-    return nb
-
-
-def _unique_block_name(base: str, used: set[str]) -> str:
-    """Return a block name based on `base` that isn't in `used`."""
-    if base not in used:
-        return base
-    i = 1
-    while f"{base}-{i}" in used:
-        i += 1
-    return f"{base}-{i}"
-
-
-def _notebook_to_py(nb: nbformat.NotebookNode) -> str:
-    """Convert a notebook node back to nobook-formatted .py text."""
-    lines: list[str] = []
-    used_names: set[str] = set()
-    cell_counter = 0
-
-    for cell in nb.cells:
-        nobook_meta = cell.metadata.get("nobook", {})
-
-        if cell.cell_type == "raw" and nobook_meta.get("preamble"):
-            lines.extend(cell.source.splitlines())
-        elif cell.cell_type == "code":
-            base = nobook_meta.get("block", f"cell-{cell_counter}")
-            block_name = _unique_block_name(base, used_names)
-            used_names.add(block_name)
-            lines.append(f"# @block={block_name}")
-            lines.extend(cell.source.splitlines())
-        cell_counter += 1
-
-    return "\n".join(lines) + "\n"
-
-
-def _cell_outputs_to_lines(outputs: list) -> list[str]:
-    """Extract stdout and error lines from notebook cell outputs."""
-    lines: list[str] = []
-    for output in outputs:
-        output_type = output.get("output_type", "")
-        if output_type == "stream":
-            prefix = ERROR_PREFIX if output.get("name") == "stderr" else OUTPUT_PREFIX
-            text = output.get("text", "")
-            for line in text.rstrip("\n").splitlines():
-                lines.append(f"{prefix}{line}")
-        elif output_type == "execute_result":
-            data = output.get("data", {})
-            text = data.get("text/plain", "")
-            if text:
-                for line in text.rstrip("\n").splitlines():
-                    lines.append(f"{OUTPUT_PREFIX}{line}")
-        elif output_type == "error":
-            tb = output.get("traceback", [])
-            # Traceback entries may contain ANSI escape codes; strip them
-            import re
-            ansi_re = re.compile(r"\x1b\[[0-9;]*m")
-            for entry in tb:
-                clean = ansi_re.sub("", entry)
-                for line in clean.splitlines():
-                    lines.append(f"{ERROR_PREFIX}{line}")
-    return lines
-
-
-def _notebook_to_out_py(nb: nbformat.NotebookNode) -> str:
-    """Convert a notebook with outputs to .out.py format."""
-    lines: list[str] = []
-    used_names: set[str] = set()
-    cell_counter = 0
-    has_any_output = False
-
-    for cell in nb.cells:
-        nobook_meta = cell.metadata.get("nobook", {})
-
-        if cell.cell_type == "raw" and nobook_meta.get("preamble"):
-            lines.extend(cell.source.splitlines())
-        elif cell.cell_type == "code":
-            base = nobook_meta.get("block", f"cell-{cell_counter}")
-            block_name = _unique_block_name(base, used_names)
-            used_names.add(block_name)
-            lines.append(f"# @block={block_name}")
-            lines.extend(cell.source.splitlines())
-
-            # Append cell outputs
-            cell_outputs = getattr(cell, "outputs", []) or []
-            output_lines = _cell_outputs_to_lines(cell_outputs)
-            if output_lines:
-                has_any_output = True
-                lines.extend(output_lines)
-            elif cell_outputs == [] or cell_outputs is None:
-                # Cell has been executed with no output — add empty marker
-                pass
-        cell_counter += 1
-
-    if not has_any_output:
-        return ""
-
-    return "\n".join(lines) + "\n"
-
-
-def _parse_out_py(text: str) -> dict[str, list[dict]]:
-    """Parse .out.py text and return a map of block name -> notebook outputs.
-
-    Each block's output lines (# >>> ... and # !!! ...) are converted to
-    notebook-format output objects (stream/error).
-    """
-    block_outputs: dict[str, list[dict]] = {}
-    current_block: str | None = None
-    stdout_lines: list[str] = []
-    error_lines: list[str] = []
-
-    def flush_outputs() -> None:
-        nonlocal current_block, stdout_lines, error_lines
-        if current_block is None:
-            return
-        outputs: list[dict] = []
-        if stdout_lines:
-            outputs.append({
-                "output_type": "stream",
-                "name": "stdout",
-                "text": "\n".join(stdout_lines) + "\n",
-            })
-        if error_lines:
-            outputs.append({
-                "output_type": "stream",
-                "name": "stderr",
-                "text": "\n".join(error_lines) + "\n",
-            })
-        if outputs:
-            block_outputs[current_block] = outputs
-        current_block = None
-        stdout_lines = []
-        error_lines = []
-
-    for line in text.splitlines():
-        m = BLOCK_START_RE.match(line)
-        if m:
-            flush_outputs()
-            current_block = m.group(1)
-        elif line.startswith(OUTPUT_PREFIX):
-            stdout_lines.append(line[len(OUTPUT_PREFIX):])
-        elif line.startswith(ERROR_PREFIX):
-            error_lines.append(line[len(ERROR_PREFIX):])
-        # Source lines are ignored — we only care about outputs
-
-    flush_outputs()
-    return block_outputs
-
-
-def _attach_outputs(nb: nbformat.NotebookNode, block_outputs: dict[str, list[dict]]) -> None:
-    """Attach parsed outputs to matching notebook cells."""
-    for cell in nb.cells:
-        if cell.cell_type != "code":
-            continue
-        block_name = cell.metadata.get("nobook", {}).get("block")
-        if block_name and block_name in block_outputs:
-            cell.outputs = block_outputs[block_name]
+
+# Documents kept in memory; the least recently used is dropped beyond this.
+# Losing one only costs a redundant write and new ids for renamed cells.
+MAX_DOCUMENTS = 128
 
 
 class NobookContentsManager(LargeFileManager):
     """ContentsManager that opens .py files with @block markers as notebooks."""
 
+    output_sidecar = Bool(
+        False,
+        config=True,
+        help="Also write full cell outputs to a .out.jsonl sidecar next to .out.py. "
+        "An existing sidecar is always kept up to date and preferred when loading.",
+    )
+
+    output_blobs = Bool(
+        False,
+        config=True,
+        help="Save the full text of large outputs under .nobook/blobs next to the "
+        "notebook. .out.py always gets a bounded preview; this makes it point to the full text.",
+    )
+
+    @default("checkpoints_class")
+    def _checkpoints_class_default(self):
+        return NobookCheckpoints
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._documents: OrderedDict[str, _Document] = OrderedDict()
+
     def new_untitled(self, path="", type="", ext=""):
         if type == "notebook" or ext == ".ipynb":
             # Create a .py file with a block marker instead of .ipynb
@@ -239,14 +129,18 @@ class NobookContentsManager(LargeFileManager):
 
     def get(self, path, content=True, type=None, format=None, **kwargs):
         if path.endswith(".py") and type in (None, "notebook"):
-            return self._get_nobook(path, content, type, format, **kwargs)
+            with timed("nobook_contents_seconds", op="get"):
+                return self._get_nobook(path, content, type, format, **kwargs)
         return super().get(path, content=content, type=type, format=format, **kwargs)
 
     def _get_nobook(self, path, content, type, format, **kwargs):
-        model = super().get(path, content=True, type="file", format="text", **kwargs)
-
-        text = model.get("content", "")
-        if not isinstance(text, str) or not _has_block_markers(text):
+        model = super().get(path, content=False, type="file", **kwargs)
+        data, _ = self._read_file(self._get_os_path(path), "byte")
+        try:
+            text, style = decode_source(data)
+        except ValueError:
+            text = None
+        if text is None or not _has_block_markers(text):
             if type == "notebook":
                 return super().get(path, content=content, type=type, format=format, **kwargs)
             return super().get(path, content=content, type="file", format=format, **kwargs)
@@ -256,18 +150,32 @@ class NobookContentsManager(LargeFileManager):
         except Exception:
             # Fall back to plain file if parsing fails
             return super().get(path, content=content, type="file", format=format, **kwargs)
+        doc = self._document(path)
+        doc.text, doc.stat, doc.style = text, self._stat(path), style
+        _apply_cell_ids(nb, doc.cell_ids)
 
         # Try to load outputs from .out.py
         if content:
+            block_outputs: dict[str, list[dict]] = {}
+            source_hashes: dict[str, str] = {}
             try:
                 out_path = path.removesuffix(".py") + ".out.py"
                 out_model = super().get(out_path, content=True, type="file", format="text")
                 out_text = out_model.get("content", "")
                 if isinstance(out_text, str):
-                    block_outputs = _parse_out_py(out_text)
-                    _attach_outputs(nb, block_outputs)
+                    observe("nobook_out_py_bytes", len(out_text.encode("utf-8")), op="read")
+                    block_outputs, source_hashes = _scan_out_py(out_text)
             except Exception:
                 pass  # No .out.py or failed to parse — that's fine
+            records = self._read_sidecar(path)
+            for name, record in records.items():
+                block_outputs[name] = record["outputs"]
+                if "source_hash" in record:
+                    source_hashes[name] = record["source_hash"]
+            _attach_outputs(nb, block_outputs, source_hashes)
+            for block_name, cell in _block_cells(nb):
+                if block_name in records:
+                    cell.execution_count = records[block_name].get("execution_count")
 
         model["type"] = "notebook"
         if content:
@@ -280,7 +188,8 @@ class NobookContentsManager(LargeFileManager):
 
     def save(self, model, path=""):
         if path.endswith(".py") and model.get("type") == "notebook":
-            return self._save_nobook(model, path)
+            with timed("nobook_contents_seconds", op="save"):
+                return self._save_nobook(model, path)
         return super().save(model, path)
 
     def _save_nobook(self, model, path):
@@ -288,25 +197,140 @@ class NobookContentsManager(LargeFileManager):
         if isinstance(nb, dict):
             nb = nbformat.from_dict(nb)
 
+        doc = self._document(path)
+        if doc.text is None:
+            # Not read in this process (a restart, a REST client or an evicted
+            # document): keep the encoding and line endings the file has now
+            self._load_style(doc, path)
         py_content = _notebook_to_py(nb)
 
-        file_model = {
-            "type": "file",
-            "format": "text",
-            "content": py_content,
+        # Clients that save the same content (several collaborators, or an
+        # autosave with no edits) don't rewrite an unchanged file.
+        if py_content == doc.text and doc.stat is not None and self._stat(path) == doc.stat:
+            inc("nobook_writes_total", file="py", state="skipped")
+        else:
+            super().save(self._py_file_model(py_content, doc.style), path)
+            doc.text, doc.stat = py_content, self._stat(path)
+            inc("nobook_writes_total", file="py", state="written")
+        doc.cell_ids = {
+            block_name: cell.id for block_name, cell in _block_cells(nb) if cell.get("id")
         }
-        super().save(file_model, path)
 
         # Also write .out.py with cell outputs (if any cells have been executed)
-        out_content = _notebook_to_out_py(nb)
+        blobs = None
+        if self.output_blobs:
+            blobs = BlobStore(os.path.dirname(self._get_os_path(path)))
+        out_content = _notebook_to_out_py(nb, blobs)
         if out_content:
             out_path = path.removesuffix(".py") + ".out.py"
+            changed = _changed_output_blocks(nb)
+            unchanged = sum(1 for _ in _block_cells(nb)) - len(changed)
+            inc("nobook_outputs_saved_total", len(changed), state="changed")
+            inc("nobook_outputs_saved_total", unchanged, state="unchanged")
+            self._save_out_py(out_path, out_content, changed)
+            self._save_sidecar(path, nb, changed)
+
+        # Return a notebook-typed model
+        return self.get(path, content=False)
+
+    def _document(self, path):
+        """The in-memory state for `path`, marked as most recently used."""
+        doc = self._documents.get(path)
+        if doc is None:
+            doc = self._documents[path] = _Document()
+            while len(self._documents) > MAX_DOCUMENTS:
+                self._documents.popitem(last=False)
+        else:
+            self._documents.move_to_end(path)
+        return doc
+
+    def _load_style(self, doc, path):
+        """Fill in `doc` from the .py on disk, if there is a readable one."""
+        os_path = self._get_os_path(path)
+        if not os.path.isfile(os_path):
+            return
+        data, _ = self._read_file(os_path, "byte")
+        try:
+            text, style = decode_source(data)
+        except ValueError:
+            return
+        doc.text, doc.stat, doc.style = text, self._stat(path), style
+
+    def _py_file_model(self, py_content, style):
+        """File model writing `py_content` with the original file's encoding and line endings."""
+        if style == DEFAULT_STYLE:
+            return {"type": "file", "format": "text", "content": py_content}
+        try:
+            data = encode_source(py_content, style)
+        except UnicodeEncodeError as e:
+            raise HTTPError(
+                400, f"Can't save: the notebook has characters {style.encoding} can't encode",
+            ) from e
+        content = base64.b64encode(data).decode("ascii")
+        return {"type": "file", "format": "base64", "content": content}
+
+    def rename_file(self, old_path, new_path):
+        super().rename_file(old_path, new_path)
+        if old_path in self._documents:
+            self._documents[new_path] = self._documents.pop(old_path)
+
+    def delete_file(self, path):
+        super().delete_file(path)
+        self._documents.pop(path, None)
+
+    def _stat(self, path):
+        try:
+            st = os.stat(self._get_os_path(path))
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _save_out_py(self, out_path, out_content, blocks):
+        """Write .out.py, replacing only the outputs of `blocks`.
+
+        Other blocks keep the outputs currently on disk, which another client
+        or a `nobook run` may have written since this notebook was opened.
+        """
+        with locked(self._get_os_path(out_path)):
+            previous = ""
+            if self.file_exists(out_path):
+                prev_model = super().get(out_path, content=True, type="file", format="text")
+                if isinstance(prev_model.get("content"), str):
+                    previous = prev_model["content"]
+            merged = merge_output(out_content, previous, blocks)
+            if merged == previous:
+                inc("nobook_writes_total", file="out_py", state="skipped")
+                return
+            inc("nobook_writes_total", file="out_py", state="written")
+            observe("nobook_out_py_bytes", len(merged.encode("utf-8")), op="write")
             out_model = {
                 "type": "file",
                 "format": "text",
-                "content": out_content,
+                "content": merged,
             }
             super().save(out_model, out_path)
 
-        # Return a notebook-typed model
-        return self.get(path, content=False)
+    def _sidecar_os_path(self, path):
+        return self._get_os_path(path.removesuffix(".py") + ".out.jsonl")
+
+    def _read_sidecar(self, path):
+        try:
+            return read_sidecar(self._sidecar_os_path(path))
+        except Exception:
+            return {}  # Unreadable sidecar — fall back to .out.py
+
+    def _save_sidecar(self, path, nb, blocks):
+        os_path = self._sidecar_os_path(path)
+        if not (self.output_sidecar or os.path.exists(os_path)):
+            return
+        records = [
+            make_record(
+                block_name,
+                list(getattr(cell, "outputs", []) or []),
+                execution_count=cell.get("execution_count"),
+                source_hash=block_hash(split_lines(cell.source)),
+            )
+            for block_name, cell in _block_cells(nb)
+            if block_name in blocks
+        ]
+        append_records(os_path, records)
@@ -0,0 +1,161 @@
+"""REST endpoints for running nobook notebooks from headless clients.
+
+    POST /nobook/api/jobs               {"path": "nb.py", "blocks": [...], "timeout": 600}
+                                        -> 202 job
+    GET  /nobook/api/jobs/<id>          job status and results so far
+    GET  /nobook/api/jobs/<id>/events   BlockResults as server-sent events
+    GET  /nobook/metrics                conversion and execution metrics
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import json
+from dataclasses import asdict
+from pathlib import Path
+
+from jupyter_core.utils import ensure_async
+from jupyter_server.base.handlers import APIHandler
+from jupyter_server.utils import url_path_join
+from tornado import web
+from tornado.iostream import StreamClosedError
+
+from ..executor import BlockResult, select_blocks
+from ..metrics import REGISTRY
+from ..normalize import digests_path, write_digests
+from ..parser import ParsedFile, parse_file
+from ..sidecar import append_results, sidecar_path
+from ..writer import write_output
+from .jobs import Job, JobQueue, KernelPool, QueueFull
+
+
+def _write_results(path: Path, parsed: ParsedFile, results: list[BlockResult], blocks) -> None:
+    """Write a job's results the way `nobook run` does."""
+    out_path = path.with_suffix(".out.py")
+    write_output(parsed, results, out_path, blocks=blocks)
+    # An existing sidecar is what Jupyter loads outputs from, so keep it current
+    if sidecar_path(path).exists():
+        append_results(path, parsed, results)
+    if digests_path(path).exists():
+        write_digests(path, out_path)
+
+
+def make_runner(contents_manager, pool: KernelPool):
+    """Return a job runner that executes blocks in the notebook's kernel."""
+
+    async def run(job: Job) -> None:
+        # The path was checked by the contents manager when the job was submitted
+        path = Path(contents_manager.root_dir, *job.path.split("/"))
+        loop = asyncio.get_running_loop()
+        # parse_file honours the file's BOM or coding cookie, like `nobook run`
+        parsed = await loop.run_in_executor(None, parse_file, path)
+        blocks = select_blocks(parsed, job.blocks)
+        async with pool.lock(job.path):
+            for block in blocks:
+                result = await pool.execute(
+                    job.path, block.name, "\n".join(block.lines), timeout=job.timeout,
+                )
+                job.add_result(result)
+                if result.error is not None:
+                    break
+        # Writing blocks on file locks; keep it off the event loop
+        await loop.run_in_executor(None, functools.partial(
+            _write_results, path, parsed, job.results, [block.name for block in blocks],
+        ))
+
+    return run
+
+
+class JobsHandler(APIHandler):
+    @property
+    def job_queue(self) -> JobQueue:
+        return self.settings["nobook_jobs"]
+
+    @web.authenticated
+    async def post(self):
+        body = self.get_json_body() or {}
+        path = body.get("path")
+        blocks = body.get("blocks")
+        timeout = body.get("timeout")
+        if not isinstance(path, str) or not path.endswith(".py"):
+            raise web.HTTPError(400, "'path' must be a .py file")
+        if blocks is not None and not (
+            isinstance(blocks, list) and all(isinstance(b, str) for b in blocks)
+        ):
+            raise web.HTTPError(400, "'blocks' must be a list of block names")
+        if timeout is not None and not (
+            isinstance(timeout, (int, float)) and not isinstance(timeout, bool) and timeout > 0
+        ):
+            raise web.HTTPError(400, "'timeout' must be a positive number of seconds")
+        if not await ensure_async(self.contents_manager.file_exists(path)):
+            raise web.HTTPError(404, f"File not found: {path}")
+        try:
+            job = self.job_queue.submit(path, blocks, timeout)
+        except QueueFull as e:
+            raise web.HTTPError(429, str(e)) from None
+        self.set_status(202)
+        self.finish(json.dumps(job.to_dict()))
+
+
+class JobHandler(APIHandler):
+    def get_job(self, job_id: str) -> Job:
+        job = self.settings["nobook_jobs"].jobs.get(job_id)
+        if job is None:
+            raise web.HTTPError(404, f"No such job: {job_id}")
+        return job
+
+    @web.authenticated
+    async def get(self, job_id):
+        self.finish(json.dumps(self.get_job(job_id).to_dict()))
+
+
+class JobEventsHandler(JobHandler):
+    @web.authenticated
+    async def get(self, job_id):
+        job = self.get_job(job_id)
+        self.set_header("Content-Type", "text/event-stream")
+        self.set_header("Cache-Control", "no-cache")
+        try:
+            async for result in job.events():
+                self.write(f"event: block\ndata: {json.dumps(asdict(result))}\n\n")
+                await self.flush()
+            self.write(
+                f"event: done\ndata: {json.dumps({'status': job.status, 'error': job.error})}\n\n"
+            )
+            await self.finish()
+        except StreamClosedError:
+            pass  # The client went away; the job itself keeps running
+
+
+class MetricsHandler(APIHandler):
+    @web.authenticated
+    async def get(self):
+        self.finish(REGISTRY.render(), set_content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def setup_handlers(server_app) -> None:
+    """Register the job API, its queue and the metrics endpoint on the server's web app."""
+    web_app = server_app.web_app
+    pool = KernelPool(server_app.kernel_manager)
+    job_queue = JobQueue(make_runner(server_app.contents_manager, pool))
+    web_app.settings["nobook_jobs"] = job_queue
+
+    # Module extensions get no stop hook, so run ours before the server's
+    # own extension cleanup, which comes before it shuts the kernels down
+    cleanup_extensions = server_app.cleanup_extensions
+
+    async def cleanup() -> None:
+        await job_queue.shutdown()
+        await pool.shutdown()
+        await cleanup_extensions()
+
+    server_app.cleanup_extensions = cleanup
+
+    base = url_path_join(web_app.settings["base_url"], "nobook", "api", "jobs")
+    web_app.add_handlers(".*$", [
+        (base, JobsHandler),
+        (url_path_join(base, r"([0-9a-f]+)"), JobHandler),
+        (url_path_join(base, r"([0-9a-f]+)", "events"), JobEventsHandler),
+        (url_path_join(web_app.settings["base_url"], "nobook", "metrics"), MetricsHandler),
+    ])
@@ -0,0 +1,251 @@
+"""Asynchronous block-execution jobs for headless clients.
+
+Jobs go through a bounded queue and are executed by a fixed number of
+workers, so the server never runs more than `max_concurrent` notebooks at
+once and rejects new jobs once `max_queued` are waiting. Each job records
+its BlockResults as they arrive; listeners can stream them while the job
+is still running.
+
+Blocks run in a Jupyter kernel started through the server's kernel manager.
+Kernels are kept per notebook path and reused by later jobs for the same
+notebook, which run one after another on it. A block that runs past the
+job's timeout is interrupted, and a kernel found dead while a block runs is
+shut down, so the next job for that notebook starts a fresh one. Only the
+last `max_finished` finished jobs are kept for status queries.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import itertools
+import queue
+import re
+import uuid
+from collections import deque
+from collections.abc import AsyncIterator, Awaitable, Callable
+from dataclasses import asdict, dataclass, field
+
+from jupyter_core.utils import ensure_async
+
+from ..executor import BlockResult
+
+Runner = Callable[["Job"], Awaitable[None]]
+
+_ANSI_RE = re.compile(r"\x1b\[[0-9;]*m")
+
+# Seconds without kernel output after which liveness and the timeout are checked
+LIVENESS_INTERVAL = 5.0
+
+
+class QueueFull(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+@dataclass
+class Job:
+    path: str
+    blocks: list[str] | None = None
+    timeout: float | None = None  # seconds per block
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = "queued"  # queued -> running -> done | failed
+    results: list[BlockResult] = field(default_factory=list)
+    error: str | None = None
+    _changed: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    def add_result(self, result: BlockResult) -> None:
+        self.results.append(result)
+        self._notify()
+
+    def set_status(self, status: str, error: str | None = None) -> None:
+        self.status = status
+        self.error = error
+        self._notify()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "path": self.path,
+            "blocks": self.blocks,
+            "timeout": self.timeout,
+            "status": self.status,
+            "error": self.error,
+            "results": [asdict(r) for r in self.results],
+        }
+
+    async def events(self) -> AsyncIterator[BlockResult]:
+        """Yield results as they arrive, from the first, until the job finishes."""
+        for i in itertools.count():
+            while i >= len(self.results):
+                if self.finished:
+                    return
+                await self._changed.wait()
+            yield self.results[i]
+
+
+class JobQueue:
+    """Bounded queue of jobs executed by `max_concurrent` workers."""
+
+    def __init__(
+        self,
+        runner: Runner,
+        max_concurrent: int = 2,
+        max_queued: int = 16,
+        max_finished: int = 100,
+    ) -> None:
+        self.runner = runner
+        self.max_concurrent = max_concurrent
+        self.max_finished = max_finished
+        self.jobs: dict[str, Job] = {}
+        self._queue: asyncio.Queue[Job] = asyncio.Queue(maxsize=max_queued)
+        self._workers: list[asyncio.Task] = []
+        self._finished: deque[str] = deque()
+
+    def submit(
+        self, path: str, blocks: list[str] | None = None, timeout: float | None = None,
+    ) -> Job:
+        if not self._workers:
+            self._workers = [
+                asyncio.ensure_future(self._work()) for _ in range(self.max_concurrent)
+            ]
+        job = Job(path=path, blocks=blocks, timeout=timeout)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFull(f"Job queue is full ({self._queue.maxsize} waiting)") from None
+        self.jobs[job.id] = job
+        return job
+
+    async def _work(self) -> None:
+        while True:
+            job = await self._queue.get()
+            job.set_status("running")
+            try:
+                await self.runner(job)
+            except Exception as e:
+                job.set_status("failed", f"{type(e).__name__}: {e}")
+            else:
+                failed = any(r.error for r in job.results)
+                job.set_status("failed" if failed else "done")
+            finally:
+                self._forget_old(job)
+                self._queue.task_done()
+
+    def _forget_old(self, job: Job) -> None:
+        self._finished.append(job.id)
+        while len(self._finished) > self.max_finished:
+            self.jobs.pop(self._finished.popleft(), None)
+
+    async def join(self) -> None:
+        """Wait until every submitted job has finished."""
+        await self._queue.join()
+
+    async def shutdown(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+
+class KernelPool:
+    """One kernel per notebook path, started on demand and reused by later jobs."""
+
+    def __init__(self, kernel_manager, kernel_name: str | None = None) -> None:
+        self.kernel_manager = kernel_manager
+        self.kernel_name = kernel_name
+        self._clients: dict[str, object] = {}
+        self._kernel_ids: dict[str, str] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    def lock(self, path: str) -> asyncio.Lock:
+        return self._locks.setdefault(path, asyncio.Lock())
+
+    async def client(self, path: str):
+        client = self._clients.get(path)
+        if client is not None:
+            return client
+        kwargs = {"path": path.rpartition("/")[0]}
+        if self.kernel_name:
+            kwargs["kernel_name"] = self.kernel_name
+        kernel_id = await ensure_async(self.kernel_manager.start_kernel(**kwargs))
+        client = self.kernel_manager.get_kernel(kernel_id).client()
+        client.start_channels()
+        await client.wait_for_ready(timeout=60)
+        self._clients[path] = client
+        self._kernel_ids[path] = kernel_id
+        return client
+
+    async def execute(
+        self, path: str, name: str, code: str, timeout: float | None = None,
+    ) -> BlockResult:
+        """Execute `code` in the notebook's kernel and collect its output.
+
+        Gives up with an error result if the kernel dies, or after `timeout`
+        seconds, when the kernel is interrupted.
+        """
+        client = await self.client(path)
+        msg_id = client.execute(code, store_history=False)
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        stdout: list[str] = []
+        stderr: list[str] = []
+        error: str | None = None
+        while True:
+            wait = LIVENESS_INTERVAL
+            if deadline is not None:
+                if loop.time() >= deadline:
+                    await ensure_async(self.kernel_manager.interrupt_kernel(self._kernel_ids[path]))
+                    error = f"TimeoutError: block did not finish within {timeout:g}s\n"
+                    break
+                wait = min(wait, deadline - loop.time())
+            try:
+                msg = await client.get_iopub_msg(timeout=wait)
+            except queue.Empty:
+                if not await self._alive(path):
+                    await self.discard(path)
+                    error = "DeadKernelError: the kernel died while running this block\n"
+                    break
+                continue
+            if msg["parent_header"].get("msg_id") != msg_id:
+                continue
+            msg_type, content = msg["msg_type"], msg["content"]
+            if msg_type == "stream":
+                (stderr if content["name"] == "stderr" else stdout).append(content["text"])
+            elif msg_type == "execute_result":
+                stdout.append(content["data"].get("text/plain", "") + "\n")
+            elif msg_type == "error":
+                error = _ANSI_RE.sub("", "\n".join(content["traceback"])) + "\n"
+            elif msg_type == "status" and content["execution_state"] == "idle":
+                break
+        return BlockResult(
+            name=name, stdout="".join(stdout), error=error, stderr="".join(stderr),
+        )
+
+    async def _alive(self, path: str) -> bool:
+        try:
+            kernel = self.kernel_manager.get_kernel(self._kernel_ids[path])
+        except KeyError:
+            return False
+        return await ensure_async(kernel.is_alive())
+
+    async def discard(self, path: str) -> None:
+        """Forget the notebook's kernel and shut it down if it is still there."""
+        client = self._clients.pop(path, None)
+        if client is not None:
+            client.stop_channels()
+        kernel_id = self._kernel_ids.pop(path, None)
+        if kernel_id is not None:
+            with contextlib.suppress(Exception):
+                await ensure_async(self.kernel_manager.shutdown_kernel(kernel_id, now=True))
+
+    async def shutdown(self) -> None:
+        for path in list(self._clients):
+            await self.discard(path)
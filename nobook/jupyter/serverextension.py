@@ -1,4 +1,4 @@
-"""Jupyter server extension that registers the NobookContentsManager."""
+"""Jupyter server extension that registers the NobookContentsManager and REST API."""
 
 
 def _jupyter_server_extension_points():
@@ -6,8 +6,12 @@ def _jupyter_server_extension_points():
 
 
 def _load_jupyter_server_extension(server_app):
-    """Register NobookContentsManager with the server."""
+    """Register NobookContentsManager and the job API with the server."""
     from .contentsmanager import NobookContentsManager
+    from .handlers import setup_handlers
 
     server_app.contents_manager_class = NobookContentsManager
     server_app.log.info("nobook: ContentsManager registered")
+
+    setup_handlers(server_app)
+    server_app.log.info("nobook: job API registered at /nobook/api/jobs")
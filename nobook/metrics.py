@@ -0,0 +1,141 @@
+"""In-process counters and timers, exported in Prometheus text format.
+
+    with timed("nobook_convert_seconds", op="py_to_notebook"):
+        ...
+    inc("nobook_outputs_loaded_total", state="stale")
+    observe("nobook_out_py_bytes", len(text))
+
+Counters are plain totals; timers and observations are summaries (count
+and sum). The server exposes the registry at /nobook/metrics and the CLI can
+write it to a file with --metrics-file, e.g. for node_exporter's textfile
+collector.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import os
+import threading
+import time
+from pathlib import Path
+
+Labels = tuple[tuple[str, str], ...]
+
+HELP = {
+    "nobook_contents_seconds": "Time spent in NobookContentsManager get/save",
+    "nobook_convert_seconds": "Time spent converting between .py, notebooks and .out.py",
+    "nobook_out_py_bytes": "Size of .out.py files read and written",
+    "nobook_outputs_loaded_total": "Cell outputs loaded from disk, by freshness",
+    "nobook_outputs_saved_total": "Cell outputs on save, by whether they changed since loading",
+    "nobook_writes_total": "Notebook saves that wrote a file, or skipped it as unchanged",
+    "nobook_execute_seconds": "Time spent in execute_blocks",
+    "nobook_block_seconds": "Time spent executing a single block",
+    "nobook_block_errors_total": "Blocks that raised an exception",
+}
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: dict[str, dict[Labels, float]] = {}
+        self._summaries: dict[str, dict[Labels, list[float]]] = {}
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            stats = self._summaries.setdefault(name, {}).setdefault(key, [0, 0.0])
+            stats[0] += 1
+            stats[1] += value
+
+    def get(self, name: str, **labels: str) -> float:
+        """Counter value, or the count of observations for a summary."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            if name in self._counters:
+                return self._counters[name].get(key, 0)
+            return self._summaries.get(name, {}).get(key, [0, 0.0])[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._summaries.clear()
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines: list[str] = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                _header(lines, name, "counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_labels(key)} {_number(value)}")
+            for name, series in sorted(self._summaries.items()):
+                _header(lines, name, "summary")
+                for key, (count, total) in sorted(series.items()):
+                    lines.append(f"{name}_count{_labels(key)} {count}")
+                    lines.append(f"{name}_sum{_labels(key)} {_number(total)}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+
+def _header(lines: list[str], name: str, kind: str) -> None:
+    if name in HELP:
+        lines.append(f"# HELP {name} {HELP[name]}")
+    lines.append(f"# TYPE {name} {kind}")
+
+
+def _labels(key: Labels) -> str:
+    if not key:
+        return ""
+    parts = []
+    for k, v in key:
+        escaped = str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{k}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+REGISTRY = Registry()
+
+
+def inc(name: str, value: float = 1, **labels: str) -> None:
+    REGISTRY.inc(name, value, **labels)
+
+
+def observe(name: str, value: float, **labels: str) -> None:
+    REGISTRY.observe(name, value, **labels)
+
+
+class timed(contextlib.ContextDecorator):
+    """Record the duration of a block or function call as a summary."""
+
+    def __init__(self, name: str, **labels: str) -> None:
+        self.name = name
+        self.labels = labels
+
+    def _recreate_cm(self) -> timed:
+        # Decorated functions get a fresh instance per call, so concurrent or
+        # nested calls don't share `_start`
+        return type(self)(self.name, **self.labels)
+
+    def __enter__(self) -> timed:
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        observe(self.name, time.perf_counter() - self._start, **self.labels)
+
+
+def write_metrics_file(path: str | Path) -> None:
+    """Write the registry to `path` atomically, in Prometheus text format."""
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(REGISTRY.render(), encoding="utf-8")
+    os.replace(tmp_path, path)
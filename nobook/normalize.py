@@ -0,0 +1,158 @@
+"""Make block output reproducible, and digest it per block.
+
+Identical runs can print different text: object reprs carry memory addresses,
+tracebacks carry absolute paths, and timing code prints durations and
+timestamps. Scrubbers replace those with fixed placeholders before results
+are written, so `.out.py` only changes when the output meaningfully does:
+
+    results = normalize_results(execute_all(parsed), root=path.parent)
+
+Each scrubber is a named list of (regex, replacement) rules; see SCRUBBERS.
+"dates" and "durations" also match values that are part of the results,
+like a date column or `3 s`, so they only run when asked for by name.
+
+`output_digests` hashes each block's `# >>>`/`# !!!` lines in an `.out.py`,
+and `write_digests` saves them to `<name>.out.digests.json` along with one
+digest over all blocks. Comparing that single value tells CI whether any
+output changed without reading the outputs themselves.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import json
+import os
+import re
+import sys
+import sysconfig
+import tempfile
+from collections.abc import Iterable
+from pathlib import Path
+
+from .executor import BlockResult
+from .writer import split_output_lines
+
+Rule = tuple[re.Pattern, str]
+
+_UNITS = r"(?:ns|us|µs|ms|s|secs?|seconds?|mins?|minutes?|h|hours?)"
+
+SCRUBBERS: dict[str, list[Rule]] = {
+    # `<Foo object at 0x7f3a1c2b9d60>`; short hex literals are left alone
+    "addresses": [(re.compile(r"\b0x[0-9a-fA-F]{8,}\b"), "0x...")],
+    # ISO dates with a time of day, as printed by datetime and logging
+    "timestamps": [(
+        re.compile(
+            r"\b\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}"
+            r"(?::\d{2}(?:[.,]\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?\b"
+        ),
+        "<timestamp>",
+    )],
+    # Dates on their own, such as `date.today()`; these are often data
+    "dates": [(re.compile(r"\b\d{4}-\d{2}-\d{2}\b(?![T ]\d{2}:\d{2})"), "<date>")],
+    # `1.23s`, `45 ms`, and timedelta's `0:00:01.234567`
+    "durations": [
+        (re.compile(rf"\b\d+(?:\.\d+)?(?:e-?\d+)?\s?{_UNITS}(?!\w)"), "<duration>"),
+        (re.compile(r"\b\d+:\d{2}:\d{2}(?:\.\d+)?\b"), "<duration>"),
+    ],
+}
+# "paths" depends on where the notebook is, so its rules are built per call
+SCRUBBER_NAMES = ("addresses", "paths", "timestamps", "dates", "durations")
+DEFAULT_SCRUBBERS = ("addresses", "paths", "timestamps")
+
+# Python installed into these shares them with everything else on the
+# system, so shortening them to <python> would rewrite unrelated paths
+_SYSTEM_PREFIXES = {"/usr", "/usr/local", "/opt", "/opt/homebrew", "/opt/local"}
+
+
+def path_rules(root: str | Path | None = None) -> list[Rule]:
+    """Rules that shorten absolute paths: `root`, the Python install, temp and home."""
+    prefixes: dict[str, str] = {}
+    for key in ("purelib", "platlib"):
+        prefixes[sysconfig.get_paths()[key]] = "<site-packages>"
+    for prefix in (sys.prefix, sys.base_prefix, sys.exec_prefix):
+        if prefix.rstrip(os.sep) not in _SYSTEM_PREFIXES:
+            prefixes.setdefault(prefix, "<python>")
+    prefixes[tempfile.gettempdir()] = "<tmp>"
+    prefixes[os.path.expanduser("~")] = "~"
+    if root is not None:
+        prefixes[str(Path(root).resolve())] = "."
+    rules = []
+    # Longest first, so the notebook's own directory wins over home
+    for prefix in sorted(prefixes, key=len, reverse=True):
+        prefix = prefix.rstrip(os.sep)
+        if len(prefix) > 1:
+            pattern = re.compile(re.escape(prefix) + r"(?=[\\/\"':,\s]|$)", re.MULTILINE)
+            rules.append((pattern, prefixes[prefix].replace("\\", r"\\")))
+    return rules
+
+
+def build_rules(
+    names: Iterable[str] = DEFAULT_SCRUBBERS, root: str | Path | None = None,
+) -> list[Rule]:
+    """Rules for the scrubbers in `names`, in the order given."""
+    rules: list[Rule] = []
+    for name in names:
+        if name == "paths":
+            rules.extend(path_rules(root))
+        elif name in SCRUBBERS:
+            rules.extend(SCRUBBERS[name])
+        else:
+            raise ValueError(
+                f"Unknown scrubber '{name}', expected one of: {', '.join(SCRUBBER_NAMES)}"
+            )
+    return rules
+
+
+def scrub(text: str, rules: list[Rule]) -> str:
+    for pattern, replacement in rules:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def normalize_results(
+    results: list[BlockResult],
+    names: Iterable[str] = DEFAULT_SCRUBBERS,
+    root: str | Path | None = None,
+) -> list[BlockResult]:
+    """Copies of `results` with stdout and errors scrubbed.
+
+    Timing fields are kept; only the text that ends up in `.out.py` changes.
+    """
+    rules = build_rules(names, root)
+    return [
+        dataclasses.replace(
+            r,
+            stdout=scrub(r.stdout, rules),
+            stderr=scrub(r.stderr, rules),
+            error=None if r.error is None else scrub(r.error, rules),
+        )
+        for r in results
+    ]
+
+
+def digests_path(path: str | Path) -> Path:
+    """Return the `.out.digests.json` path for a notebook `.py` path."""
+    path = Path(path)
+    return path.with_name(path.name.removesuffix(".py") + ".out.digests.json")
+
+
+def output_digests(out_text: str) -> dict[str, str]:
+    """Map block name -> digest of its output lines in `.out.py` text."""
+    return {
+        name: hashlib.sha256("\n".join(lines).encode("utf-8")).hexdigest()[:16]
+        for name, lines in split_output_lines(out_text).items()
+    }
+
+
+def write_digests(path: str | Path, out_path: str | Path) -> Path:
+    """Digest the outputs in `out_path` and save them next to notebook `path`."""
+    blocks = output_digests(Path(out_path).read_text(encoding="utf-8"))
+    combined = hashlib.sha256(json.dumps(blocks).encode("utf-8")).hexdigest()[:16]
+    target = digests_path(path)
+    tmp_path = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(
+        json.dumps({"digest": combined, "blocks": blocks}, indent=2) + "\n", encoding="utf-8",
+    )
+    os.replace(tmp_path, target)
+    return target
@@ -0,0 +1,176 @@
+"""Parameterized runs: override the `parameters` block and fan out sweeps.
+
+A notebook declares its defaults in a block named `parameters`. A run with
+overrides gets an extra `injected-parameters` block right after it that
+assigns the new values, and writes `<name>.<hash>.out.py` where the hash
+identifies the parameter set.
+
+Blocks up to and including `parameters` cannot depend on the overrides, so a
+sweep executes them once. On platforms with `os.fork` each parameter set then
+runs in a forked child that inherits that namespace; elsewhere every run
+starts from scratch.
+"""
+
+from __future__ import annotations
+
+import ast
+import hashlib
+import json
+import os
+import sys
+import time
+import traceback
+from pathlib import Path
+
+from . import shared
+from .executor import BlockResult, execute_blocks, new_namespace
+from .parser import Block, ParsedFile
+from .writer import write_output
+
+PARAMETERS_BLOCK = "parameters"
+INJECTED_BLOCK = "injected-parameters"
+
+
+def parse_param(text: str) -> tuple[str, object]:
+    """Parse a `key=value` override; values are Python literals or strings."""
+    key, sep, value = text.partition("=")
+    key = key.strip()
+    if not sep or not key.isidentifier():
+        raise ValueError(f"Invalid parameter '{text}', expected key=value")
+    try:
+        return key, ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return key, value
+
+
+def load_sweep(path: str | Path) -> list[dict]:
+    """Read parameter sets from a JSON Lines file, one object per line."""
+    param_sets = []
+    for i, line in enumerate(Path(path).read_text(encoding="utf-8").splitlines()):
+        if not line.strip():
+            continue
+        params = json.loads(line)
+        if not isinstance(params, dict):
+            raise ValueError(f"{path}:{i + 1}: expected a JSON object")
+        param_sets.append(params)
+    return param_sets
+
+
+def param_hash(params: dict) -> str:
+    """Short stable hash identifying a parameter set."""
+    payload = json.dumps(params, sort_keys=True, default=repr)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:8]
+
+
+def param_out_path(path: str | Path, params: dict) -> Path:
+    """Return `<name>.<hash>.out.py` for a notebook path and parameter set."""
+    path = Path(path)
+    return path.with_name(f"{path.name.removesuffix('.py')}.{param_hash(params)}.out.py")
+
+
+def inject_parameters(parsed: ParsedFile, params: dict) -> ParsedFile:
+    """Return a copy of `parsed` with an override block after `parameters`."""
+    if PARAMETERS_BLOCK not in parsed.block_map:
+        raise KeyError(f"Block '{PARAMETERS_BLOCK}' not found")
+    blocks: list[Block] = []
+    for block in parsed.blocks:
+        blocks.append(block)
+        if block.name == PARAMETERS_BLOCK:
+            lines = [f"{key} = {value!r}" for key, value in params.items()]
+            blocks.append(Block(name=INJECTED_BLOCK, lines=lines, start_line=-1))
+    return ParsedFile(preamble=parsed.preamble, blocks=blocks, raw_lines=parsed.raw_lines)
+
+
+def _split_names(parsed: ParsedFile) -> tuple[list[str], list[str]]:
+    """Block names up to and including `parameters`, and those after it."""
+    names = [b.name for b in parsed.blocks]
+    i = names.index(PARAMETERS_BLOCK) + 1
+    return names[:i], names[i:]
+
+
+def _run_downstream(
+    path: Path,
+    parsed: ParsedFile,
+    params: dict,
+    upstream: list[BlockResult],
+    namespace: dict,
+) -> bool:
+    """Run the injected block and everything after it, then write the output."""
+    injected = inject_parameters(parsed, params)
+    _, downstream = _split_names(parsed)
+    results = list(upstream)
+    if not any(r.error for r in upstream):
+        results += execute_blocks(injected, [INJECTED_BLOCK, *downstream], namespace=namespace)
+    write_output(injected, results, param_out_path(path, params))
+    return not any(r.error for r in results)
+
+
+def run_sweep(
+    path: str | Path,
+    parsed: ParsedFile,
+    param_sets: list[dict],
+    jobs: int = 1,
+) -> list[tuple[Path, bool]]:
+    """Run `parsed` once per parameter set, up to `jobs` at a time.
+
+    Returns (output path, succeeded) per parameter set, in input order. Values
+    published with `nobook.shared` are visible to every parameter set.
+    """
+    path = Path(path)
+    inject_parameters(parsed, {})  # fail early if there's no parameters block
+    with shared.session():
+        return _run_sweep(path, parsed, param_sets, jobs)
+
+
+def _run_sweep(
+    path: Path, parsed: ParsedFile, param_sets: list[dict], jobs: int,
+) -> list[tuple[Path, bool]]:
+    upstream_names, _ = _split_names(parsed)
+
+    if not hasattr(os, "fork"):
+        outcomes = []
+        for params in param_sets:
+            namespace = new_namespace()
+            upstream = execute_blocks(parsed, upstream_names, namespace=namespace)
+            ok = _run_downstream(path, parsed, params, upstream, namespace)
+            outcomes.append((param_out_path(path, params), ok))
+        return outcomes
+
+    namespace = new_namespace()
+    upstream = execute_blocks(parsed, upstream_names, namespace=namespace)
+
+    succeeded = [False] * len(param_sets)
+    pending: dict[int, int] = {}
+
+    def reap() -> None:
+        # Poll only our own children; os.wait() could reap a child the
+        # caller started, whose pid isn't in `pending`
+        while True:
+            for pid in list(pending):
+                done, status = os.waitpid(pid, os.WNOHANG)
+                if done:
+                    succeeded[pending.pop(pid)] = os.waitstatus_to_exitcode(status) == 0
+                    return
+            time.sleep(0.01)
+
+    for i, params in enumerate(param_sets):
+        while len(pending) >= max(jobs, 1):
+            reap()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:  # child: inherits the upstream namespace copy-on-write
+            code = 1
+            try:
+                code = 0 if _run_downstream(path, parsed, params, upstream, namespace) else 1
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        pending[pid] = i
+    while pending:
+        reap()
+
+    return [(param_out_path(path, p), ok) for p, ok in zip(param_sets, succeeded)]
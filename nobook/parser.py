@@ -7,10 +7,12 @@ Lines before the first block are the preamble (preserved but not executed).
 
 from __future__ import annotations
 
+import hashlib
 from dataclasses import dataclass, field
 from pathlib import Path
 
 from .formats import BLOCK_START_RE
+from .lines import read_source, split_lines
 
 
 @dataclass
@@ -35,9 +37,15 @@ class ParseError(Exception):
     pass
 
 
+def block_hash(lines: list[str]) -> str:
+    """Short hash of a block's source, ignoring trailing whitespace."""
+    source = "\n".join(lines).rstrip()
+    return hashlib.sha1(source.encode("utf-8")).hexdigest()[:16]
+
+
 def parse_string(text: str) -> ParsedFile:
     """Parse a string containing pybooks-formatted Python code."""
-    raw_lines = text.splitlines()
+    raw_lines = split_lines(text)
     blocks: list[Block] = []
     seen_names: set[str] = set()
     preamble: list[str] = []
@@ -85,6 +93,10 @@ def parse_string(text: str) -> ParsedFile:
 
 
 def parse_file(path: str | Path) -> ParsedFile:
-    """Parse a .py file with @block markers."""
-    text = Path(path).read_text(encoding="utf-8")
+    """Parse a .py file with @block markers.
+
+    The file's BOM or coding cookie is honoured, and `\\r\\n` or `\\r` line
+    endings are read like `\\n`.
+    """
+    text, _ = read_source(path)
     return parse_string(text)
@@ -0,0 +1,335 @@
+"""Run several notebooks as a pipeline, skipping steps whose inputs haven't changed.
+
+A pipeline is a JSON manifest listing steps:
+
+    {"steps": [
+      {"name": "ingest", "notebook": "ingest.py", "outputs": ["data/raw.csv"]},
+      {"name": "train", "notebook": "train.py",
+       "inputs": ["data/raw.csv"], "outputs": ["model.pkl"], "params": {"epochs": 5}}
+    ]}
+
+Paths are relative to the manifest, and notebooks run with its directory as
+the working directory. A step runs after the steps that produce its inputs
+(or that it names in `after`); independent steps run in parallel worker
+processes.
+
+Every output a step declares is copied into a content-addressed store under
+`.nobook/artifacts`. A step's key is the hash of its notebook, its params and
+the contents of its inputs. When the key matches the last successful run,
+the step is skipped and any of its outputs that went missing or were changed
+are restored from the store, so downstream steps see exactly what they saw
+before.
+
+Values published with `nobook.shared` during a run are visible to every step.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from . import shared
+from .executor import execute_blocks
+from .normalize import digests_path, write_digests
+from .params import inject_parameters, param_out_path
+from .parser import parse_file
+from .sidecar import append_results, sidecar_path
+from .writer import write_output
+
+ARTIFACT_DIR = ".nobook/artifacts"
+STATE_FILE = ".nobook/pipeline.json"
+
+_FAILED = ("failed", "blocked")
+
+Log = Callable[[str], None]
+
+
+@dataclass
+class Step:
+    name: str
+    notebook: str
+    inputs: list[str] = field(default_factory=list)
+    outputs: list[str] = field(default_factory=list)
+    after: list[str] = field(default_factory=list)
+    params: dict = field(default_factory=dict)
+
+
+@dataclass
+class StepOutcome:
+    name: str
+    status: str  # "ran", "cached", "failed" or "blocked"
+    seconds: float = 0.0
+    error: str | None = None
+
+
+def load_pipeline(path: str | Path) -> list[Step]:
+    """Read a manifest and return its steps in dependency order."""
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    steps = []
+    for i, raw in enumerate(data.get("steps", [])):
+        if not isinstance(raw, dict) or "notebook" not in raw:
+            raise ValueError(f"{path}: step {i + 1} needs a 'notebook'")
+        raw.setdefault("name", Path(raw["notebook"]).stem)
+        unknown = set(raw) - set(Step.__dataclass_fields__)
+        if unknown:
+            raise ValueError(f"{path}: step '{raw['name']}' has unknown keys: {sorted(unknown)}")
+        steps.append(Step(**raw))
+    return order_steps(steps)
+
+
+def step_dependencies(steps: list[Step]) -> dict[str, set[str]]:
+    """Map step name -> names of the steps it waits for."""
+    producers: dict[str, str] = {}
+    for step in steps:
+        for output in step.outputs:
+            if output in producers:
+                raise ValueError(
+                    f"'{output}' is an output of both '{producers[output]}' and '{step.name}'"
+                )
+            producers[output] = step.name
+    names = {step.name for step in steps}
+    if len(names) != len(steps):
+        raise ValueError("Step names must be unique")
+    deps: dict[str, set[str]] = {}
+    for step in steps:
+        missing = set(step.after) - names
+        if missing:
+            raise ValueError(f"Step '{step.name}' runs after unknown steps: {sorted(missing)}")
+        deps[step.name] = set(step.after) | {
+            producers[i] for i in step.inputs if i in producers
+        }
+        deps[step.name].discard(step.name)
+    return deps
+
+
+def order_steps(steps: list[Step]) -> list[Step]:
+    """Topologically sort steps, keeping manifest order among independent ones."""
+    deps = step_dependencies(steps)
+    ordered: list[Step] = []
+    done: set[str] = set()
+    remaining = list(steps)
+    while remaining:
+        ready = [s for s in remaining if deps[s.name] <= done]
+        if not ready:
+            raise ValueError(f"Steps form a cycle: {', '.join(s.name for s in remaining)}")
+        for step in ready:
+            ordered.append(step)
+            done.add(step.name)
+        remaining = [s for s in remaining if s.name not in done]
+    return ordered
+
+
+def file_hash(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ArtifactStore:
+    """Content-addressed copies of step outputs, in `.nobook/artifacts` under `root`."""
+
+    def __init__(self, root: str | Path) -> None:
+        self.root = Path(root) / ARTIFACT_DIR
+
+    def path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    def put(self, path: Path) -> str:
+        """Copy `path` into the store and return its digest."""
+        digest = file_hash(path)
+        target = self.path(digest)
+        if not target.exists():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = target.with_name(f".{digest}.{os.getpid()}.tmp")
+            shutil.copyfile(path, tmp_path)
+            os.replace(tmp_path, target)
+        return digest
+
+    def has(self, digest: str) -> bool:
+        return self.path(digest).exists()
+
+    def restore(self, digest: str, path: Path) -> None:
+        """Write the stored artifact `digest` to `path`."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        shutil.copyfile(self.path(digest), tmp_path)
+        os.replace(tmp_path, path)
+
+
+class _Hashes:
+    """File digests, re-hashing only files whose size or mtime changed."""
+
+    def __init__(self, known: dict[str, dict]) -> None:
+        self.known = known
+
+    def get(self, path: Path) -> str | None:
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            return None
+        entry = self.known.get(str(path))
+        if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            return entry["sha256"]
+        digest = file_hash(path)
+        self.known[str(path)] = {"sha256": digest, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+        return digest
+
+
+def step_key(step: Step, base: Path, hashes: _Hashes) -> str | None:
+    """Hash of the notebook, params and input contents; None if an input is missing."""
+    h = hashlib.sha256()
+    h.update(json.dumps(step.params, sort_keys=True, default=repr).encode("utf-8"))
+    for name in [step.notebook, *sorted(step.inputs)]:
+        digest = hashes.get(base / name)
+        if digest is None:
+            return None
+        h.update(f"\0{name}\0{digest}".encode("utf-8"))
+    return h.hexdigest()
+
+
+def _run_step(base: str, step: Step) -> str | None:
+    """Execute one notebook in a worker process; return an error or None."""
+    os.chdir(base)
+    path = Path(step.notebook)
+    parsed = parse_file(path)
+    if step.params:
+        # Like `nobook run --param`: one output file per parameter set, and
+        # the notebook's own sidecar and digests are left alone
+        parsed = inject_parameters(parsed, step.params)
+        results = execute_blocks(parsed)
+        write_output(parsed, results, param_out_path(path, step.params))
+    else:
+        results = execute_blocks(parsed)
+        out_path = path.with_suffix(".out.py")
+        write_output(parsed, results, out_path)
+        if sidecar_path(path).exists():
+            append_results(path, parsed, results)
+        if digests_path(path).exists():
+            write_digests(path, out_path)
+    for r in results:
+        if r.error:
+            return f"block '{r.name}' failed:\n{r.error}"
+    missing = [o for o in step.outputs if not Path(o).exists()]
+    if missing:
+        return f"declared outputs were not written: {', '.join(missing)}"
+    return None
+
+
+def _load_state(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _save_state(path: Path, state: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(state, indent=1), encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def run_pipeline(
+    manifest: str | Path,
+    jobs: int | None = None,
+    force: bool = False,
+    log: Log = print,
+) -> list[StepOutcome]:
+    """Run the pipeline in `manifest`, up to `jobs` notebooks at a time (default: one per CPU).
+
+    Returns one outcome per step, in dependency order.
+    """
+    manifest = Path(manifest)
+    base = manifest.resolve().parent
+    steps = load_pipeline(manifest)
+    deps = step_dependencies(steps)
+    store = ArtifactStore(base)
+    state_path = base / STATE_FILE
+    state = _load_state(state_path)
+    records: dict[str, dict] = state.setdefault("steps", {})
+    hashes = _Hashes(state.setdefault("files", {}))
+
+    outcomes: dict[str, StepOutcome] = {}
+    keys: dict[str, str] = {}
+    started: dict[str, float] = {}
+
+    def finish(outcome: StepOutcome) -> None:
+        outcomes[outcome.name] = outcome
+        message = f"{outcome.name}: {outcome.status}"
+        if outcome.status == "ran":
+            message += f" ({outcome.seconds:.1f}s)"
+        if outcome.error:
+            message += f"\n{outcome.error.rstrip()}"
+        log(message)
+
+    def try_cached(step: Step) -> bool:
+        record = records.get(step.name)
+        if force or not record or record.get("key") != keys[step.name]:
+            return False
+        artifacts = record.get("outputs", {})
+        if set(artifacts) != set(step.outputs) or not all(map(store.has, artifacts.values())):
+            return False
+        for output, digest in artifacts.items():
+            if hashes.get(base / output) != digest:
+                store.restore(digest, base / output)
+        return True
+
+    def collect(step: Step, error: str | None) -> None:
+        seconds = time.perf_counter() - started.pop(step.name)
+        if error is None:
+            records[step.name] = {
+                "key": keys[step.name],
+                "outputs": {o: store.put(base / o) for o in step.outputs},
+            }
+            finish(StepOutcome(step.name, "ran", seconds))
+        else:
+            records.pop(step.name, None)
+            finish(StepOutcome(step.name, "failed", seconds, error))
+        _save_state(state_path, state)
+
+    pending = list(steps)
+    with shared.session(), ProcessPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as pool:
+        running: dict = {}
+        while pending or running:
+            for step in list(pending):
+                if not deps[step.name] <= outcomes.keys():
+                    continue
+                pending.remove(step)
+                failed = [d for d in sorted(deps[step.name]) if outcomes[d].status in _FAILED]
+                if failed:
+                    error = f"depends on failed step '{failed[0]}'"
+                    finish(StepOutcome(step.name, "blocked", error=error))
+                    continue
+                key = step_key(step, base, hashes)
+                if key is None:
+                    missing = [i for i in [step.notebook, *step.inputs] if not (base / i).exists()]
+                    finish(StepOutcome(step.name, "failed", error=f"missing: {', '.join(missing)}"))
+                    continue
+                keys[step.name] = key
+                if try_cached(step):
+                    finish(StepOutcome(step.name, "cached"))
+                    continue
+                started[step.name] = time.perf_counter()
+                running[pool.submit(_run_step, str(base), step)] = step
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                step = running.pop(future)
+                try:
+                    error = future.result()
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+                collect(step, error)
+
+    _save_state(state_path, state)
+    return [outcomes[step.name] for step in steps]
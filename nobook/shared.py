@@ -0,0 +1,155 @@
+"""Read-only data shared between the workers of a sweep or pipeline.
+
+A block that loads a large reference dataset can publish it once and let
+every other worker map the same memory instead of loading its own copy:
+
+    from nobook import shared
+    table = shared.get_or_create("reference", lambda: np.load("reference.npy"))
+
+Values are NumPy arrays or anything with the buffer protocol (bytes, Arrow
+buffers, ...). They're written once to a file in the runner's shared
+directory and memory-mapped read-only by every process that asks for them,
+so the OS keeps a single copy in the page cache. NumPy arrays come back as
+read-only `np.memmap`s, other values as read-only `memoryview`s.
+
+`nobook run --sweep` and `nobook pipeline` open a session that creates the
+directory (on /dev/shm where it exists) and removes it when the run ends.
+Outside a session, each process gets a private directory that is removed
+at exit. Only `session()` changes the environment, and an inherited
+directory that no longer exists is ignored.
+"""
+
+from __future__ import annotations
+
+import atexit
+import contextlib
+import mmap
+import os
+import re
+import shutil
+import tempfile
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+from .writer import locked
+
+ENV_VAR = "NOBOOK_SHARED_DIR"
+
+_NAME_RE = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+# This process's directory when there is no session
+_private_dir: str | None = None
+
+
+def _make_dir() -> str:
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else None
+    return tempfile.mkdtemp(prefix="nobook-shared-", dir=base)
+
+
+def _session_dir() -> str | None:
+    """The directory of the session this process is in, if it still exists."""
+    path = os.environ.get(ENV_VAR)
+    return path if path is not None and os.path.isdir(path) else None
+
+
+def shared_dir() -> Path:
+    """The current session's directory, creating a private one if there's no session."""
+    global _private_dir
+    path = _session_dir()
+    if path is None:
+        if _private_dir is None or not os.path.isdir(_private_dir):
+            _private_dir = _make_dir()
+            atexit.register(shutil.rmtree, _private_dir, True)
+        path = _private_dir
+    return Path(path)
+
+
+@contextlib.contextmanager
+def session() -> Iterator[Path]:
+    """Share values between this process and the workers it starts.
+
+    Workers inherit the directory through the environment. It's removed
+    when the session ends. Nested sessions reuse the outer one.
+    """
+    path = _session_dir()
+    if path is not None:
+        yield Path(path)
+        return
+    inherited = os.environ.get(ENV_VAR)
+    path = _make_dir()
+    os.environ[ENV_VAR] = path
+    try:
+        yield Path(path)
+    finally:
+        if inherited is None:
+            del os.environ[ENV_VAR]
+        else:
+            os.environ[ENV_VAR] = inherited
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def _paths(name: str) -> tuple[Path, Path]:
+    if not _NAME_RE.match(name):
+        raise ValueError(f"Invalid shared name '{name}', use letters, digits, '_', '-' and '.'")
+    root = shared_dir()
+    return root / f"{name}.npy", root / f"{name}.bin"
+
+
+def _is_ndarray(value) -> bool:
+    return type(value).__module__.split(".")[0] == "numpy" and hasattr(value, "dtype")
+
+
+def _write(name: str, value) -> None:
+    npy_path, bin_path = _paths(name)
+    path = npy_path if _is_ndarray(value) else bin_path
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        if path is npy_path:
+            import numpy as np
+
+            np.save(f, value, allow_pickle=False)
+        else:
+            f.write(memoryview(value).cast("B"))
+    os.replace(tmp_path, path)
+    # A value published under the same name with the other format is stale now
+    (bin_path if path is npy_path else npy_path).unlink(missing_ok=True)
+
+
+def attach(name: str):
+    """Map the published value `name`; raises KeyError if nobody published it."""
+    npy_path, bin_path = _paths(name)
+    if npy_path.exists():
+        import numpy as np
+
+        return np.load(npy_path, mmap_mode="r")
+    try:
+        with open(bin_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return memoryview(b"")
+            return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+    except FileNotFoundError:
+        raise KeyError(f"No shared value named '{name}'") from None
+
+
+def publish(name: str, value):
+    """Share `value` under `name`, replacing any earlier value, and return its mapping."""
+    _write(name, value)
+    return attach(name)
+
+
+def get_or_create(name: str, factory: Callable[[], object]):
+    """Attach to `name`, or publish `factory()` under it if it isn't there yet.
+
+    Workers asking for the same name at once wait for the first one, so
+    `factory` runs once per session.
+    """
+    try:
+        return attach(name)
+    except KeyError:
+        pass
+    npy_path, _ = _paths(name)
+    with locked(npy_path):
+        try:
+            return attach(name)
+        except KeyError:
+            return publish(name, factory())
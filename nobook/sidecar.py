@@ -0,0 +1,130 @@
+"""Structured JSON Lines sidecar (`.out.jsonl`) for block outputs.
+
+`.out.py` is the human-readable view of a run; it merges stdout and stderr
+and drops MIME types and execution counts. The sidecar keeps the full
+notebook-format outputs, one JSON record per line:
+
+    {"block": "setup", "outputs": [...], "execution_count": 3}
+
+The file is append-only: writers append a record per block they produced and
+readers take the last record for each block. Every record starts with its
+block name, so building the block -> offset index only decodes that one
+string per line, and `read_sidecar` seeks straight to the records it needs.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+
+from .executor import BlockResult
+from .parser import ParsedFile, block_hash
+from .writer import locked
+
+_RECORD_PREFIX = b'{"block": '
+_decoder = json.JSONDecoder()
+
+
+def sidecar_path(path: str | Path) -> Path:
+    """Return the `.out.jsonl` path for a notebook `.py` path."""
+    path = Path(path)
+    return path.with_name(path.name.removesuffix(".py") + ".out.jsonl")
+
+
+def result_outputs(result: BlockResult) -> list[dict]:
+    """Convert a CLI BlockResult to notebook-format outputs."""
+    outputs: list[dict] = []
+    if result.stdout:
+        outputs.append({"output_type": "stream", "name": "stdout", "text": result.stdout})
+    if result.stderr:
+        outputs.append({"output_type": "stream", "name": "stderr", "text": result.stderr})
+    if result.error:
+        tb = result.error.rstrip("\n").splitlines()
+        ename, _, evalue = tb[-1].partition(": ") if tb else ("Error", "", "")
+        outputs.append({
+            "output_type": "error",
+            "ename": ename,
+            "evalue": evalue,
+            "traceback": tb,
+        })
+    return outputs
+
+
+def make_record(block: str, outputs: list[dict], **fields) -> dict:
+    """Build a sidecar record; `block` is always the first key."""
+    return {"block": block, "outputs": outputs, **fields}
+
+
+def append_results(path: str | Path, parsed: ParsedFile, results: list[BlockResult]) -> None:
+    """Append a record per CLI result to the sidecar of notebook `path`."""
+    records = []
+    for r in results:
+        fields = {"source_hash": block_hash(parsed.block_map[r.name].lines)}
+        if r.duration is not None:
+            fields["duration"] = round(r.duration, 6)
+        if r.peak_memory is not None:
+            fields["peak_memory"] = r.peak_memory
+        records.append(make_record(r.name, result_outputs(r), **fields))
+    append_records(sidecar_path(path), records)
+
+
+def index_sidecar(data: bytes) -> tuple[dict[str, tuple[int, int]], int]:
+    """Map block name -> (offset, length) of its latest record in `data`.
+
+    Also returns the total number of records, so callers can tell how many
+    are superseded.
+    """
+    index: dict[str, tuple[int, int]] = {}
+    count = 0
+    pos = 0
+    end = len(data)
+    while pos < end:
+        nl = data.find(b"\n", pos)
+        if nl == -1:
+            nl = end
+        if data.startswith(_RECORD_PREFIX, pos):
+            line = data[pos:nl].decode("utf-8")
+            name, _ = _decoder.raw_decode(line, len(_RECORD_PREFIX))
+            index[name] = (pos, nl - pos)
+            count += 1
+        pos = nl + 1
+    return index, count
+
+
+def read_sidecar(path: str | Path, blocks: set[str] | None = None) -> dict[str, dict]:
+    """Return the latest record per block, optionally only for `blocks`."""
+    try:
+        data = Path(path).read_bytes()
+    except FileNotFoundError:
+        return {}
+    index, _ = index_sidecar(data)
+    records: dict[str, dict] = {}
+    for name, (offset, length) in index.items():
+        if blocks is None or name in blocks:
+            records[name] = json.loads(data[offset:offset + length])
+    return records
+
+
+def append_records(path: str | Path, records: list[dict]) -> None:
+    """Append records to the sidecar, compacting it once most lines are stale."""
+    if not records:
+        return
+    path = Path(path)
+    payload = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+    with locked(path):
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(payload)
+        data = path.read_bytes()
+        index, count = index_sidecar(data)
+        if count > 2 * len(index):
+            _compact(path, data, index)
+
+
+def _compact(path: Path, data: bytes, index: dict[str, tuple[int, int]]) -> None:
+    live = sorted(index.values())
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        for offset, length in live:
+            f.write(data[offset:offset + length] + b"\n")
+    os.replace(tmp_path, path)
@@ -0,0 +1,89 @@
+"""Bounded previews of large outputs, with an optional store for full values.
+
+An echoed DataFrame or a long print loop can produce megabytes of text.
+Outputs over MAX_LINES lines or MAX_CHARS characters are written to .out.py
+as a preview instead: the first PREVIEW_HEAD and last PREVIEW_TAIL lines
+(which keep pandas' `[N rows x M columns]` footer and numpy's `dtype=...`)
+around a marker line with the size of what was left out.
+
+With a BlobStore, the full text is saved under `.nobook/blobs/` next to the
+notebook, named by its content hash, and the marker line points to it.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+from pathlib import Path
+
+MAX_LINES = 60
+MAX_CHARS = 32 * 1024
+MAX_LINE_CHARS = 500
+PREVIEW_HEAD = 20
+PREVIEW_TAIL = 10
+
+BLOB_DIR = ".nobook/blobs"
+
+
+def format_size(size: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def is_large(text: str) -> bool:
+    return len(text) > MAX_CHARS or text.count("\n") >= MAX_LINES
+
+
+def preview(text: str, blob_ref: str | None = None) -> str:
+    """Return `text`, or a bounded preview of it if it's large."""
+    if not is_large(text):
+        return text
+    lines = text.rstrip("\n").splitlines()
+    if len(lines) > PREVIEW_HEAD + PREVIEW_TAIL:
+        head, tail = lines[:PREVIEW_HEAD], lines[-PREVIEW_TAIL:]
+    else:
+        head, tail = lines, []
+    omitted = len(lines) - len(head) - len(tail)
+    size = format_size(len(text.encode("utf-8")))
+    marker = f"... {omitted:,} more lines, {size} in total" if omitted else f"... {size} in total"
+    if blob_ref:
+        marker += f", full output in {blob_ref}"
+    kept = [_clip(line) for line in head] + [marker + " ..."] + [_clip(line) for line in tail]
+    return "\n".join(kept) + "\n"
+
+
+def _clip(line: str) -> str:
+    if len(line) <= MAX_LINE_CHARS:
+        return line
+    return f"{line[:MAX_LINE_CHARS]}... ({len(line) - MAX_LINE_CHARS:,} more characters)"
+
+
+class BlobStore:
+    """Content-addressed store for full output text, in `.nobook/blobs` under `root`."""
+
+    def __init__(self, root: str | Path) -> None:
+        self.root = Path(root)
+
+    def put(self, text: str) -> str:
+        """Save `text` and return its path relative to `root`."""
+        data = text.encode("utf-8")
+        name = f"{BLOB_DIR}/{hashlib.sha256(data).hexdigest()[:16]}.txt"
+        path = self.root / name
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        return name
+
+    def get(self, ref: str) -> str:
+        return (self.root / ref).read_text(encoding="utf-8")
+
+    def summarize(self, text: str) -> str:
+        """Preview of `text`, saving the full text first if it's large."""
+        if not is_large(text):
+            return text
+        return preview(text, self.put(text))
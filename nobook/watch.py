@@ -0,0 +1,195 @@
+"""Watch mode: re-execute only the blocks affected by each save.
+
+The session keeps one live namespace across runs, like a Jupyter kernel.
+Blocks share that namespace in file order, so a changed block invalidates
+every block after it: each save re-runs from the first block whose name or
+source differs from what was last executed successfully.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import os
+import select
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from .executor import BlockResult, execute_blocks, new_namespace
+from .parser import ParsedFile, ParseError, block_hash, parse_file
+
+WriteResults = Callable[[ParsedFile, list[BlockResult]], None]
+
+# inotify(7) event mask: anything that can change the file's contents
+_IN_MODIFY = 0x002
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+
+
+def block_keys(parsed: ParsedFile) -> list[tuple[str, str]]:
+    """Return (name, source hash) for each block in file order."""
+    return [(b.name, block_hash(b.lines)) for b in parsed.blocks]
+
+
+def affected_blocks(executed: list[tuple[str, str]], parsed: ParsedFile) -> list[str]:
+    """Names of blocks to re-run, given the (name, hash) keys already executed."""
+    keys = block_keys(parsed)
+    i = 0
+    while i < min(len(executed), len(keys)) and executed[i] == keys[i]:
+        i += 1
+    return [name for name, _ in keys[i:]]
+
+
+def _signature(path: Path) -> tuple[int, int] | None:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class _Inotify:
+    """Minimal inotify watch on a directory; raises OSError when unavailable."""
+
+    def __init__(self, directory: Path) -> None:
+        libc_name = ctypes.util.find_library("c")
+        if libc_name is None:
+            raise OSError("libc not found")
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify not supported")
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+
+    def wait(self, timeout: float) -> None:
+        """Block until some event arrives in the directory, or `timeout`."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if ready:
+            try:
+                while os.read(self.fd, 65536):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class FileWatcher:
+    """Detect saves of one file, via inotify on Linux or by polling stat()."""
+
+    def __init__(self, path: str | Path, poll_interval: float = 0.5) -> None:
+        self.path = Path(path)
+        self.poll_interval = poll_interval
+        try:
+            self._inotify: _Inotify | None = _Inotify(self.path.resolve().parent)
+        except (OSError, AttributeError):
+            self._inotify = None
+        self.mark()
+
+    def mark(self) -> None:
+        """Remember the current file state as the one being executed."""
+        self._signature = _signature(self.path)
+
+    def changed(self) -> bool:
+        """Whether the file was saved since the last `mark()`."""
+        return _signature(self.path) != self._signature
+
+    def _sleep(self, timeout: float) -> None:
+        if self._inotify is not None:
+            self._inotify.wait(timeout)
+        else:
+            time.sleep(min(timeout, self.poll_interval))
+
+    def wait(self, debounce: float = 0.2) -> None:
+        """Block until the file changes and then stays unchanged for `debounce` s."""
+        while not self.changed():
+            self._sleep(self.poll_interval)
+        # inotify wakes on every event, including ones for other files in
+        # the directory, so wait out the full `debounce` after each change
+        last = _signature(self.path)
+        deadline = time.monotonic() + debounce
+        while (remaining := deadline - time.monotonic()) > 0:
+            self._sleep(remaining)
+            current = _signature(self.path)
+            if current != last:
+                last = current
+                deadline = time.monotonic() + debounce
+
+    def close(self) -> None:
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+
+class WatchSession:
+    """Live namespace plus the record of which block versions it reflects."""
+
+    def __init__(self, write: WriteResults) -> None:
+        self.write = write
+        self.namespace = new_namespace()
+        self.executed: list[tuple[str, str]] = []
+
+    def run(
+        self,
+        parsed: ParsedFile,
+        cancelled: Callable[[], bool] = lambda: False,
+    ) -> list[BlockResult]:
+        """Re-run the affected blocks, writing output after each one.
+
+        Stops at the first error, or before the next block once `cancelled()`
+        returns True; blocks not reached are re-run on the next call.
+        """
+        keys = block_keys(parsed)
+        names = affected_blocks(self.executed, parsed)
+        del self.executed[len(keys) - len(names):]
+
+        results: list[BlockResult] = []
+        for name, key in zip(names, keys[len(keys) - len(names):]):
+            if cancelled():
+                break
+            result = execute_blocks(parsed, [name], namespace=self.namespace)[0]
+            results.append(result)
+            self.write(parsed, [result])
+            if result.error is not None:
+                break
+            self.executed.append(key)
+        return results
+
+
+def watch(
+    path: str | Path,
+    write: WriteResults,
+    debounce: float = 0.2,
+    poll_interval: float = 0.5,
+    log: Callable[[str], None] = print,
+) -> None:
+    """Run `path`, then re-run affected blocks on every save until interrupted."""
+    session = WatchSession(write)
+    watcher = FileWatcher(path, poll_interval)
+    try:
+        while True:
+            watcher.mark()
+            try:
+                parsed = parse_file(path)
+            except (OSError, ParseError) as e:
+                log(f"Error: {e}")
+            else:
+                results = session.run(parsed, cancelled=watcher.changed)
+                if results:
+                    log(f"Ran {', '.join(r.name for r in results)}")
+                    for r in results:
+                        if r.error:
+                            log(f"Error in block '{r.name}'")
+                if watcher.changed():
+                    log("File changed, restarting")
+            watcher.wait(debounce)
+    finally:
+        watcher.close()
@@ -2,12 +2,21 @@
 
 from __future__ import annotations
 
+import contextlib
+import os
+from collections.abc import Iterable, Iterator
 from pathlib import Path
 
 from .executor import BlockResult
-from .formats import OUTPUT_PREFIX, ERROR_PREFIX
+from .formats import BLOCK_START_RE, OUTPUT_PREFIX, ERROR_PREFIX
+from .lines import split_lines
 from .parser import ParsedFile
 
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locking, writes are last-wins
+    fcntl = None
+
 
 def format_output(parsed: ParsedFile, results: list[BlockResult]) -> str:
     """Produce the .out.py content: original source with output after each block."""
@@ -32,23 +41,130 @@ def format_output(parsed: ParsedFile, results: list[BlockResult]) -> str:
 
 
 def _append_result_lines(output_lines: list[str], result: BlockResult) -> None:
-    """Append stdout/error lines after a block."""
+    """Append stdout/stderr/error lines after a block."""
     if result.stdout:
         for out_line in result.stdout.rstrip("\n").splitlines():
             output_lines.append(f"{OUTPUT_PREFIX}{out_line}")
-    elif result.error is None:
+    elif not (result.stderr or result.error):
         output_lines.append(OUTPUT_PREFIX.rstrip())
 
+    if result.stderr:
+        for err_line in result.stderr.rstrip("\n").splitlines():
+            output_lines.append(f"{ERROR_PREFIX}{err_line}")
+
     if result.error:
         for err_line in result.error.rstrip("\n").splitlines():
             output_lines.append(f"{ERROR_PREFIX}{err_line}")
 
 
+def _is_output_line(line: str) -> bool:
+    return line.startswith((OUTPUT_PREFIX.rstrip(), ERROR_PREFIX.rstrip()))
+
+
+def split_output_lines(text: str) -> dict[str, list[str]]:
+    """Return a map of block name -> its `# >>>`/`# !!!` lines in .out.py text."""
+    block_lines: dict[str, list[str]] = {}
+    current: list[str] | None = None
+    for line in split_lines(text):
+        m = BLOCK_START_RE.match(line)
+        if m:
+            current = block_lines.setdefault(m.group(1), [])
+        elif current is not None and _is_output_line(line):
+            current.append(line)
+    return block_lines
+
+
+def _split_blocks(text: str) -> tuple[list[str], list[tuple[str, list[str]]]]:
+    """Split .out.py text into its preamble and (name, lines from the header on) per block."""
+    preamble: list[str] = []
+    blocks: list[tuple[str, list[str]]] = []
+    current = preamble
+    for line in split_lines(text):
+        m = BLOCK_START_RE.match(line)
+        if m:
+            current = []
+            blocks.append((m.group(1), current))
+        current.append(line)
+    return preamble, blocks
+
+
+def merge_output(text: str, previous: str, blocks: Iterable[str]) -> str:
+    """Merge freshly formatted .out.py `text` with the `previous` file contents.
+
+    Blocks in `blocks` come from `text`. Every other block that has output in
+    `previous` keeps that output together with the source lines it was
+    produced from, so a block edited but not re-run still reads as stale.
+    Blocks without earlier output, and the preamble, come from `text`.
+    """
+    owned = set(blocks)
+    earlier: dict[str, list[list[str]]] = {}
+    for name, lines in _split_blocks(previous)[1]:
+        earlier.setdefault(name, []).append(lines)
+
+    preamble, sections = _split_blocks(text)
+    merged = list(preamble)
+    for name, lines in sections:
+        kept = earlier.get(name)
+        kept = kept.pop(0) if kept else None
+        if name not in owned and kept is not None and any(map(_is_output_line, kept[1:])):
+            lines = lines[:1] + kept[1:]
+        merged.extend(lines)
+
+    return "\n".join(merged) + "\n"
+
+
+@contextlib.contextmanager
+def locked(path: str | Path) -> Iterator[None]:
+    """Hold an exclusive advisory lock on `path` via a hidden sibling `.lock` file.
+
+    The `.<name>.lock` file is left in place: deleting it would let a waiting
+    writer lock the old file while a new one locks a fresh file.
+    """
+    path = Path(path)
+    with open(path.with_name(f".{path.name}.lock"), "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def write_merged(output_path: str | Path, text: str, blocks: Iterable[str]) -> None:
+    """Write .out.py `text`, replacing only the outputs of `blocks` on disk.
+
+    The read-merge-write runs under a file lock and the new file is moved into
+    place atomically, so concurrent writers (a Jupyter save and a `nobook run`,
+    say) each update their own blocks without clobbering the others.
+    """
+    output_path = Path(output_path)
+    with locked(output_path):
+        try:
+            previous = output_path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            previous = ""
+        content = merge_output(text, previous, blocks)
+        tmp_path = output_path.with_name(f".{output_path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(content, encoding="utf-8")
+        os.replace(tmp_path, output_path)
+
+
 def write_output(
     parsed: ParsedFile,
     results: list[BlockResult],
     output_path: str | Path,
+    blocks: Iterable[str] | None = None,
 ) -> None:
-    """Write the .out.py file."""
+    """Write the .out.py file.
+
+    The outputs of `blocks` (by default every block in `parsed`) are
+    replaced: those in `results` get their new output, the rest are left
+    empty, so a block that didn't run (after a failing block, or past
+    `--block`) never shows an old output as if it were current. Blocks not
+    in `blocks` keep the output the existing file has for them.
+    """
+    if blocks is None:
+        blocks = [block.name for block in parsed.blocks]
     content = format_output(parsed, results)
-    Path(output_path).write_text(content, encoding="utf-8")
+    write_merged(output_path, content, blocks)
@@ -0,0 +1,111 @@
+"""Tests for nobook.batch (`nobook convert`)."""
+
+import json
+import os
+from pathlib import Path
+
+import nbformat
+import pytest
+
+from nobook.batch import convert_file, convert_tree
+from nobook.cli import main
+
+
+def _write_ipynb(path, cells):
+    nb = nbformat.v4.new_notebook()
+    nb.cells = cells
+    path.parent.mkdir(parents=True, exist_ok=True)
+    nbformat.write(nb, path)
+
+
+@pytest.fixture
+def archive(tmp_path):
+    root = tmp_path / "archive"
+    code = nbformat.v4.new_code_cell("print('hi')")
+    code.outputs = [nbformat.v4.new_output("stream", name="stdout", text="hi\n")]
+    _write_ipynb(root / "a.ipynb", [nbformat.v4.new_markdown_cell("# Title"), code])
+    _write_ipynb(root / "sub" / "b.ipynb", [nbformat.v4.new_code_cell("x = 1")])
+    _write_ipynb(root / ".ipynb_checkpoints" / "a-checkpoint.ipynb", [])
+    return root
+
+
+def test_convert_to_py(archive, tmp_path, monkeypatch):
+    monkeypatch.setattr("nobook.batch.CHUNK_SIZE", 1)  # exercise the process pool
+    out = tmp_path / "out"
+    stats = convert_tree([archive], out_dir=out, jobs=2, manifest=tmp_path / "m.jsonl", log=print)
+    assert (stats.converted, stats.failed) == (2, 0)
+    assert (out / "a.py").read_text() == "# @block=cell-0\n# # Title\nprint('hi')\n"
+    assert "# >>> hi" in (out / "a.out.py").read_text()
+    assert (out / "sub" / "b.py").exists()
+    assert not (out / ".ipynb_checkpoints").exists()
+
+
+def test_resume_skips_converted(archive, tmp_path):
+    manifest = tmp_path / "m.jsonl"
+    convert_tree([archive], out_dir=tmp_path / "out", jobs=1, manifest=manifest)
+    (tmp_path / "out" / "a.py").unlink()
+    stats = convert_tree([archive], out_dir=tmp_path / "out", jobs=1, manifest=manifest)
+    assert (stats.converted, stats.skipped) == (0, 2)
+    assert not (tmp_path / "out" / "a.py").exists()
+
+    # A changed source is converted again
+    _write_ipynb(archive / "a.ipynb", [nbformat.v4.new_code_cell("y = 2")])
+    stats = convert_tree([archive], out_dir=tmp_path / "out", jobs=1, manifest=manifest)
+    assert stats.converted == 1
+    records = [json.loads(line) for line in manifest.read_text().splitlines()]
+    assert len(records) == 3 and all(r["status"] == "ok" for r in records)
+
+
+def test_existing_target_needs_force(archive, tmp_path):
+    (archive / "a.py").write_text("# unrelated script\n")
+    stats = convert_tree([archive], jobs=1, manifest=tmp_path / "m.jsonl", log=lambda m: None)
+    assert (archive / "a.py").read_text() == "# unrelated script\n"
+    assert (stats.converted, stats.skipped) == (1, 1)
+
+
+def test_convert_back_to_ipynb(archive, tmp_path, capsys):
+    main(["convert", str(archive), "--out", str(tmp_path / "py"),
+          "--manifest", str(tmp_path / "m1.jsonl")])
+    main(["convert", str(tmp_path / "py"), "--to", "ipynb", "--out", str(tmp_path / "nb"),
+          "--manifest", str(tmp_path / "m2.jsonl")])
+    assert "notebooks/s" in capsys.readouterr().out
+    nb = nbformat.read(tmp_path / "nb" / "a.ipynb", as_version=4)
+    assert nb.cells[0].outputs[0]["text"] == "hi\n"
+    assert nb.cells[0].metadata["nobook"] == {"block": "cell-0"}
+
+
+def test_convert_to_ipynb_skips_plain_scripts(tmp_path):
+    root = tmp_path / "src"
+    root.mkdir()
+    (root / "nb.py").write_bytes(b"\xef\xbb\xbf# @block=a\r\nx = 1\r\n")
+    (root / "setup.py").write_text("import setuptools\n")
+    stats = convert_tree([root], to="ipynb", jobs=1, manifest=tmp_path / "m.jsonl")
+    assert (stats.converted, stats.skipped, stats.failed) == (1, 1, 0)
+    assert not (root / "setup.ipynb").exists()
+
+
+def test_raw_cells_kept_as_comments(tmp_path):
+    _write_ipynb(tmp_path / "a.ipynb", [
+        nbformat.v4.new_raw_cell("raw text"), nbformat.v4.new_code_cell("x = 1"),
+    ])
+    convert_tree([tmp_path / "a.ipynb"], jobs=1, manifest=tmp_path / "m.jsonl")
+    assert (tmp_path / "a.py").read_text() == "# @block=cell-0\n# raw text\nx = 1\n"
+
+
+def _crash_on_bad(source, target, to):
+    if Path(source).name == "bad.ipynb":
+        os._exit(1)
+    return convert_file(source, target, to)
+
+
+def test_crashed_worker_fails_only_its_file(tmp_path, monkeypatch):
+    monkeypatch.setattr("nobook.batch.CHUNK_SIZE", 2)
+    monkeypatch.setattr("nobook.batch.convert_file", _crash_on_bad)
+    for name in ["a", "b", "bad", "c", "d"]:
+        _write_ipynb(tmp_path / "src" / f"{name}.ipynb", [nbformat.v4.new_code_cell("x = 1")])
+    stats = convert_tree(
+        [tmp_path / "src"], out_dir=tmp_path / "out", jobs=2,
+        manifest=tmp_path / "m.jsonl", log=lambda m: None,
+    )
+    assert (stats.converted, stats.failed) == (4, 1)
+    assert not (tmp_path / "out" / "bad.py").exists()
@@ -0,0 +1,87 @@
+"""Tests for nobook.jupyter.checkpoints."""
+
+import pytest
+
+from nobook.jupyter.checkpoints import CHUNK_DIR, NobookCheckpoints, split_chunks
+
+PY = "# @block=a\nx = 1\n# @block=b\nprint(x)\n"
+OUT = "# @block=a\nx = 1\n# >>>\n# @block=b\nprint(x)\n# >>> 1\n"
+
+
+@pytest.fixture
+def manager(tmp_path):
+    from nobook.jupyter.contentsmanager import NobookContentsManager
+    return NobookContentsManager(root_dir=str(tmp_path))
+
+
+def _chunks(tmp_path):
+    return {p.name for p in (tmp_path / ".ipynb_checkpoints" / CHUNK_DIR).iterdir()}
+
+
+def test_split_chunks_by_block():
+    data = b"# preamble\n# @block=a\nx = 1\n# @block=b\ny = 2\n"
+    assert split_chunks(data, ".py") == [
+        b"# preamble\n", b"# @block=a\nx = 1\n", b"# @block=b\ny = 2\n",
+    ]
+    assert b"".join(split_chunks(data, ".out.jsonl")) == data
+
+
+def test_manager_uses_nobook_checkpoints(manager):
+    assert isinstance(manager.checkpoints, NobookCheckpoints)
+
+
+def test_restore_brings_back_outputs(manager, tmp_path):
+    (tmp_path / "nb.py").write_text(PY)
+    (tmp_path / "nb.out.py").write_text(OUT)
+    checkpoint = manager.create_checkpoint("nb.py")
+    assert manager.list_checkpoints("nb.py")[0]["id"] == checkpoint["id"]
+
+    (tmp_path / "nb.py").write_text(PY.replace("x = 1", "x = 2"))
+    (tmp_path / "nb.out.py").write_text(OUT.replace(">>> 1", ">>> 2"))
+    (tmp_path / "nb.out.jsonl").write_text('{"block": "b", "outputs": []}\n')
+    manager.restore_checkpoint(checkpoint["id"], "nb.py")
+
+    assert (tmp_path / "nb.py").read_text() == PY
+    assert (tmp_path / "nb.out.py").read_text() == OUT
+    # There was no sidecar at checkpoint time
+    assert not (tmp_path / "nb.out.jsonl").exists()
+    assert not (tmp_path / ".ipynb_checkpoints" / "nb-checkpoint.py").exists()
+
+
+def test_unchanged_blocks_are_not_stored_again(manager, tmp_path):
+    (tmp_path / "nb.py").write_text(PY)
+    (tmp_path / "nb.out.py").write_text(OUT)
+    manager.create_checkpoint("nb.py")
+    first = _chunks(tmp_path)
+    assert len(first) == 4
+
+    (tmp_path / "nb.py").write_text(PY.replace("print(x)", "print(x + 1)"))
+    manager.create_checkpoint("nb.py")
+    second = _chunks(tmp_path)
+    # Only block b's source changed; its old chunk is no longer needed
+    assert len(second) == 4
+    assert len(second - first) == 1
+
+
+def test_rename_and_delete(manager, tmp_path):
+    (tmp_path / "nb.py").write_text(PY)
+    manager.create_checkpoint("nb.py")
+    (tmp_path / "sub").mkdir()
+    manager.rename("nb.py", "sub/moved.py")
+    assert manager.list_checkpoints("sub/moved.py")
+    manager.restore_checkpoint("checkpoint", "sub/moved.py")
+    assert (tmp_path / "sub" / "moved.py").read_text() == PY
+    assert _chunks(tmp_path) == set()
+
+    manager.delete_checkpoint("checkpoint", "sub/moved.py")
+    assert manager.list_checkpoints("sub/moved.py") == []
+    assert _chunks(tmp_path / "sub") == set()
+
+
+def test_plain_files_use_file_checkpoints(manager, tmp_path):
+    (tmp_path / "script.py").write_text("print(1)\n")
+    manager.create_checkpoint("script.py")
+    assert (tmp_path / ".ipynb_checkpoints" / "script-checkpoint.py").exists()
+    (tmp_path / "script.py").write_text("print(2)\n")
+    manager.restore_checkpoint("checkpoint", "script.py")
+    assert (tmp_path / "script.py").read_text() == "print(1)\n"
@@ -0,0 +1,128 @@
+"""Tests for nobook.cli."""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from nobook.cli import main
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+# Modules that light subcommands must never import
+HEAVY_MODULES = ["nbformat", "jupyter_server", "nobook.executor", "nobook.writer"]
+
+
+def _run_python(code: str, *flags: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code],
+        capture_output=True,
+        text=True,
+        cwd=Path(__file__).parent.parent,
+    )
+
+
+def test_list_prints_block_names(capsys):
+    main(["list", str(FIXTURES / "simple.py")])
+    assert capsys.readouterr().out.split() == ["setup", "compute", "show"]
+
+
+def test_list_missing_file(capsys):
+    with pytest.raises(SystemExit):
+        main(["list", "does-not-exist.py"])
+    assert "file not found" in capsys.readouterr().err
+
+
+def test_run_writes_out_py(tmp_path, capsys):
+    src = tmp_path / "nb.py"
+    src.write_text((FIXTURES / "simple.py").read_text())
+    main(["run", str(src)])
+    assert "# >>> result = 30" in (tmp_path / "nb.out.py").read_text()
+
+
+def test_launch_args_passed_through(monkeypatch):
+    launched = []
+    monkeypatch.setattr("nobook.cli._launch_jupyter", lambda m, a: launched.append((m, a)))
+    main(["--port=9999", "--no-browser"])
+    main(["lab", "--port=9999"])
+    assert launched == [
+        ("notebook", ["--port=9999", "--no-browser"]),
+        ("jupyterlab", ["--port=9999"]),
+    ]
+
+
+def test_list_does_not_import_heavy_modules():
+    code = (
+        "import sys\n"
+        "from nobook.cli import main\n"
+        f"main(['list', {str(FIXTURES / 'simple.py')!r}])\n"
+        f"print([m for m in {HEAVY_MODULES!r} if m in sys.modules])\n"
+    )
+    proc = _run_python(code)
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stdout.splitlines()[-1] == "[]"
+
+
+def test_cli_import_time_budget():
+    """Importing nobook.cli should cost a few milliseconds, not a Jupyter stack."""
+    proc = _run_python("import nobook.cli", "-X", "importtime")
+    assert proc.returncode == 0, proc.stderr
+    cumulative_us = None
+    for line in proc.stderr.splitlines():
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) == 3 and parts[2] == "nobook.cli":
+            cumulative_us = int(parts[1])
+    assert cumulative_us is not None
+    assert cumulative_us < 150_000
+
+
+def test_run_with_sidecar(tmp_path, capsys):
+    src = tmp_path / "nb.py"
+    src.write_text("# @block=a\nprint('hi')\n")
+    main(["run", str(src), "--sidecar"])
+    line = json.loads((tmp_path / "nb.out.jsonl").read_text().splitlines()[0])
+    assert line["block"] == "a"
+    assert line["outputs"][0]["text"] == "hi\n"
+
+
+def test_run_async(tmp_path, capsys):
+    src = tmp_path / "nb.py"
+    src.write_text("# @block=a\nimport asyncio\nawait asyncio.sleep(0)\nprint('done')\n")
+    main(["run", str(src), "--async"])
+    assert "# >>> done" in (tmp_path / "nb.out.py").read_text()
+
+
+@pytest.mark.parametrize("option", [
+    ["--memory-limit", "4G"], ["--isolated"], ["--async"], ["--param", "x=1"],
+])
+def test_run_watch_rejects_conflicting_options(tmp_path, capsys, option):
+    src = tmp_path / "nb.py"
+    src.write_text("# @block=a\nprint('hi')\n")
+    with pytest.raises(SystemExit):
+        main(["run", str(src), "--watch", *option])
+    assert "can't be combined" in capsys.readouterr().err
+    assert not (tmp_path / "nb.out.py").exists()
+
+
+def test_run_block_rejected_with_param(tmp_path, capsys):
+    src = tmp_path / "nb.py"
+    src.write_text("# @block=parameters\nx = 1\n")
+    with pytest.raises(SystemExit):
+        main(["run", str(src), "--block", "parameters", "--param", "x=2"])
+    assert "--block can't be combined" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("sweep, message", [
+    ('{"x": 1}\n[2]\n', "s.jsonl:2"),
+    (None, "No such file"),
+])
+def test_run_bad_sweep_file(tmp_path, capsys, sweep, message):
+    src = tmp_path / "nb.py"
+    src.write_text("# @block=parameters\nx = 1\n")
+    if sweep is not None:
+        (tmp_path / "s.jsonl").write_text(sweep)
+    with pytest.raises(SystemExit):
+        main(["run", str(src), "--sweep", str(tmp_path / "s.jsonl")])
+    assert message in capsys.readouterr().err
@@ -4,15 +4,20 @@ import nbformat
 import pytest
 
 from nobook.jupyter.contentsmanager import (
+    _BlockNames,
     _attach_outputs,
+    _changed_output_blocks,
     _cell_outputs_to_lines,
     _has_block_markers,
     _notebook_to_out_py,
     _notebook_to_py,
     _parse_out_py,
     _py_to_notebook,
+    _scan_out_py,
     _unique_block_name,
 )
+from nobook.metrics import REGISTRY
+from nobook.parser import block_hash
 
 
 # --- _has_block_markers ---
@@ -38,6 +43,16 @@ def test_unique_name_with_conflict():
 def test_unique_name_multiple_conflicts():
     assert _unique_block_name("a", {"a", "a-1", "a-2"}) == "a-3"
 
+def test_block_names_many_duplicates():
+    names = _BlockNames()
+    resolved = [names.add("x") for _ in range(20000)]
+    assert resolved[:3] == ["x", "x-1", "x-2"]
+    assert resolved[-1] == "x-19999"
+
+def test_block_names_skip_taken_suffix():
+    names = _BlockNames()
+    assert [names.add(n) for n in ["a", "a-1", "a", "a"]] == ["a", "a-1", "a-2", "a-3"]
+
 
 # --- _py_to_notebook (round-trip: text -> notebook) ---
 
@@ -85,6 +100,16 @@ def test_py_to_notebook_cell_id_equals_block_name():
     nb = _py_to_notebook(text)
     assert nb.cells[0].id == "setup"
 
+def test_py_to_notebook_cell_ids_are_valid_and_stable():
+    text = "# header\n# @block=a\n# @block=a\n# @block=load.data\n# @block=a-1\n"
+    first, second = _py_to_notebook(text), _py_to_notebook(text)
+    ids = [cell.id for cell in first.cells]
+    assert ids == [cell.id for cell in second.cells]
+    assert ids[:3] == ["preamble", "a", "a-1"]
+    assert ids[3].startswith("load_data-")
+    assert len(set(ids)) == len(ids)
+    nbformat.validate(first)
+
 def test_py_to_notebook_empty_text():
     nb = _py_to_notebook("")
     assert len(nb.cells) == 0
@@ -145,7 +170,6 @@ def test_notebook_to_py_new_cell_no_metadata():
     assert "# @block=cell-0\n" in text
     assert "# @block=cell-1\n" in text
 
-
 # --- Round-trip: text -> notebook -> text ---
 
 def test_roundtrip_simple():
@@ -334,3 +358,150 @@ def test_out_py_roundtrip():
 
     assert len(nb2.cells[0].outputs) == 1
     assert nb2.cells[0].outputs[0]["text"] == "hello\n"
+
+
+# --- NobookContentsManager save: block-level .out.py merge ---
+
+@pytest.fixture
+def manager(tmp_path):
+    from nobook.jupyter.contentsmanager import NobookContentsManager
+    return NobookContentsManager(root_dir=str(tmp_path))
+
+def test_saved_cell_ids_survive_reload(manager, tmp_path):
+    (tmp_path / "nb.py").write_text("# @block=a\nx = 1\n# @block=b\ny = 2\n")
+    nb = manager.get("nb.py")["content"]
+    nb.cells[1].metadata["nobook"]["block"] = "renamed"
+    nb.cells.append(nbformat.v4.new_code_cell("z = 3"))
+    new_id = nb.cells[2].id
+    manager.save({"type": "notebook", "content": nb}, "nb.py")
+    reloaded = manager.get("nb.py")["content"]
+    assert [cell.id for cell in reloaded.cells] == ["a", "b", new_id]
+
+
+def test_documents_are_bounded(manager, tmp_path, monkeypatch):
+    monkeypatch.setattr("nobook.jupyter.contentsmanager.MAX_DOCUMENTS", 2)
+    for name in ("a", "b", "a", "c"):
+        (tmp_path / f"{name}.py").write_text("# @block=x\n")
+        manager.get(f"{name}.py")
+    assert list(manager._documents) == ["a.py", "c.py"]
+
+
+def test_identical_saves_skip_writes(manager, tmp_path):
+    (tmp_path / "nb.py").write_text("# @block=a\nx = 1\n")
+    model = manager.get("nb.py")
+    skipped = REGISTRY.get("nobook_writes_total", file="py", state="skipped")
+    manager.save(model, "nb.py")
+    manager.save(model, "nb.py")
+    assert REGISTRY.get("nobook_writes_total", file="py", state="skipped") == skipped + 2
+
+    # Edited on disk since: the save writes even though the content matches the last save
+    (tmp_path / "nb.py").write_text("# @block=a\nx = 2\n")
+    manager.save(model, "nb.py")
+    assert (tmp_path / "nb.py").read_text() == "# @block=a\nx = 1\n"
+
+
+def test_large_result_saved_as_preview(manager, tmp_path):
+    (tmp_path / "nb.py").write_text("# @block=a\nlist(range(100000))\n")
+    manager.output_blobs = True
+    nb = manager.get("nb.py")["content"]
+    full = "\n".join(str(i) for i in range(100000))
+    nb.cells[0].outputs = [nbformat.v4.new_output(
+        "execute_result", data={"text/plain": full}, execution_count=1,
+    )]
+    manager.save({"type": "notebook", "content": nb}, "nb.py")
+    out_text = (tmp_path / "nb.out.py").read_text()
+    assert len(out_text) < 2000
+    assert "# >>> 99999" in out_text
+    [blob] = (tmp_path / ".nobook" / "blobs").iterdir()
+    assert blob.read_text() == full
+    assert f".nobook/blobs/{blob.name}" in out_text
+
+
+def test_changed_output_blocks():
+    nb = _py_to_notebook("# @block=a\nprint(1)\n# @block=b\nprint(2)\n")
+    _attach_outputs(nb, {"a": [{"output_type": "stream", "name": "stdout", "text": "1\n"}]})
+    assert _changed_output_blocks(nb) == set()
+    nb.cells[1].outputs = [{"output_type": "stream", "name": "stdout", "text": "2\n"}]
+    assert _changed_output_blocks(nb) == {"b"}
+
+def test_save_keeps_outputs_written_by_others(manager, tmp_path):
+    (tmp_path / "nb.py").write_text("# @block=a\nprint(1)\n# @block=b\nprint(2)\n")
+    model = manager.get("nb.py")
+    nb = model["content"]
+
+    # Meanwhile, `nobook run` writes output for block a
+    (tmp_path / "nb.out.py").write_text("# @block=a\nprint(1)\n# >>> 1\n# @block=b\nprint(2)\n")
+
+    nb.cells[1].outputs = [{"output_type": "stream", "name": "stdout", "text": "2\n"}]
+    manager.save({"type": "notebook", "content": nb}, "nb.py")
+
+    out = (tmp_path / "nb.out.py").read_text()
+    assert out == "# @block=a\nprint(1)\n# >>> 1\n# @block=b\nprint(2)\n# >>> 2\n"
+
+def test_sidecar_roundtrip(manager, tmp_path):
+    manager.output_sidecar = True
+    (tmp_path / "nb.py").write_text("# @block=a\n1 + 1\n")
+    nb = manager.get("nb.py")["content"]
+    nb.cells[0].execution_count = 4
+    nb.cells[0].outputs = [nbformat.v4.new_output(
+        "execute_result", data={"text/plain": "2", "text/html": "<b>2</b>"}, execution_count=4,
+    )]
+    manager.save({"type": "notebook", "content": nb}, "nb.py")
+    assert (tmp_path / "nb.out.py").read_text() == "# @block=a\n1 + 1\n# >>> 2\n"
+
+    cell = manager.get("nb.py")["content"].cells[0]
+    assert cell.execution_count == 4
+    assert cell.outputs[0]["data"]["text/html"] == "<b>2</b>"
+
+
+# --- stale outputs ---
+
+def test_scan_out_py_source_hashes():
+    _, hashes = _scan_out_py("# @block=a\nx = 1\n# >>>\n# @block=b\nprint(2)\n# >>> 2\n")
+    assert hashes == {"a": block_hash(["x = 1"]), "b": block_hash(["print(2)"])}
+
+def test_attach_outputs_marks_edited_blocks_stale():
+    out_text = "# @block=a\nprint(1)\n# >>> 1\n# @block=b\nprint(2)\n# >>> 2\n"
+    nb = _py_to_notebook("# @block=a\nprint(1)\n\n# @block=b\nprint(20)\n")
+    _attach_outputs(nb, *_scan_out_py(out_text))
+    assert "stale" not in nb.cells[0].metadata["nobook"]
+    assert nb.cells[1].metadata["nobook"]["stale"] is True
+    assert nb.cells[1].outputs[0]["text"] == "2\n"
+
+def test_get_marks_stale_after_cli_run(manager, tmp_path):
+    (tmp_path / "nb.py").write_text("# @block=a\nprint(1)\n")
+    (tmp_path / "nb.out.py").write_text("# @block=a\nprint(0)\n# >>> 0\n")
+    cell = manager.get("nb.py")["content"].cells[0]
+    assert cell.metadata["nobook"]["stale"] is True
+
+def test_edit_saved_without_running_stays_stale(manager, tmp_path):
+    (tmp_path / "nb.py").write_text("# @block=a\nprint(1)\n")
+    (tmp_path / "nb.out.py").write_text("# @block=a\nprint(1)\n# >>> 1\n")
+    model = manager.get("nb.py")
+    model["content"].cells[0].source = "print(2)"
+    manager.save(model, "nb.py")
+    cell = manager.get("nb.py")["content"].cells[0]
+    assert cell.outputs[0]["text"] == "1\n"
+    assert cell.metadata["nobook"]["stale"] is True
+
+
+def test_save_keeps_crlf_and_bom(manager, tmp_path):
+    data = b"\xef\xbb\xbf# @block=a\r\nx = 1\r\n# @block=b\r\ny = 2\r\n"
+    (tmp_path / "nb.py").write_bytes(data)
+    model = manager.get("nb.py")
+    assert [c.source for c in model["content"].cells] == ["x = 1", "y = 2"]
+    model["content"].cells[1].source = "y = 3"
+    manager.save(model, "nb.py")
+    assert (tmp_path / "nb.py").read_bytes() == data.replace(b"y = 2", b"y = 3")
+
+
+def test_save_without_get_keeps_crlf_and_bom(manager, tmp_path):
+    from nobook.jupyter.contentsmanager import NobookContentsManager
+
+    data = b"\xef\xbb\xbf# @block=a\r\nx = 1\r\n"
+    (tmp_path / "nb.py").write_bytes(data)
+    model = manager.get("nb.py")
+    model["content"].cells[0].source = "x = 2"
+    # A fresh manager, as after a server restart
+    NobookContentsManager(root_dir=str(tmp_path)).save(model, "nb.py")
+    assert (tmp_path / "nb.py").read_bytes() == data.replace(b"x = 1", b"x = 2")
@@ -0,0 +1,52 @@
+"""Tests for nobook.convert, the public conversion API."""
+
+from pathlib import Path
+
+import nbformat
+
+from nobook.convert import (
+    notebook_to_out_py,
+    notebook_to_py,
+    out_py_path,
+    parse_out_py,
+    py_to_notebook,
+    read_notebook,
+    write_notebook,
+)
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def test_roundtrip_fixture():
+    text = (FIXTURES / "simple.py").read_text()
+    nb = py_to_notebook(text)
+    assert [c.metadata["nobook"]["block"] for c in nb.cells] == ["setup", "compute", "show"]
+    assert notebook_to_py(py_to_notebook(notebook_to_py(nb))) == notebook_to_py(nb)
+
+
+def test_out_py_roundtrip():
+    nb = py_to_notebook("# @block=a\nprint(1)\n")
+    nb.cells[0].outputs = [nbformat.v4.new_output("stream", name="stdout", text="1\n")]
+    outputs = parse_out_py(notebook_to_out_py(nb))
+    assert outputs["a"][0]["text"] == "1\n"
+
+
+def test_out_py_path():
+    assert out_py_path("dir/nb.py") == Path("dir/nb.out.py")
+
+
+def test_write_and_read_notebook(tmp_path):
+    nb = py_to_notebook("# @block=a\nprint(1)\n# @block=b\nx = 2\n")
+    nb.cells[0].outputs = [nbformat.v4.new_output("stream", name="stdout", text="1\n")]
+    write_notebook(nb, tmp_path / "nb.py")
+    assert (tmp_path / "nb.py").read_text() == "# @block=a\nprint(1)\n# @block=b\nx = 2\n"
+    assert "# >>> 1" in (tmp_path / "nb.out.py").read_text()
+
+    loaded = read_notebook(tmp_path / "nb.py")
+    assert loaded.cells[0].outputs[0]["text"] == "1\n"
+    assert loaded.cells[1].outputs == []
+
+
+def test_write_notebook_without_outputs_skips_out_py(tmp_path):
+    write_notebook(py_to_notebook("# @block=a\nx = 1\n"), tmp_path / "nb.py")
+    assert not (tmp_path / "nb.out.py").exists()
@@ -1,10 +1,12 @@
 """Tests for nobook.executor."""
 
+import asyncio
+
 import pytest
 from pathlib import Path
 
 from nobook.parser import parse_file, parse_string
-from nobook.executor import execute_all, execute_up_to, execute_blocks
+from nobook.executor import execute_all, execute_up_to, execute_blocks, execute_blocks_async
 
 FIXTURES = Path(__file__).parent / "fixtures"
 
@@ -67,3 +69,31 @@ def test_execute_specific_blocks():
     assert len(results) == 2
     assert results[0].name == "setup"
     assert results[1].name == "show"
+
+
+def test_execute_blocks_async_top_level_await():
+    parsed = parse_string(
+        "# @block=start\n"
+        "import asyncio\n"
+        "events = []\n"
+        "async def prefetch():\n"
+        "    await asyncio.sleep(0)\n"
+        "    events.append('prefetched')\n"
+        "task = asyncio.create_task(prefetch())\n"
+        "# @block=wait\n"
+        "await task\n"
+        "print(events)\n"
+        "# @block=plain\n"
+        "print(len(events))\n"
+    )
+    results = asyncio.run(execute_blocks_async(parsed))
+    assert [r.error for r in results] == [None, None, None]
+    assert results[1].stdout == "['prefetched']\n"
+    assert results[2].stdout == "1\n"
+
+
+def test_execute_blocks_async_error_stops():
+    parsed = parse_string("# @block=a\nawait asyncio.sleep(0)\n# @block=b\nprint(1)\n")
+    results = asyncio.run(execute_blocks_async(parsed))
+    assert len(results) == 1
+    assert "NameError" in results[0].error
@@ -0,0 +1,97 @@
+"""Tests for nobook.graph."""
+
+import json
+
+from nobook.cli import main
+from nobook.graph import block_symbols, build_graph, to_dot, to_json
+from nobook.parser import Block, parse_string
+
+NOTEBOOK = """\
+# @block=setup
+import math
+n = 3
+# @block=load
+data = list(range(n))
+# @block=config
+scale = 2
+# @block=model
+data[0] = 99
+result = [x * scale for x in data]
+# @block=report
+print(result, math.pi)
+"""
+
+
+def _symbols(code: str):
+    return block_symbols(Block("b", code.splitlines(), 0))
+
+
+def test_reads_and_writes():
+    reads, writes = _symbols("import numpy as np\ny = f(x)\nz = y + 1\nobj.attr = w\n")
+    assert writes == {"np", "y", "z", "obj"}
+    assert reads == {"f", "x", "w", "obj"}
+
+
+def test_local_scopes_are_ignored():
+    reads, writes = _symbols(
+        "def g(a, b=default):\n    c = a + b\n    return c + outer\n"
+        "squares = [i * i for i in items]\n"
+        "h = lambda q: q + k\n"
+    )
+    assert writes == {"g", "squares", "h"}
+    assert reads == {"default", "outer", "items", "k"}
+
+
+def test_global_declaration_is_a_write():
+    _, writes = _symbols("def bump():\n    global counter\n    counter = 1\n")
+    assert writes == {"bump", "counter"}
+
+
+def test_graph_edges_and_critical_path():
+    parsed = parse_string(NOTEBOOK)
+    graph = build_graph(parsed, {"setup": 0.1, "load": 2.0, "config": 3.0, "model": 0.5, "report": 0.1})
+    deps = {n.name: {k: sorted(v) for k, v in n.depends_on.items()} for n in graph.nodes}
+    assert deps["load"] == {"setup": ["n"]}
+    assert deps["model"] == {"load": ["data"], "config": ["scale"]}
+    assert deps["report"] == {"model": ["result"], "setup": ["math"]}
+    # config is slow but only feeds model; the path through it is the longest
+    assert graph.critical_path == ["config", "model", "report"]
+    assert graph.critical_path_seconds == 3.6
+
+
+def test_no_timings_no_critical_path():
+    assert build_graph(parse_string(NOTEBOOK)).critical_path == []
+
+
+def test_json_and_dot_output():
+    graph = build_graph(parse_string(NOTEBOOK), {"load": 1.0})
+    data = json.loads(to_json(graph))
+    assert data["critical_path"][-1] in ("load", "model", "report")
+    dot = to_dot(graph)
+    assert dot.startswith("digraph nobook {")
+    assert '"setup" -> "load" [label="n"' in dot
+    assert '[label="load\\n1.000s"' in dot
+
+
+def test_cli_graph_reads_sidecar_timings(tmp_path, capsys):
+    src = tmp_path / "nb.py"
+    src.write_text(NOTEBOOK)
+    main(["run", str(src), "--sidecar"])
+    capsys.readouterr()
+    main(["graph", str(src), "--format", "json"])
+    data = json.loads(capsys.readouterr().out)
+    assert all(b["duration"] is not None for b in data["blocks"])
+    assert data["critical_path"]
+
+
+def test_overwrites_order_after_readers_and_writers():
+    parsed = parse_string(
+        "# @block=a\nx = 1\n# @block=b\nprint(x)\n# @block=c\nx = 2\n# @block=d\nx = 3\n"
+    )
+    graph = build_graph(parsed, {"a": 1.0, "b": 1.0, "c": 1.0, "d": 1.0})
+    after = {n.name: {k: sorted(v) for k, v in n.after.items()} for n in graph.nodes}
+    # c overwrites x, which b reads (write-after-read) and a wrote (write-after-write)
+    assert after["c"] == {"a": ["x"], "b": ["x"]}
+    assert after["d"] == {"c": ["x"]}
+    assert graph.critical_path == ["a", "b", "c", "d"]
+    assert "style=dashed" in to_dot(graph)
@@ -0,0 +1,170 @@
+"""Tests for nobook.jupyter.handlers."""
+
+import asyncio
+import json
+
+import pytest
+from jupyter_server.auth.authorizer import AllowAllAuthorizer
+from jupyter_server.auth.identity import IdentityProvider
+from tornado.httpclient import AsyncHTTPClient, HTTPClientError
+from tornado.httpserver import HTTPServer
+from tornado.testing import bind_unused_port
+from tornado.web import Application
+
+from nobook.executor import BlockResult
+from nobook.jupyter.contentsmanager import NobookContentsManager
+from nobook.jupyter.handlers import JobHandler, JobsHandler, MetricsHandler, make_runner
+from nobook.jupyter.jobs import Job, JobQueue
+from nobook.metrics import inc
+from nobook.normalize import digests_path
+from nobook.sidecar import read_sidecar, sidecar_path
+
+HEADERS = {"Authorization": "token secret"}
+
+
+async def _serve(root, job_queue, requests):
+    """Run `requests(fetch)` against the job and metrics handlers."""
+    app = Application(
+        [
+            (r"/nobook/api/jobs", JobsHandler),
+            (r"/nobook/api/jobs/([0-9a-f]+)", JobHandler),
+            (r"/nobook/metrics", MetricsHandler),
+        ],
+        base_url="/",
+        cookie_secret=b"secret",
+        identity_provider=IdentityProvider(token="secret"),
+        authorizer=AllowAllAuthorizer(),
+        contents_manager=NobookContentsManager(root_dir=str(root)),
+        nobook_jobs=job_queue,
+    )
+    sock, port = bind_unused_port()
+    server = HTTPServer(app)
+    server.add_sockets([sock])
+    client = AsyncHTTPClient()
+
+    async def fetch(path, body=None):
+        method = "GET" if body is None else "POST"
+        return await client.fetch(
+            f"http://127.0.0.1:{port}{path}", method=method, headers=HEADERS,
+            body=None if body is None else json.dumps(body),
+        )
+
+    try:
+        return await requests(fetch)
+    finally:
+        server.stop()
+        await job_queue.shutdown()
+
+
+async def _idle_runner(job):
+    pass
+
+
+async def _status(fetch, body):
+    try:
+        response = await fetch("/nobook/api/jobs", body)
+    except HTTPClientError as e:
+        return e.code
+    return response.code
+
+
+@pytest.mark.parametrize("body", [
+    {},
+    {"path": "nb.txt"},
+    {"path": "nb.py", "blocks": "a"},
+    {"path": "nb.py", "blocks": [1]},
+    {"path": "nb.py", "timeout": 0},
+    {"path": "nb.py", "timeout": True},
+])
+def test_post_rejects_bad_requests(tmp_path, body):
+    (tmp_path / "nb.py").write_text("# @block=a\n")
+
+    async def requests(fetch):
+        return await _status(fetch, body)
+
+    assert asyncio.run(_serve(tmp_path, JobQueue(_idle_runner), requests)) == 400
+
+
+def test_post_missing_file(tmp_path):
+    async def requests(fetch):
+        return await _status(fetch, {"path": "missing.py"})
+
+    assert asyncio.run(_serve(tmp_path, JobQueue(_idle_runner), requests)) == 404
+
+
+def test_post_full_queue(tmp_path):
+    (tmp_path / "nb.py").write_text("# @block=a\n")
+    gate = asyncio.Event()
+
+    async def runner(job):
+        await gate.wait()
+
+    async def requests(fetch):
+        codes = [await _status(fetch, {"path": "nb.py"}) for _ in range(3)]
+        gate.set()
+        return codes
+
+    job_queue = JobQueue(runner, max_concurrent=1, max_queued=1)
+    assert asyncio.run(_serve(tmp_path, job_queue, requests)) == [202, 202, 429]
+
+
+def test_post_then_get_job(tmp_path):
+    (tmp_path / "nb.py").write_text("# @block=a\n")
+
+    async def requests(fetch):
+        posted = json.loads((await fetch("/nobook/api/jobs", {"path": "nb.py"})).body)
+        await job_queue.join()
+        return json.loads((await fetch(f"/nobook/api/jobs/{posted['id']}")).body)
+
+    job_queue = JobQueue(_idle_runner)
+    job = asyncio.run(_serve(tmp_path, job_queue, requests))
+    assert (job["path"], job["status"]) == ("nb.py", "done")
+
+
+def test_metrics_endpoint(tmp_path):
+    inc("nobook_writes_total", file="py", state="written")
+
+    async def requests(fetch):
+        return await fetch("/nobook/metrics")
+
+    response = asyncio.run(_serve(tmp_path, JobQueue(_idle_runner), requests))
+    assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+    assert b"# TYPE nobook_writes_total counter" in response.body
+
+
+class _FakePool:
+    def __init__(self):
+        self.executed = []
+        self._lock = asyncio.Lock()
+
+    def lock(self, path):
+        return self._lock
+
+    async def execute(self, path, name, code, timeout=None):
+        self.executed.append(name)
+        return BlockResult(name=name, stdout=f"{name}\n", error=None)
+
+
+def _run_job(tmp_path, blocks=None):
+    pool = _FakePool()
+    manager = NobookContentsManager(root_dir=str(tmp_path))
+    job = Job("nb.py", blocks)
+    asyncio.run(make_runner(manager, pool)(job))
+    return pool
+
+
+def test_runner_reads_bom_files(tmp_path):
+    (tmp_path / "nb.py").write_bytes(b"\xef\xbb\xbf# @block=a\r\nx = 1\r\n# @block=b\r\n")
+    assert _run_job(tmp_path, ["a"]).executed == ["a"]
+    assert "# >>> a" in (tmp_path / "nb.out.py").read_text()
+
+
+def test_runner_updates_existing_sidecar_and_digests(tmp_path):
+    path = tmp_path / "nb.py"
+    path.write_text("# @block=a\nx = 1\n# @block=b\n")
+    sidecar_path(path).write_text("")
+    digests_path(path).write_text("{}")
+    _run_job(tmp_path)
+    records = read_sidecar(sidecar_path(path))
+    assert records["a"]["outputs"][0]["text"] == "a\n"
+    assert set(json.loads(digests_path(path).read_text())["blocks"]) == {"a", "b"}
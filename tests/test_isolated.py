@@ -0,0 +1,73 @@
+"""Tests for nobook.isolated."""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from nobook.cli import main
+from nobook.parser import parse_file, parse_string
+
+isolated = pytest.importorskip("nobook.isolated")
+pytest.importorskip("resource")
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def test_namespace_persists_across_blocks():
+    results = isolated.execute_blocks_isolated(parse_file(FIXTURES / "simple.py"))
+    assert [r.name for r in results] == ["setup", "compute", "show"]
+    assert "result = 30" in results[1].stdout
+    assert all(r.error is None for r in results)
+    assert all(r.peak_memory > 0 for r in results)
+
+
+def test_memory_limit_fails_only_the_block():
+    parsed = parse_string(
+        "# @block=a\nx = 1\n"
+        "# @block=big\nb = bytearray(4 * 1024**3)\n"
+        "# @block=after\nprint(x)\n"
+    )
+    with isolated.IsolatedExecutor(memory_limit=isolated.parse_size("512M")) as executor:
+        results = executor.execute_blocks(parsed)
+        assert [r.name for r in results] == ["a", "big"]
+        assert "MemoryError" in results[1].error
+        # The child survives with its namespace intact
+        assert executor.execute_blocks(parsed, ["after"])[0].stdout == "1\n"
+
+
+def test_cpu_limit_per_block():
+    parsed = parse_string("# @block=spin\nwhile True:\n    pass\n")
+    results = isolated.execute_blocks_isolated(parsed, cpu_limit=1)
+    assert "CpuTimeExceeded" in results[0].error
+
+
+def test_dead_child_is_reported_and_restarted():
+    parsed = parse_string(
+        "# @block=die\nimport os, signal\nos.kill(os.getpid(), signal.SIGKILL)\n"
+        "# @block=fresh\nprint('os' in globals())\n"
+    )
+    with isolated.IsolatedExecutor() as executor:
+        results = executor.execute_blocks(parsed)
+        assert "killed by SIGKILL" in results[0].error
+        # The next block runs in a new child, with a fresh namespace
+        assert executor.execute_blocks(parsed, ["fresh"])[0].stdout == "False\n"
+
+
+@pytest.mark.parametrize("text,size", [("512M", 512 << 20), ("4G", 4 << 30), ("1024", 1024)])
+def test_parse_size(text, size):
+    assert isolated.parse_size(text) == size
+
+
+def test_parse_size_invalid():
+    with pytest.raises(ValueError):
+        isolated.parse_size("lots")
+
+
+def test_cli_isolated_run_records_peak_memory(tmp_path, capsys):
+    src = tmp_path / "nb.py"
+    src.write_text((FIXTURES / "simple.py").read_text())
+    main(["run", str(src), "--memory-limit", "1G", "--sidecar"])
+    assert "# >>> result = 30" in (tmp_path / "nb.out.py").read_text()
+    records = [json.loads(line) for line in (tmp_path / "nb.out.jsonl").read_text().splitlines()]
+    assert all(r["peak_memory"] > 0 for r in records)
@@ -0,0 +1,219 @@
+"""Tests for nobook.jupyter.jobs."""
+
+import asyncio
+import queue
+
+import pytest
+
+from nobook.executor import BlockResult
+from nobook.jupyter.jobs import JobQueue, KernelPool, QueueFull
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+async def _fake_runner(job, running=None, gate=None):
+    if running is not None:
+        running.append(job.id)
+    if gate is not None:
+        await gate.wait()
+    for name in job.blocks or ["a", "b"]:
+        job.add_result(BlockResult(name=name, stdout=f"{name}\n", error=None))
+        await asyncio.sleep(0)
+
+
+def test_job_runs_to_completion():
+    async def main():
+        queue = JobQueue(_fake_runner)
+        job = queue.submit("nb.py")
+        await queue.join()
+        await queue.shutdown()
+        return job
+
+    job = _run(main())
+    assert job.status == "done"
+    assert [r.name for r in job.results] == ["a", "b"]
+    assert job.to_dict()["results"][0] == {
+        "name": "a", "stdout": "a\n", "error": None, "peak_memory": None, "duration": None,
+        "stderr": "",
+    }
+
+
+def test_failed_block_fails_job():
+    async def runner(job):
+        job.add_result(BlockResult(name="bad", stdout="", error="Traceback\n"))
+
+    async def main():
+        queue = JobQueue(runner)
+        job = queue.submit("nb.py")
+        await queue.join()
+        await queue.shutdown()
+        return job
+
+    assert _run(main()).status == "failed"
+
+
+def test_runner_exception_recorded():
+    async def runner(job):
+        raise KeyError("Block 'x' not found")
+
+    async def main():
+        queue = JobQueue(runner)
+        job = queue.submit("nb.py", ["x"])
+        await queue.join()
+        await queue.shutdown()
+        return job
+
+    job = _run(main())
+    assert job.status == "failed"
+    assert "not found" in job.error
+
+
+def test_concurrency_is_capped():
+    async def main():
+        running = []
+        gate = asyncio.Event()
+        queue = JobQueue(
+            lambda job: _fake_runner(job, running, gate), max_concurrent=2, max_queued=8,
+        )
+        for _ in range(5):
+            queue.submit("nb.py")
+        await asyncio.sleep(0.01)
+        started = len(running)
+        gate.set()
+        await queue.join()
+        await queue.shutdown()
+        return started, len(running)
+
+    assert _run(main()) == (2, 5)
+
+
+def test_queue_full_rejects_jobs():
+    async def main():
+        gate = asyncio.Event()
+        queue = JobQueue(lambda job: _fake_runner(job, gate=gate), max_concurrent=1, max_queued=2)
+        queue.submit("nb.py")
+        queue.submit("nb.py")
+        with pytest.raises(QueueFull):
+            queue.submit("nb.py")
+        gate.set()
+        await queue.join()
+        await queue.shutdown()
+
+    _run(main())
+
+
+def test_events_stream_results_as_they_arrive():
+    async def main():
+        queue = JobQueue(_fake_runner)
+        job = queue.submit("nb.py", ["x", "y", "z"])
+        names = [r.name async for r in job.events()]
+        await queue.shutdown()
+        return names
+
+    assert _run(main()) == ["x", "y", "z"]
+
+
+def test_finished_jobs_are_capped():
+    async def main():
+        queue = JobQueue(_fake_runner, max_finished=3)
+        jobs = [queue.submit("nb.py") for _ in range(5)]
+        await queue.join()
+        await queue.shutdown()
+        return jobs, queue
+
+    jobs, queue = _run(main())
+    assert list(queue.jobs) == [job.id for job in jobs[2:]]
+
+
+class _FakeKernel:
+    def __init__(self, alive=True):
+        self.alive = alive
+
+    def is_alive(self):
+        return self.alive
+
+    def client(self):
+        return _FakeClient(self.messages)
+
+
+class _FakeClient:
+    def __init__(self, messages):
+        self.messages = list(messages)
+
+    def start_channels(self):
+        pass
+
+    def stop_channels(self):
+        pass
+
+    async def wait_for_ready(self, timeout=None):
+        pass
+
+    def execute(self, code, store_history=True):
+        return "m1"
+
+    async def get_iopub_msg(self, timeout=None):
+        if not self.messages:
+            await asyncio.sleep(min(timeout, 0.01))
+            raise queue.Empty
+        msg_type, content = self.messages.pop(0)
+        return {"parent_header": {"msg_id": "m1"}, "msg_type": msg_type, "content": content}
+
+
+class _FakeKernelManager:
+    def __init__(self, kernel):
+        self.kernel = kernel
+        self.interrupted = self.shut_down = False
+
+    async def start_kernel(self, **kwargs):
+        return "k1"
+
+    def get_kernel(self, kernel_id):
+        return self.kernel
+
+    async def interrupt_kernel(self, kernel_id):
+        self.interrupted = True
+
+    async def shutdown_kernel(self, kernel_id, now=False):
+        self.shut_down = True
+
+
+def _execute(kernel, timeout=None):
+    manager = _FakeKernelManager(kernel)
+
+    async def main():
+        return await KernelPool(manager).execute("nb.py", "a", "x", timeout=timeout)
+
+    return _run(main()), manager
+
+
+def test_kernel_output_keeps_stderr_separate():
+    kernel = _FakeKernel()
+    kernel.messages = [
+        ("stream", {"name": "stdout", "text": "out\n"}),
+        ("stream", {"name": "stderr", "text": "warn\n"}),
+        ("status", {"execution_state": "idle"}),
+    ]
+    result, _ = _execute(kernel)
+    assert (result.stdout, result.stderr, result.error) == ("out\n", "warn\n", None)
+
+
+def test_dead_kernel_fails_the_block(monkeypatch):
+    monkeypatch.setattr("nobook.jupyter.jobs.LIVENESS_INTERVAL", 0.01)
+    kernel = _FakeKernel(alive=False)
+    kernel.messages = []
+    result, manager = _execute(kernel)
+    assert result.error.startswith("DeadKernelError")
+    assert manager.shut_down
+
+
+def test_block_timeout_interrupts_the_kernel(monkeypatch):
+    monkeypatch.setattr("nobook.jupyter.jobs.LIVENESS_INTERVAL", 0.01)
+    kernel = _FakeKernel()
+    kernel.messages = [("stream", {"name": "stdout", "text": "started\n"})]
+    result, manager = _execute(kernel, timeout=0.05)
+    assert result.stdout == "started\n"
+    assert result.error.startswith("TimeoutError")
+    assert manager.interrupted
@@ -0,0 +1,51 @@
+"""Tests for nobook.lines."""
+
+import codecs
+
+import pytest
+
+from nobook.lines import (
+    TextStyle,
+    decode_source,
+    detect_newline,
+    encode_source,
+    split_lines,
+)
+
+
+def test_split_lines_only_on_line_terminators():
+    text = "a\x0cb\r\nc d\re\n"
+    assert split_lines(text) == ["a\x0cb", "c d", "e"]
+
+
+def test_split_lines_matches_splitlines_at_the_edges():
+    for text in ["", "\n", "a", "a\n", "a\n\n", "\na"]:
+        assert split_lines(text) == text.splitlines()
+
+
+def test_detect_newline():
+    assert detect_newline(b"a\nb\n") == "\n"
+    assert detect_newline(b"a\r\nb\r\nc\n") == "\r\n"
+    assert detect_newline(b"a\rb\r") == "\r"
+    assert detect_newline(b"") == "\n"
+
+
+def test_decode_bom_and_crlf():
+    data = codecs.BOM_UTF8 + b"# @block=a\r\nx = '\xc3\xa9'\r\n"
+    text, style = decode_source(data)
+    assert text == "# @block=a\nx = 'é'\n"
+    assert style == TextStyle(encoding="utf-8", bom=True, newline="\r\n")
+    assert encode_source(text, style) == data
+
+
+def test_decode_coding_cookie():
+    data = b"# -*- coding: latin-1 -*-\n# @block=a\nx = '\xe9'\n"
+    text, style = decode_source(data)
+    assert "x = 'é'" in text
+    assert style.encoding == "iso-8859-1"
+    assert encode_source(text, style) == data
+
+
+def test_decode_invalid_utf8():
+    with pytest.raises(UnicodeDecodeError):
+        decode_source(b"# @block=a\nx = '\xff'\n")
@@ -0,0 +1,103 @@
+"""Tests for nobook.metrics."""
+
+import time
+from pathlib import Path
+
+import pytest
+
+from nobook.cli import main
+from nobook.executor import execute_all
+from nobook.metrics import REGISTRY, Registry, timed
+from nobook.parser import parse_file, parse_string
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+@pytest.fixture(autouse=True)
+def clear_registry():
+    REGISTRY.clear()
+    yield
+    REGISTRY.clear()
+
+
+def test_render_counters_and_summaries():
+    registry = Registry()
+    registry.inc("nobook_block_errors_total")
+    registry.inc("nobook_block_errors_total", 2)
+    registry.observe("nobook_out_py_bytes", 100, op="read")
+    registry.observe("nobook_out_py_bytes", 50, op="read")
+    text = registry.render()
+    assert "# TYPE nobook_block_errors_total counter" in text
+    assert "nobook_block_errors_total 3" in text
+    assert "# TYPE nobook_out_py_bytes summary" in text
+    assert 'nobook_out_py_bytes_count{op="read"} 2' in text
+    assert 'nobook_out_py_bytes_sum{op="read"} 150' in text
+
+
+def test_render_escapes_label_values():
+    registry = Registry()
+    registry.inc("x_total", path='a"b\\c')
+    assert 'x_total{path="a\\"b\\\\c"} 1' in registry.render()
+
+
+def test_empty_registry_renders_nothing():
+    assert Registry().render() == ""
+
+
+def test_timed_as_decorator_and_context_manager():
+    @timed("t_seconds", op="f")
+    def f():
+        return 1
+
+    assert f() == 1
+    with timed("t_seconds", op="f"):
+        pass
+    assert REGISTRY.get("t_seconds", op="f") == 2
+
+
+def test_timed_decorator_calls_do_not_share_state(monkeypatch):
+    durations = []
+    monkeypatch.setattr("nobook.metrics.observe", lambda name, value, **labels: durations.append(value))
+
+    @timed("t_seconds")
+    def f(depth):
+        time.sleep(0.02)
+        if depth:
+            f(depth - 1)
+
+    f(1)
+    inner, outer = durations
+    assert outer >= 0.04 and inner < outer
+
+
+def test_execute_blocks_records_metrics():
+    execute_all(parse_file(FIXTURES / "simple.py"))
+    assert REGISTRY.get("nobook_block_seconds") == 3
+    assert REGISTRY.get("nobook_execute_seconds") == 1
+
+    execute_all(parse_string("# @block=a\n1 / 0\n"))
+    assert REGISTRY.get("nobook_block_errors_total") == 1
+
+
+def test_contents_manager_records_metrics(tmp_path):
+    from nobook.jupyter.contentsmanager import NobookContentsManager
+
+    (tmp_path / "nb.py").write_text((FIXTURES / "simple.py").read_text())
+    manager = NobookContentsManager(root_dir=str(tmp_path))
+    model = manager.get("nb.py")
+    manager.save(model, "nb.py")
+    assert REGISTRY.get("nobook_contents_seconds", op="get") >= 1
+    assert REGISTRY.get("nobook_contents_seconds", op="save") == 1
+    assert REGISTRY.get("nobook_convert_seconds", op="py_to_notebook") >= 1
+    assert REGISTRY.get("nobook_convert_seconds", op="notebook_to_py") == 1
+
+
+def test_run_writes_metrics_file(tmp_path, capsys):
+    src = tmp_path / "nb.py"
+    src.write_text("# @block=a\nprint(1)\n# @block=b\n1 / 0\n")
+    metrics = tmp_path / "nobook.prom"
+    with pytest.raises(SystemExit):
+        main(["run", str(src), "--metrics-file", str(metrics)])
+    text = metrics.read_text()
+    assert "nobook_block_errors_total 1" in text
+    assert "nobook_block_seconds_count 2" in text
@@ -0,0 +1,103 @@
+"""Tests for nobook.normalize."""
+
+import json
+import os
+import sys
+
+import pytest
+
+from nobook.cli import main
+from nobook.executor import BlockResult
+from nobook.normalize import (
+    build_rules,
+    digests_path,
+    normalize_results,
+    output_digests,
+    scrub,
+)
+
+
+def test_addresses():
+    rules = build_rules(["addresses"])
+    assert scrub("<Foo object at 0x7f3a1c2b9d60>", rules) == "<Foo object at 0x...>"
+    assert scrub("mask 0xff", rules) == "mask 0xff"
+
+
+def test_timestamps_and_durations():
+    rules = build_rules(["timestamps", "durations"])
+    text = "2026-10-19 12:30:01.123 done in 1.25s (45 ms/step), took 0:00:03.5, 10 samples"
+    assert scrub(text, rules) == (
+        "<timestamp> done in <duration> (<duration>/step), took <duration>, 10 samples"
+    )
+
+
+def test_dates_are_opt_in():
+    text = "2026-10-19 12:30 start\n0  2026-10-19\n1  2026-10-20"
+    assert scrub(text, build_rules()) == "<timestamp> start\n0  2026-10-19\n1  2026-10-20"
+    assert scrub(text, build_rules(["dates", "timestamps"])) == (
+        "<timestamp> start\n0  <date>\n1  <date>"
+    )
+
+
+def test_durations_are_opt_in():
+    text = "took 1.25s, rated 10 h"
+    assert scrub(text, build_rules()) == text
+    assert scrub(text, build_rules(["durations"])) == "took <duration>, rated <duration>"
+
+
+def test_paths(tmp_path):
+    rules = build_rules(["paths"], root=tmp_path)
+    text = f'File "{tmp_path}/nb.py", line 3\nhome {os.path.expanduser("~")}/data\n'
+    assert scrub(text, rules) == 'File "./nb.py", line 3\nhome ~/data\n'
+
+
+def test_paths_skip_system_prefix(monkeypatch):
+    monkeypatch.setattr(sys, "prefix", "/usr")
+    monkeypatch.setattr(sys, "base_prefix", "/usr/")
+    monkeypatch.setattr(sys, "exec_prefix", "/usr")
+    text = "/usr/bin/env and /usr/share/data.csv"
+    assert scrub(text, build_rules(["paths"])) == text
+
+
+def test_unknown_scrubber():
+    with pytest.raises(ValueError, match="Unknown scrubber 'colors'"):
+        build_rules(["colors"])
+
+
+def test_normalize_results_keeps_other_fields():
+    result = BlockResult("b", "at 0x00007f3a1c2b", "Error at 0x00007f3a1c2b", duration=1.5)
+    (scrubbed,) = normalize_results([result], ["addresses"])
+    assert scrubbed.stdout == "at 0x..."
+    assert scrubbed.error == "Error at 0x..."
+    assert scrubbed.duration == 1.5
+
+
+def test_output_digests_ignore_source():
+    a = output_digests("# @block=x\nprint(1)\n# >>> 1\n# @block=y\n# >>>\n")
+    b = output_digests("# @block=x\nprint(2 - 1)\n# >>> 1\n# @block=y\n# >>>\n")
+    c = output_digests("# @block=x\nprint(2)\n# >>> 2\n# @block=y\n# >>>\n")
+    assert a == b
+    assert a["x"] != c["x"] and a["y"] == c["y"]
+
+
+def test_cli_normalized_runs_are_identical(tmp_path):
+    path = tmp_path / "nb.py"
+    path.write_text(
+        "# @block=a\nimport time\nclass Foo: pass\nprint(Foo())\n"
+        "start = time.time()\nprint(f'took {time.time() - start + time.time() % 1:.6f}s')\n"
+    )
+    digests = []
+    for _ in range(2):
+        main(["run", str(path), "--normalize", "addresses,durations", "--digests"])
+        digests.append(json.loads(digests_path(path).read_text()))
+    assert digests[0] == digests[1]
+    assert "0x..." in path.with_suffix(".out.py").read_text()
+
+
+def test_cli_digests_without_normalize_differ(tmp_path):
+    path = tmp_path / "nb.py"
+    path.write_text("# @block=a\nprint(object())\n")
+    main(["run", str(path), "--digests"])
+    first = json.loads(digests_path(path).read_text())["digest"]
+    main(["run", str(path)])  # digests file exists, so it's kept updated
+    assert json.loads(digests_path(path).read_text())["digest"] != first
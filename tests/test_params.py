@@ -0,0 +1,101 @@
+"""Tests for nobook.params."""
+
+import subprocess
+import sys
+import time
+
+import pytest
+
+from nobook.params import (
+    INJECTED_BLOCK,
+    inject_parameters,
+    load_sweep,
+    param_hash,
+    param_out_path,
+    parse_param,
+    run_sweep,
+)
+from nobook.parser import parse_string
+
+SOURCE = (
+    "# @block=setup\nbase = 100\nprint('setup')\n"
+    "# @block=parameters\nregion = 'eu'\nscale = 1\n"
+    "# @block=report\nprint(region, base * scale)\n"
+)
+
+
+def test_parse_param_literal_and_string():
+    assert parse_param("scale=2") == ("scale", 2)
+    assert parse_param("dates=['a', 'b']") == ("dates", ["a", "b"])
+    assert parse_param("region=us") == ("region", "us")
+
+
+def test_parse_param_invalid():
+    with pytest.raises(ValueError, match="expected key=value"):
+        parse_param("no-equals")
+
+
+def test_load_sweep(tmp_path):
+    path = tmp_path / "params.jsonl"
+    path.write_text('{"scale": 1}\n\n{"scale": 2}\n')
+    assert load_sweep(path) == [{"scale": 1}, {"scale": 2}]
+
+
+def test_param_hash_is_order_independent():
+    assert param_hash({"a": 1, "b": 2}) == param_hash({"b": 2, "a": 1})
+    assert param_hash({"a": 1}) != param_hash({"a": 2})
+
+
+def test_param_out_path():
+    path = param_out_path("dir/nb.py", {"a": 1})
+    assert path.name == f"nb.{param_hash({'a': 1})}.out.py"
+
+
+def test_inject_parameters_after_parameters_block():
+    injected = inject_parameters(parse_string(SOURCE), {"scale": 3})
+    names = [b.name for b in injected.blocks]
+    assert names == ["setup", "parameters", INJECTED_BLOCK, "report"]
+    assert injected.block_map[INJECTED_BLOCK].lines == ["scale = 3"]
+
+
+def test_inject_parameters_missing_block():
+    with pytest.raises(KeyError, match="not found"):
+        inject_parameters(parse_string("# @block=a\npass\n"), {})
+
+
+@pytest.mark.parametrize("jobs", [1, 3])
+def test_run_sweep_writes_one_output_per_set(tmp_path, jobs):
+    path = tmp_path / "nb.py"
+    param_sets = [{"scale": 1}, {"scale": 2, "region": "us"}, {"scale": 3}]
+    outcomes = run_sweep(path, parse_string(SOURCE), param_sets, jobs=jobs)
+
+    assert [ok for _, ok in outcomes] == [True, True, True]
+    assert "# >>> eu 100" in outcomes[0][0].read_text()
+    assert "# >>> us 200" in outcomes[1][0].read_text()
+    third = outcomes[2][0].read_text()
+    assert "# >>> setup" in third
+    assert "# @block=injected-parameters\nscale = 3\n" in third
+
+
+def test_run_sweep_reports_failures(tmp_path):
+    path = tmp_path / "nb.py"
+    outcomes = run_sweep(path, parse_string(SOURCE), [{"scale": "x"}, {"base": None}])
+    assert [ok for _, ok in outcomes] == [True, False]
+    assert "TypeError" in outcomes[1][0].read_text()
+
+
+def test_run_sweep_executes_upstream_once(tmp_path):
+    counter = tmp_path / "count.txt"
+    source = (
+        f"# @block=setup\nopen({str(counter)!r}, 'a').write('x')\n"
+        "# @block=parameters\nn = 0\n# @block=use\nprint(n)\n"
+    )
+    run_sweep(tmp_path / "nb.py", parse_string(source), [{"n": i} for i in range(4)], jobs=2)
+    assert counter.read_text() == "x"
+
+
+def test_run_sweep_leaves_other_children_alone(tmp_path):
+    other = subprocess.Popen([sys.executable, "-c", "pass"])
+    time.sleep(0.2)  # Let it exit before the sweep starts waiting
+    run_sweep(tmp_path / "nb.py", parse_string(SOURCE), [{"scale": i} for i in range(3)], jobs=2)
+    assert other.wait() == 0
@@ -69,3 +69,11 @@ def test_block_ends_at_next_block():
     parsed = parse_string(text)
     assert parsed.blocks[0].lines == ["first"]
     assert parsed.blocks[1].lines == ["second"]
+
+
+def test_parse_crlf_bom_and_form_feed(tmp_path):
+    path = tmp_path / "nb.py"
+    path.write_bytes(b"\xef\xbb\xbf# @block=a\r\nx = 1\x0c\r\n# @block=b\r\ny = 2\r\n")
+    parsed = parse_file(path)
+    assert [b.name for b in parsed.blocks] == ["a", "b"]
+    assert parsed.block_map["a"].lines == ["x = 1\x0c"]
@@ -0,0 +1,111 @@
+"""Tests for nobook.pipeline."""
+
+import json
+
+import pytest
+
+from nobook.cli import main
+from nobook.params import param_out_path
+from nobook.pipeline import (
+    ARTIFACT_DIR,
+    Step,
+    load_pipeline,
+    order_steps,
+    run_pipeline,
+)
+
+INGEST = "# @block=ingest\nopen('raw.txt', 'w').write('1 2 3')\n"
+TOTAL = (
+    "# @block=parameters\nscale = 1\n"
+    "# @block=total\nn = sum(map(int, open('raw.txt').read().split()))\n"
+    "open('total.txt', 'w').write(str(n * scale))\n"
+)
+
+
+def _pipeline(tmp_path, params=None):
+    (tmp_path / "ingest.py").write_text(INGEST)
+    (tmp_path / "total.py").write_text(TOTAL)
+    manifest = tmp_path / "pipeline.json"
+    manifest.write_text(json.dumps({"steps": [
+        {"notebook": "total.py", "inputs": ["raw.txt"], "outputs": ["total.txt"],
+         "params": params or {}},
+        {"notebook": "ingest.py", "outputs": ["raw.txt"]},
+    ]}))
+    return manifest
+
+
+def _statuses(outcomes):
+    return {o.name: o.status for o in outcomes}
+
+
+def test_order_follows_artifacts(tmp_path):
+    steps = load_pipeline(_pipeline(tmp_path))
+    assert [s.name for s in steps] == ["ingest", "total"]
+
+
+def test_cycle_is_rejected():
+    steps = [Step("a", "a.py", inputs=["y"], outputs=["x"]), Step("b", "b.py", inputs=["x"], outputs=["y"])]
+    with pytest.raises(ValueError, match="cycle"):
+        order_steps(steps)
+
+
+def test_unknown_key_is_rejected(tmp_path):
+    manifest = tmp_path / "p.json"
+    manifest.write_text('{"steps": [{"notebook": "a.py", "output": ["x"]}]}')
+    with pytest.raises(ValueError, match="unknown keys"):
+        load_pipeline(manifest)
+
+
+def test_run_then_skip_unchanged(tmp_path):
+    manifest = _pipeline(tmp_path, {"scale": 2})
+    assert _statuses(run_pipeline(manifest, jobs=2, log=lambda m: None)) == {
+        "ingest": "ran", "total": "ran",
+    }
+    assert (tmp_path / "total.txt").read_text() == "12"
+    assert param_out_path(tmp_path / "total.py", {"scale": 2}).exists()
+    assert not (tmp_path / "total.out.py").exists()
+    assert any((tmp_path / ARTIFACT_DIR).rglob("*"))
+
+    assert _statuses(run_pipeline(manifest, log=lambda m: None)) == {
+        "ingest": "cached", "total": "cached",
+    }
+
+
+def test_changed_notebook_reruns_downstream_only(tmp_path):
+    manifest = _pipeline(tmp_path)
+    run_pipeline(manifest, log=lambda m: None)
+    (tmp_path / "total.py").write_text(TOTAL.replace("n * scale", "n * scale + 1"))
+    (tmp_path / "raw.txt").unlink()
+
+    outcomes = run_pipeline(manifest, log=lambda m: None)
+    assert _statuses(outcomes) == {"ingest": "cached", "total": "ran"}
+    # The missing artifact was restored from the store
+    assert (tmp_path / "raw.txt").read_text() == "1 2 3"
+    assert (tmp_path / "total.txt").read_text() == "7"
+
+
+def test_failure_blocks_downstream(tmp_path):
+    manifest = _pipeline(tmp_path)
+    (tmp_path / "ingest.py").write_text("# @block=ingest\nraise RuntimeError('no data')\n")
+    outcomes = run_pipeline(manifest, log=lambda m: None)
+    assert _statuses(outcomes) == {"ingest": "failed", "total": "blocked"}
+    assert "no data" in outcomes[0].error
+
+
+def test_cli_pipeline(tmp_path, capsys):
+    manifest = _pipeline(tmp_path)
+    main(["pipeline", str(manifest), "--jobs", "1"])
+    assert "2 ran, 0 up to date" in capsys.readouterr().out
+    main(["pipeline", str(manifest), "--force"])
+    assert "2 ran" in capsys.readouterr().out
+
+
+def test_step_updates_existing_sidecar_and_digests(tmp_path):
+    manifest = _pipeline(tmp_path)
+    (tmp_path / "ingest.out.jsonl").write_text("")
+    (tmp_path / "ingest.out.digests.json").write_text("{}")
+    run_pipeline(manifest, jobs=1, log=lambda m: None)
+    record = json.loads((tmp_path / "ingest.out.jsonl").read_text())
+    assert record["block"] == "ingest"
+    digests = json.loads((tmp_path / "ingest.out.digests.json").read_text())
+    assert set(digests["blocks"]) == {"ingest"}
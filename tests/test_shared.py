@@ -0,0 +1,90 @@
+"""Tests for nobook.shared."""
+
+import os
+
+import pytest
+
+from nobook import shared
+from nobook.params import run_sweep
+from nobook.parser import parse_string
+
+
+@pytest.fixture
+def shared_session():
+    with shared.session() as path:
+        yield path
+
+
+def test_publish_and_attach_bytes(shared_session):
+    view = shared.publish("ref", b"abc")
+    assert bytes(view) == b"abc"
+    assert view.readonly
+    assert bytes(shared.attach("ref")) == b"abc"
+
+
+def test_attach_missing(shared_session):
+    with pytest.raises(KeyError, match="No shared value"):
+        shared.attach("nothing")
+
+
+def test_invalid_name(shared_session):
+    with pytest.raises(ValueError, match="Invalid shared name"):
+        shared.publish("../escape", b"")
+
+
+def test_get_or_create_runs_factory_once(shared_session):
+    calls = []
+    for _ in range(3):
+        view = shared.get_or_create("ref", lambda: calls.append(1) or bytearray(b"xyz"))
+    assert bytes(view) == b"xyz"
+    assert calls == [1]
+
+
+def test_session_is_removed():
+    with shared.session() as path:
+        shared.publish("ref", b"1")
+        assert os.environ[shared.ENV_VAR] == str(path)
+    assert not path.exists()
+    assert shared.ENV_VAR not in os.environ
+
+
+def test_numpy_array_is_memory_mapped(shared_session):
+    np = pytest.importorskip("numpy")
+    view = shared.publish("arr", np.arange(6, dtype=np.int32).reshape(2, 3))
+    assert isinstance(view, np.memmap)
+    assert view.shape == (2, 3) and view.dtype == np.int32
+    assert not view.flags.writeable
+
+
+def test_sweep_shares_values(tmp_path):
+    log = tmp_path / "loads.txt"
+    source = (
+        "# @block=parameters\nscale = 1\n"
+        "# @block=use\nfrom nobook import shared\n"
+        f"ref = shared.get_or_create('ref', lambda: open({str(log)!r}, 'a').write('x') and b'123')\n"
+        "print(int(bytes(ref)) * scale)\n"
+    )
+    path = tmp_path / "nb.py"
+    path.write_text(source)
+    outcomes = run_sweep(path, parse_string(source), [{"scale": s} for s in (1, 2, 3)], jobs=2)
+    assert all(ok for _, ok in outcomes)
+    assert log.read_text() == "x"
+    assert "# >>> 369" in outcomes[2][0].read_text()
+
+
+def test_no_session_leaves_environment_alone(monkeypatch):
+    monkeypatch.delenv(shared.ENV_VAR, raising=False)
+    shared.publish("ref", b"1")
+    assert shared.ENV_VAR not in os.environ
+    with shared.session() as path:
+        assert shared.shared_dir() == path
+        assert path != shared._private_dir
+
+
+def test_deleted_inherited_dir_is_ignored(monkeypatch, tmp_path):
+    monkeypatch.setenv(shared.ENV_VAR, str(tmp_path / "gone"))
+    assert bytes(shared.publish("ref", b"1")) == b"1"
+    with shared.session() as path:
+        assert path.is_dir()
+        assert bytes(shared.publish("ref", b"2")) == b"2"
+    assert os.environ[shared.ENV_VAR] == str(tmp_path / "gone")
@@ -0,0 +1,69 @@
+"""Tests for nobook.sidecar."""
+
+import json
+
+from nobook.executor import BlockResult
+from nobook.sidecar import (
+    append_records,
+    index_sidecar,
+    make_record,
+    read_sidecar,
+    result_outputs,
+    sidecar_path,
+)
+
+
+def test_sidecar_path():
+    assert sidecar_path("dir/nb.py").as_posix() == "dir/nb.out.jsonl"
+
+
+def test_result_outputs_stdout_and_error():
+    result = BlockResult(
+        name="a", stdout="hi\n",
+        error="Traceback (most recent call last):\nValueError: oops\n",
+    )
+    outputs = result_outputs(result)
+    assert outputs[0] == {"output_type": "stream", "name": "stdout", "text": "hi\n"}
+    assert outputs[1]["output_type"] == "error"
+    assert outputs[1]["ename"] == "ValueError"
+    assert outputs[1]["evalue"] == "oops"
+
+
+def test_latest_record_wins(tmp_path):
+    path = tmp_path / "nb.out.jsonl"
+    append_records(path, [make_record("a", [{"n": 1}]), make_record("b", [{"n": 2}])])
+    append_records(path, [make_record("a", [{"n": 3}], execution_count=7)])
+
+    records = read_sidecar(path)
+    assert records["a"]["outputs"] == [{"n": 3}]
+    assert records["a"]["execution_count"] == 7
+    assert records["b"]["outputs"] == [{"n": 2}]
+
+
+def test_read_selected_blocks(tmp_path):
+    path = tmp_path / "nb.out.jsonl"
+    append_records(path, [make_record("a", []), make_record("b", [])])
+    assert set(read_sidecar(path, blocks={"b"})) == {"b"}
+
+
+def test_read_missing_sidecar(tmp_path):
+    assert read_sidecar(tmp_path / "missing.out.jsonl") == {}
+
+
+def test_index_offsets_point_at_records():
+    data = b"".join(
+        json.dumps(make_record(name, [])).encode() + b"\n" for name in ["a", "b", "a"]
+    )
+    index, count = index_sidecar(data)
+    assert count == 3
+    offset, length = index["a"]
+    assert offset > index["b"][0]
+    assert json.loads(data[offset:offset + length])["block"] == "a"
+
+
+def test_append_compacts_stale_records(tmp_path):
+    path = tmp_path / "nb.out.jsonl"
+    for i in range(10):
+        append_records(path, [make_record("a", [{"n": i}])])
+    assert len(path.read_text().splitlines()) <= 2
+    assert read_sidecar(path)["a"]["outputs"] == [{"n": 9}]
@@ -0,0 +1,43 @@
+"""Tests for nobook.summary."""
+
+from nobook.summary import MAX_LINE_CHARS, PREVIEW_HEAD, PREVIEW_TAIL, BlobStore, preview
+
+
+def _numbered(n: int) -> str:
+    return "".join(f"line {i}\n" for i in range(n))
+
+
+def test_small_text_unchanged():
+    assert preview("a\nb\n") == "a\nb\n"
+
+
+def test_many_lines_keep_head_and_tail():
+    lines = preview(_numbered(1000)).splitlines()
+    assert len(lines) == PREVIEW_HEAD + 1 + PREVIEW_TAIL
+    assert lines[0] == "line 0"
+    assert lines[-1] == "line 999"
+    assert lines[PREVIEW_HEAD].startswith(f"... {1000 - PREVIEW_HEAD - PREVIEW_TAIL:,} more lines")
+
+
+def test_long_line_is_clipped():
+    text = preview("x" * 100_000 + "\n")
+    assert len(text) < MAX_LINE_CHARS + 100
+    assert "more characters" in text
+    assert "... 97.7 KB in total ..." in text
+
+
+def test_preview_of_preview_is_stable():
+    once = preview(_numbered(1000))
+    assert preview(once) == once
+
+
+def test_blob_store_keeps_full_text(tmp_path):
+    blobs = BlobStore(tmp_path)
+    text = _numbered(1000)
+    summary = blobs.summarize(text)
+    ref = summary.splitlines()[PREVIEW_HEAD].split("full output in ")[1].removesuffix(" ...")
+    assert ref.startswith(".nobook/blobs/")
+    assert blobs.get(ref) == text
+    assert blobs.summarize(text) == summary
+    assert blobs.summarize("small\n") == "small\n"
+    assert len(list((tmp_path / ".nobook" / "blobs").iterdir())) == 1
@@ -0,0 +1,110 @@
+"""Tests for nobook.watch."""
+
+import os
+import threading
+import time
+
+from nobook.parser import parse_string
+from nobook.watch import FileWatcher, WatchSession, affected_blocks, block_keys
+
+SOURCE = "# @block=a\nx = 1\n# @block=b\ny = x + 1\n# @block=c\nprint(y)\n"
+
+
+def _session():
+    written = []
+    session = WatchSession(lambda parsed, results: written.extend(r.name for r in results))
+    return session, written
+
+
+def test_affected_blocks_first_run():
+    assert affected_blocks([], parse_string(SOURCE)) == ["a", "b", "c"]
+
+
+def test_affected_blocks_from_first_change():
+    old = parse_string(SOURCE)
+    new = parse_string(SOURCE.replace("y = x + 1", "y = x + 2"))
+    assert affected_blocks(block_keys(old), new) == ["b", "c"]
+
+
+def test_affected_blocks_unchanged():
+    parsed = parse_string(SOURCE)
+    assert affected_blocks(block_keys(parsed), parsed) == []
+
+
+def test_session_reruns_changed_and_downstream():
+    session, written = _session()
+    session.run(parse_string(SOURCE))
+    assert written == ["a", "b", "c"]
+
+    written.clear()
+    results = session.run(parse_string(SOURCE.replace("y = x + 1", "y = x + 2")))
+    assert written == ["b", "c"]
+    assert results[-1].stdout == "3\n"
+
+
+def test_session_keeps_namespace():
+    session, _ = _session()
+    session.run(parse_string(SOURCE))
+    session.run(parse_string(SOURCE.replace("print(y)", "print(x, y)")))
+    assert session.namespace["x"] == 1
+
+
+def test_session_retries_failed_block():
+    session, written = _session()
+    session.run(parse_string("# @block=a\n1/0\n# @block=b\npass\n"))
+    assert written == ["a"]
+    written.clear()
+    session.run(parse_string("# @block=a\n1/0\n# @block=b\npass\n"))
+    assert written == ["a"]
+
+
+def test_session_cancelled_resumes_later():
+    session, written = _session()
+    session.run(parse_string(SOURCE), cancelled=lambda: len(written) == 1)
+    assert written == ["a"]
+    session.run(parse_string(SOURCE))
+    assert written == ["a", "b", "c"]
+
+
+def test_file_watcher_debounces(tmp_path):
+    path = tmp_path / "nb.py"
+    path.write_text(SOURCE)
+    watcher = FileWatcher(path, poll_interval=0.01)
+    assert not watcher.changed()
+
+    def save_twice():
+        for i in range(2):
+            time.sleep(0.02)
+            path.write_text(SOURCE + f"# edit {i}\n")
+            os.utime(path, ns=(0, time.time_ns() + i))
+
+    thread = threading.Thread(target=save_twice)
+    thread.start()
+    watcher.wait(debounce=0.1)
+    thread.join()
+    assert watcher.changed()
+    assert path.read_text().endswith("# edit 1\n")
+    watcher.close()
+
+
+def test_file_watcher_waits_full_debounce(tmp_path):
+    path = tmp_path / "nb.py"
+    path.write_text(SOURCE)
+    watcher = FileWatcher(path, poll_interval=0.01)
+    path.write_text(SOURCE + "# edit\n")
+    os.utime(path, ns=(0, time.time_ns()))
+
+    def touch_neighbour():
+        # Events for other files in the directory must not end the debounce
+        for i in range(5):
+            time.sleep(0.02)
+            (tmp_path / "other.txt").write_text(str(i))
+
+    thread = threading.Thread(target=touch_neighbour)
+    thread.start()
+    start = time.monotonic()
+    watcher.wait(debounce=0.2)
+    elapsed = time.monotonic() - start
+    thread.join()
+    watcher.close()
+    assert elapsed >= 0.2
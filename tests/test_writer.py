@@ -1,10 +1,11 @@
 """Tests for nobook.writer."""
 
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 from nobook.parser import parse_file, parse_string
-from nobook.executor import execute_all
-from nobook.writer import format_output
+from nobook.executor import execute_all, execute_up_to
+from nobook.writer import format_output, merge_output, write_output
 
 FIXTURES = Path(__file__).parent / "fixtures"
 
@@ -43,3 +44,69 @@ def test_preamble_preserved():
     output = format_output(parsed, results)
     assert output.startswith("# preamble\n")
     assert "# >>> hi" in output
+
+
+def test_merge_keeps_outputs_of_other_blocks():
+    previous = "# @block=a\nprint(1)\n# >>> 1\n# @block=b\nprint(2)\n# >>> 2\n"
+    new = "# @block=a\nprint(10)\n# >>> 10\n# @block=b\nprint(2)\n"
+    merged = merge_output(new, previous, ["a"])
+    assert merged == "# @block=a\nprint(10)\n# >>> 10\n# @block=b\nprint(2)\n# >>> 2\n"
+
+
+def test_merge_drops_outputs_of_removed_blocks():
+    previous = "# @block=gone\nx\n# >>> old\n"
+    assert merge_output("# @block=a\ny\n", previous, []) == "# @block=a\ny\n"
+
+
+def test_write_output_clears_blocks_that_did_not_run(tmp_path):
+    out_path = tmp_path / "simple.out.py"
+    parsed = parse_file(FIXTURES / "simple.py")
+    write_output(parsed, execute_all(parsed), out_path)
+
+    # A partial run's output must not sit next to older outputs of later blocks
+    write_output(parsed, execute_up_to(parsed, "setup"), out_path)
+    output = out_path.read_text()
+    assert "# >>> result = 30" not in output
+    assert "# >>> done" not in output
+
+
+def test_write_output_keeps_blocks_it_does_not_own(tmp_path):
+    out_path = tmp_path / "simple.out.py"
+    parsed = parse_file(FIXTURES / "simple.py")
+    write_output(parsed, execute_all(parsed), out_path)
+
+    write_output(parsed, execute_up_to(parsed, "setup"), out_path, blocks=["setup"])
+    output = out_path.read_text()
+    assert "# >>> result = 30" in output
+    assert "# >>> done" in output
+
+
+def test_concurrent_writers_update_own_blocks(tmp_path):
+    out_path = tmp_path / "nb.out.py"
+    parsed = parse_string("".join(f"# @block=b{i}\nprint({i})\n" for i in range(8)))
+    results = execute_all(parsed)
+
+    def write_one(result):
+        write_output(parsed, [result], out_path, blocks=[result.name])
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(write_one, results))
+
+    output = out_path.read_text()
+    for i in range(8):
+        assert f"# >>> {i}\n" in output
+
+
+def test_stderr_written_as_error_lines():
+    from nobook.executor import BlockResult
+
+    parsed = parse_string("# @block=a\nx\n")
+    output = format_output(parsed, [BlockResult("a", "out\n", None, stderr="warn\n")])
+    assert output == "# @block=a\nx\n# >>> out\n# !!! warn\n"
+
+
+def test_merge_keeps_source_of_kept_outputs():
+    # Edited but not re-run: the old output stays with the source it came from
+    previous = "# @block=a\nprint(1)\n# >>> 1\n# @block=b\nx\n"
+    new = "# @block=a\nprint(2)\n# @block=b\ny\n"
+    assert merge_output(new, previous, []) == "# @block=a\nprint(1)\n# >>> 1\n# @block=b\ny\n"
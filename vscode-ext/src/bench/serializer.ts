@@ -0,0 +1,63 @@
+/**
+ * Serializer benchmark over synthetic notebooks.
+ *
+ * Compares the old string-concatenation serializer against encodeCells
+ * with one encode, plus parsing the result back.
+ *
+ * Usage: npm run bench [-- <cells> <iterations>]
+ */
+
+import { performance } from 'perf_hooks';
+import { CellSource, encodeCells, parseString } from '../parser';
+
+function makeCells(count: number): CellSource[] {
+  const cells: CellSource[] = [];
+  for (let i = 0; i < count; i++) {
+    cells.push({
+      name: `block_${i}`,
+      value: `x_${i} = ${i}\nfor j in range(10):\n    print(x_${i} * j)\n`,
+    });
+  }
+  return cells;
+}
+
+/** The serializer as it was: `+=` concatenation and one big encode */
+function concatSerialize(cells: readonly CellSource[]): Uint8Array {
+  let output = '';
+  for (const cell of cells) {
+    output += `# @block=${cell.name}\n`;
+    output += cell.value;
+    if (!cell.value.endsWith('\n')) {
+      output += '\n';
+    }
+  }
+  return new TextEncoder().encode(output);
+}
+
+function bench(label: string, iterations: number, fn: (i: number) => void): void {
+  fn(-1); // warm up
+  const start = performance.now();
+  for (let i = 0; i < iterations; i++) {
+    fn(i);
+  }
+  const perIteration = (performance.now() - start) / iterations;
+  console.log(`${label.padEnd(36)} ${perIteration.toFixed(2).padStart(9)} ms`);
+}
+
+function main(): void {
+  const count = Number(process.argv[2] ?? 10_000);
+  const iterations = Number(process.argv[3] ?? 20);
+  const cells = makeCells(count);
+  const text = encodeCells(cells, 'cell');
+  console.log(`${count} cells, ${(text.length / 1024).toFixed(0)} KiB, ${iterations} iterations`);
+
+  if (Buffer.compare(Buffer.from(concatSerialize(cells)), Buffer.from(text)) !== 0) {
+    throw new Error('encodeCells output differs from the old serializer');
+  }
+
+  bench('concat serialize (old)', iterations, () => concatSerialize(cells));
+  bench('full encode (join)', iterations, () => new TextEncoder().encode(encodeCells(cells, 'cell')));
+  bench('parse', iterations, () => parseString(text));
+}
+
+main();
@@ -6,6 +6,7 @@
 
 import * as vscode from 'vscode';
 import { NobookSerializer } from './serializer';
+import { registerOutputSync } from './outputs';
 import { registerCommands, registerStatusBar } from './ui';
 
 const NOTEBOOK_TYPE = 'nobook-notebook';
@@ -19,11 +20,15 @@ export function activate(context: vscode.ExtensionContext) {
     NOTEBOOK_TYPE,
     serializer,
     {
-      transientOutputs: false,
+      // Outputs live in .out.py, not in the .py the serializer writes
+      transientOutputs: true,
       transientMetadata: {},
     }
   );
 
+  // Keep cell outputs in .out.py
+  registerOutputSync(context);
+
   // Register commands
   registerCommands(context);
 
@@ -0,0 +1,267 @@
+/**
+ * Keep cell outputs in the .out.py file next to each nobook notebook.
+ *
+ * Outputs are read from .out.py when a notebook document is opened (or
+ * reverted) and written back whenever they change or the notebook is
+ * saved, so results survive closing the editor. Outputs are transient to
+ * the serializer: they never make the .py dirty or get written into it. A
+ * write only replaces the outputs of cells that changed in this editor;
+ * other blocks keep what is on disk, which a `nobook run` or a Jupyter
+ * session may have written in the meantime.
+ */
+
+import * as vscode from 'vscode';
+import {
+  BlockOutput,
+  ERROR_PREFIX,
+  OUTPUT_PREFIX,
+  OutputBlock,
+  formatOutPy,
+  parseOutPy,
+  prefixLines,
+  resolveBlockNames,
+  splitOutputLines,
+} from './parser';
+
+const NOTEBOOK_TYPE = 'nobook-notebook';
+const STDOUT_MIME = 'application/vnd.code.notebook.stdout';
+const STDERR_MIME = 'application/vnd.code.notebook.stderr';
+const ERROR_MIME = 'application/vnd.code.notebook.error';
+const ANSI_RE = /\x1b\[[0-9;]*m/g;
+
+/** Each cell's output lines as last loaded from or saved to .out.py */
+const savedOutputs = new WeakMap<vscode.NotebookCell, string>();
+
+/** Wait this long after the last output change before writing .out.py */
+const OUTPUT_WRITE_DELAY_MS = 500;
+
+/**
+ * Return the .out.py URI for a notebook .py URI.
+ */
+export function outPyUri(uri: vscode.Uri): vscode.Uri {
+  return uri.with({ path: uri.path.replace(/\.py$/, '') + '.out.py' });
+}
+
+/**
+ * Read outputs from the .out.py next to `uri`; empty if there is none.
+ */
+export async function loadOutputs(uri: vscode.Uri): Promise<Map<string, BlockOutput>> {
+  try {
+    const bytes = await vscode.workspace.fs.readFile(outPyUri(uri));
+    return parseOutPy(new TextDecoder().decode(bytes));
+  } catch {
+    return new Map();
+  }
+}
+
+/**
+ * Convert parsed .out.py lines to VS Code cell outputs.
+ */
+export function toCellOutputs(output: BlockOutput | undefined): vscode.NotebookCellOutput[] {
+  if (!output) {
+    return [];
+  }
+  const outputs: vscode.NotebookCellOutput[] = [];
+  if (output.stdout.length > 0) {
+    outputs.push(new vscode.NotebookCellOutput([
+      vscode.NotebookCellOutputItem.stdout(output.stdout.join('\n') + '\n'),
+    ]));
+  }
+  if (output.stderr.length > 0) {
+    outputs.push(new vscode.NotebookCellOutput([
+      vscode.NotebookCellOutputItem.stderr(output.stderr.join('\n') + '\n'),
+    ]));
+  }
+  return outputs;
+}
+
+/**
+ * Convert VS Code cell outputs to prefixed .out.py lines.
+ */
+export function cellOutputLines(outputs: readonly vscode.NotebookCellOutput[]): string[] {
+  const decoder = new TextDecoder();
+  const lines: string[] = [];
+  for (const output of outputs) {
+    for (const item of output.items) {
+      const text = decoder.decode(item.data);
+      if (item.mime === STDOUT_MIME || item.mime === 'text/plain') {
+        lines.push(...prefixLines(text, OUTPUT_PREFIX));
+      } else if (item.mime === STDERR_MIME) {
+        lines.push(...prefixLines(text, ERROR_PREFIX));
+      } else if (item.mime === ERROR_MIME) {
+        const error = JSON.parse(text) as { name?: string; message?: string; stack?: string };
+        const trace = error.stack ?? `${error.name}: ${error.message}`;
+        lines.push(...prefixLines(trace.replace(ANSI_RE, ''), ERROR_PREFIX));
+      }
+    }
+  }
+  return lines;
+}
+
+function outputKey(cell: vscode.NotebookCell): string {
+  return cellOutputLines(cell.outputs).join('\n');
+}
+
+/**
+ * Give `cells` of `notebook` that have no outputs the ones in its .out.py.
+ *
+ * Outputs can only be set by replacing the cells, and VS Code may count
+ * that as an unsaved change. The notebook is left that way rather than
+ * saved, since saving would rewrite the user's .py just for opening it.
+ */
+export async function attachOutputs(
+  notebook: vscode.NotebookDocument,
+  cells: readonly vscode.NotebookCell[] = notebook.getCells(),
+): Promise<void> {
+  const outputs = await loadOutputs(notebook.uri);
+  const edits: vscode.NotebookEdit[] = [];
+  for (const cell of cells) {
+    const output = outputs.get(cell.metadata?.block as string);
+    if (!output || cell.outputs.length > 0) {
+      savedOutputs.set(cell, outputKey(cell));
+      continue;
+    }
+    const data = new vscode.NotebookCellData(
+      cell.kind, cell.document.getText(), cell.document.languageId,
+    );
+    data.metadata = cell.metadata;
+    data.outputs = toCellOutputs(output);
+    edits.push(vscode.NotebookEdit.replaceCells(
+      new vscode.NotebookRange(cell.index, cell.index + 1), [data],
+    ));
+  }
+  if (edits.length === 0) {
+    return;
+  }
+
+  const edit = new vscode.WorkspaceEdit();
+  edit.set(notebook.uri, edits);
+  if (!(await vscode.workspace.applyEdit(edit))) {
+    return;
+  }
+  // Replacing a cell creates a new NotebookCell
+  for (const cell of notebook.getCells()) {
+    if (!savedOutputs.has(cell)) {
+      savedOutputs.set(cell, outputKey(cell));
+    }
+  }
+}
+
+/**
+ * Write the cell outputs of `notebook` to its .out.py file.
+ *
+ * Cells whose outputs are unchanged since they were loaded or last saved
+ * keep the outputs the file has now.
+ */
+export async function saveOutputs(notebook: vscode.NotebookDocument): Promise<void> {
+  const defaultPrefix = vscode.workspace
+    .getConfiguration('nobook')
+    .get<string>('defaultBlockName', 'cell');
+  const uri = outPyUri(notebook.uri);
+  let previous = '';
+  try {
+    previous = new TextDecoder().decode(await vscode.workspace.fs.readFile(uri));
+  } catch {
+    // No .out.py yet
+  }
+  const onDisk = splitOutputLines(previous);
+
+  const cells = notebook.getCells();
+  const names = resolveBlockNames(
+    cells.map((cell) => ({ name: cell.metadata?.block as string | undefined, value: '' })),
+    defaultPrefix,
+  );
+  const blocks: OutputBlock[] = cells.map((cell, i) => {
+    const lines = cellOutputLines(cell.outputs);
+    const changed = lines.join('\n') !== (savedOutputs.get(cell) ?? '');
+    return {
+      name: names[i],
+      source: cell.document.getText(),
+      outputLines: changed ? lines : onDisk.get(names[i]) ?? [],
+    };
+  });
+  const preamble = (notebook.metadata?.nobook?.preamble as string[] | undefined) ?? [];
+
+  const text = formatOutPy(preamble, blocks);
+  if (text && text !== previous) {
+    // Write then rename, so readers never see a half-written file
+    const tmp = uri.with({ path: uri.path.replace(/[^/]*$/, (name) => `.${name}.tmp`) });
+    await vscode.workspace.fs.writeFile(tmp, new TextEncoder().encode(text));
+    await vscode.workspace.fs.rename(tmp, uri, { overwrite: true });
+  }
+  for (const cell of cells) {
+    savedOutputs.set(cell, outputKey(cell));
+  }
+}
+
+/**
+ * Load outputs when a nobook notebook is opened or reverted, and write
+ * .out.py files whenever outputs change or one is saved.
+ */
+export function registerOutputSync(context: vscode.ExtensionContext): void {
+  const write = async (notebook: vscode.NotebookDocument) => {
+    try {
+      await saveOutputs(notebook);
+    } catch (error) {
+      vscode.window.showErrorMessage(`Failed to write .out.py: ${error}`);
+    }
+  };
+  // Executing a cell changes its outputs many times; write once it settles
+  const pending = new Map<string, ReturnType<typeof setTimeout>>();
+  const schedule = (notebook: vscode.NotebookDocument) => {
+    const key = notebook.uri.toString();
+    clearTimeout(pending.get(key));
+    pending.set(key, setTimeout(() => {
+      pending.delete(key);
+      if (!notebook.isClosed) {
+        write(notebook);
+      }
+    }, OUTPUT_WRITE_DELAY_MS));
+  };
+  context.subscriptions.push({
+    dispose: () => pending.forEach((timer) => clearTimeout(timer)),
+  });
+
+  const attach = (notebook: vscode.NotebookDocument, cells?: readonly vscode.NotebookCell[]) => {
+    attachOutputs(notebook, cells).catch((error) => {
+      vscode.window.showErrorMessage(`Failed to read .out.py: ${error}`);
+    });
+  };
+  for (const notebook of vscode.workspace.notebookDocuments) {
+    if (notebook.notebookType === NOTEBOOK_TYPE) {
+      attach(notebook);
+    }
+  }
+
+  context.subscriptions.push(
+    vscode.workspace.onDidOpenNotebookDocument((notebook) => {
+      if (notebook.notebookType === NOTEBOOK_TYPE) {
+        attach(notebook);
+      }
+    }),
+    vscode.workspace.onDidChangeNotebookDocument((event) => {
+      if (event.notebook.notebookType !== NOTEBOOK_TYPE) {
+        return;
+      }
+      // Outputs are transient, so running a cell doesn't make the notebook
+      // dirty and may never be followed by a save
+      if (event.cellChanges.some((change) => change.outputs !== undefined)) {
+        schedule(event.notebook);
+      }
+      // Reverting or reloading from disk replaces the cells and leaves the
+      // notebook clean; user edits that add cells make it dirty
+      if (event.notebook.isDirty) {
+        return;
+      }
+      const added = event.contentChanges.flatMap((change) => change.addedCells);
+      if (added.length > 0) {
+        attach(event.notebook, added);
+      }
+    }),
+    vscode.workspace.onDidSaveNotebookDocument((notebook) => {
+      if (notebook.notebookType === NOTEBOOK_TYPE) {
+        write(notebook);
+      }
+    }),
+  );
+}
@@ -4,3 +4,5 @@
 
 export * from './types';
 export * from './parser';
+export * from './encoder';
+export * from './outputs';
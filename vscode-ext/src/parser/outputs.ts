@@ -0,0 +1,135 @@
+/**
+ * Read and write .out.py files: block source followed by output comments.
+ *
+ * Ported from parse_out_py / notebook_to_out_py in nobook/convert.py
+ */
+
+import { BLOCK_START_RE, HASH } from './parser';
+
+export const OUTPUT_PREFIX = '# >>> ';
+export const ERROR_PREFIX = '# !!! ';
+
+export interface BlockOutput {
+  /** Lines printed to stdout (and execute results) */
+  stdout: string[];
+  /** Lines printed to stderr (and tracebacks) */
+  stderr: string[];
+}
+
+export interface OutputBlock {
+  name: string;
+  source: string;
+  /** Already prefixed output lines (`# >>> ...` / `# !!! ...`) */
+  outputLines: string[];
+}
+
+/**
+ * Parse .out.py text into a map of block name -> output lines.
+ *
+ * Single pass over the text: only lines starting with '#' are inspected,
+ * and blocks without any output are left out of the map.
+ */
+export function parseOutPy(text: string): Map<string, BlockOutput> {
+  const result = new Map<string, BlockOutput>();
+  let current: BlockOutput | null = null;
+  let currentName: string | null = null;
+
+  const flush = (): void => {
+    if (currentName !== null && current !== null &&
+        (current.stdout.length > 0 || current.stderr.length > 0)) {
+      result.set(currentName, current);
+    }
+  };
+
+  let start = 0;
+  while (start <= text.length) {
+    let end = text.indexOf('\n', start);
+    if (end === -1) {
+      end = text.length;
+    }
+    if (text.charCodeAt(start) === HASH) {
+      let line = text.slice(start, end);
+      if (line.endsWith('\r')) {
+        line = line.slice(0, -1);
+      }
+      const match = BLOCK_START_RE.exec(line);
+      if (match) {
+        flush();
+        currentName = match[1];
+        current = { stdout: [], stderr: [] };
+      } else if (current !== null && line.startsWith(OUTPUT_PREFIX)) {
+        current.stdout.push(line.slice(OUTPUT_PREFIX.length));
+      } else if (current !== null && line.startsWith(ERROR_PREFIX)) {
+        current.stderr.push(line.slice(ERROR_PREFIX.length));
+      }
+    }
+    start = end + 1;
+  }
+  flush();
+  return result;
+}
+
+/**
+ * Map block name -> its output lines (`# >>> ...` / `# !!! ...`) in .out.py
+ * text, with their prefixes and in file order.
+ *
+ * Ported from split_output_lines in nobook/writer.py
+ */
+export function splitOutputLines(text: string): Map<string, string[]> {
+  const result = new Map<string, string[]>();
+  const outputMark = OUTPUT_PREFIX.trimEnd();
+  const errorMark = ERROR_PREFIX.trimEnd();
+  let current: string[] | null = null;
+
+  for (let line of text.split('\n')) {
+    if (line.charCodeAt(0) !== HASH) {
+      continue;
+    }
+    if (line.endsWith('\r')) {
+      line = line.slice(0, -1);
+    }
+    const match = BLOCK_START_RE.exec(line);
+    if (match) {
+      current = result.get(match[1]) ?? [];
+      result.set(match[1], current);
+    } else if (current !== null && (line.startsWith(outputMark) || line.startsWith(errorMark))) {
+      current.push(line);
+    }
+  }
+  return result;
+}
+
+/**
+ * Produce .out.py text: preamble, then each block's source and outputs.
+ *
+ * Returns an empty string when no block has any output, so callers can
+ * skip writing the file.
+ */
+export function formatOutPy(preamble: readonly string[], blocks: readonly OutputBlock[]): string {
+  if (!blocks.some((b) => b.outputLines.length > 0)) {
+    return '';
+  }
+  const parts: string[] = [];
+  if (preamble.join('\n').trim()) {
+    parts.push(...preamble);
+  }
+  for (const block of blocks) {
+    parts.push(`# @block=${block.name}`);
+    if (block.source) {
+      parts.push(...block.source.replace(/\n$/, '').split('\n'));
+    }
+    parts.push(...block.outputLines);
+  }
+  return parts.join('\n') + '\n';
+}
+
+/**
+ * Prefix every line of `text` for an .out.py file.
+ */
+export function prefixLines(text: string, prefix: string): string[] {
+  const trimmed = text.replace(/\n+$/, '');
+  if (!trimmed) {
+    return [];
+  }
+  return trimmed.split('\n').map((line) => `${prefix}${line}`);
+}
@@ -10,7 +10,9 @@
 
 import { Block, ParsedFile, ParseError } from './types';
 
-const BLOCK_START_RE = /^#\s*@block=(\S+)\s*$/;
+export const BLOCK_START_RE = /^#\s*@block=(\S+)\s*$/;
+/** Char code of '#': only lines starting with it can be markers */
+export const HASH = 0x23;
 
 export function parseString(text: string): ParsedFile {
   const rawLines = text.split('\n');
@@ -24,7 +26,8 @@ export function parseString(text: string): ParsedFile {
 
   for (let i = 0; i < rawLines.length; i++) {
     const line = rawLines[i];
-    const match = line.match(BLOCK_START_RE);
+    // Only lines starting with '#' can be markers; skip the regex otherwise
+    const match = line.charCodeAt(0) === HASH ? BLOCK_START_RE.exec(line) : null;
 
     if (match) {
       // Close previous block if any
@@ -5,7 +5,7 @@
  */
 
 import * as vscode from 'vscode';
-import { parseString, uniqueName, Block, ParsedFile } from './parser';
+import { parseString, encodeCells, CellSource } from './parser';
 
 /**
  * Metadata structure stored in each notebook cell
@@ -21,9 +21,6 @@ export class NobookSerializer implements vscode.NotebookSerializer {
 
     const cells: vscode.NotebookCellData[] = [];
 
-    // Skip preamble for now - it's preserved but not shown as a cell
-    // We could add it as a read-only markdown cell if needed
-
     for (const block of parsed.blocks) {
       const cell = new vscode.NotebookCellData(
         vscode.NotebookCellKind.Code,
@@ -38,43 +35,24 @@ export class NobookSerializer implements vscode.NotebookSerializer {
       cells.push(cell);
     }
 
-    return new vscode.NotebookData(cells);
+    // The preamble isn't shown as a cell; keep it in notebook metadata so
+    // it is written back on save
+    const data = new vscode.NotebookData(cells);
+    data.metadata = { nobook: { preamble: parsed.preamble } };
+    return data;
   }
 
   async serialize(data: vscode.NotebookData): Promise<Uint8Array> {
-    const used = new Set<string>();
-    let output = '';
-
     // Get default block name prefix from config
     const config = vscode.workspace.getConfiguration('nobook');
     const defaultBlockPrefix = config.get<string>('defaultBlockName', 'cell');
 
-    for (let i = 0; i < data.cells.length; i++) {
-      const cell = data.cells[i];
-      const cellMetadata = cell.metadata as NobookCellMetadata | undefined;
-
-      // Get or generate block name
-      let blockName = cellMetadata?.block;
-      if (!blockName) {
-        const base = `${defaultBlockPrefix}_${i}`;
-        blockName = uniqueName(base, used);
-      } else if (used.has(blockName)) {
-        // Handle duplicate names
-        blockName = uniqueName(blockName, used);
-      }
-
-      used.add(blockName);
-
-      // Write block marker and code
-      output += `# @block=${blockName}\n`;
-      output += cell.value;
-
-      // Add newline if cell doesn't end with one
-      if (!cell.value.endsWith('\n')) {
-        output += '\n';
-      }
-    }
+    const cells: CellSource[] = data.cells.map((cell) => ({
+      name: (cell.metadata as NobookCellMetadata | undefined)?.block,
+      value: cell.value,
+    }));
 
-    return new TextEncoder().encode(output);
+    const preamble = (data.metadata?.nobook?.preamble as string[] | undefined) ?? [];
+    return new TextEncoder().encode(encodeCells(cells, defaultBlockPrefix, preamble));
   }
 }